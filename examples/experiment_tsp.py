@@ -1,4 +1,5 @@
 import numpy as np
+from kayak.feature_types.permutation import FeaturePermutation
 import matplotlib.pyplot as plt
 import matplotlib.path as mplpath
 from scipy.spatial.distance import pdist, squareform
@@ -73,15 +74,37 @@ CROSSPROP = 0.99
 MUTPROP = 0.05
 
 bestDist=np.zeros(ITERATIONS) #In diesem Array wird für jede Iteration die beste Distanz gespeichert
+rng = np.random.default_rng()
+tour = FeaturePermutation(list(range(cities)))
+
+def tour_lengths(permutations):
+    #Vektorisierte Rundreiselänge für alle Individuen auf einmal
+    closed = np.hstack([permutations, permutations[:, :1]])
+    return fitness._distances[closed[:, :-1], closed[:, 1:]].sum(axis=1)
+
 #Erzeugen einer zufälligen Startpopulation
-population=np.zeros((POPSIZE,cities+1))
-for j in range(POPSIZE):
-        population[j,0:cities] = np.random.permutation(cities)
-        population[j,cities] = population[j,0]
+population = tour.sample_random_batch(POPSIZE, rng=rng)
 print(population)
 
-for permut in population:
-    cost = fitness.cost(permut)
+for iteration in range(ITERATIONS):
+    costs = tour_lengths(population)
+    bestDist[iteration] = costs.min()
+    #Turnierselektion, Kreuzung und Mutation der ganzen Population ohne Schleife über Individuen
+    contestants = rng.integers(0, POPSIZE, size=(2, POPSIZE, 2))
+    winners = np.where(costs[contestants[:, :, 0]] < costs[contestants[:, :, 1]], contestants[:, :, 0], contestants[:, :, 1])
+    offspring = tour.cross_over_batch(population[winners[0]], population[winners[1]], method='ox', rng=rng)
+    crossed = rng.random(POPSIZE) < CROSSPROP
+    offspring[~crossed] = population[winners[0]][~crossed]
+    mutated = rng.random(POPSIZE) < MUTPROP
+    if mutated.any():
+        offspring[mutated] = tour.mutate_batch(offspring[mutated], method='inversion', rng=rng)
+    #Elitismus: die beste Rundreise bleibt erhalten
+    offspring[0] = population[np.argmin(costs)]
+    population = offspring
+
+for permut, cost in zip(population, tour_lengths(population)):
     print('%s := %.2f' % (permut, cost))
 
-plt.show()
\ No newline at end of file
+plt.subplot(122)
+plt.plot(bestDist)
+plt.show()
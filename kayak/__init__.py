@@ -9,5 +9,10 @@ from .kayak import GeneticEncoding
 from .kayak import GeneCode
 from .feature_types import FeatureType
 from .population import Population
+from .population import CachedFitnessMap
 from .population import FitnessMap
-from .population import DelayedRandomFitnessMap
\ No newline at end of file
+from .population import FitnessEvaluation
+from .population import AsyncFitnessMap
+from .population import AsyncCachedFitnessMap
+from .population import DelayedRandomFitnessMap
+from .archive import ArchivedPopulation
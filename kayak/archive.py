@@ -0,0 +1,277 @@
+"""
+Populations backed by a memory-mapped file, e.g. for keeping every evaluated genome of a run beyond the available memory.
+
+An archive file starts with a header of a fixed magic, the number of stored codes and a JSON description of the genetic encoding.
+The header is padded to a multiple of the page size and followed by one record per code with its genome, fitness, age and id.
+Codes are appended in place and the number of codes is updated only after their records are written,
+so that other processes can read an archive while it is appended to.
+"""
+import os
+import json
+import numpy as np
+from . import export
+from .kayak import GeneticEncoding
+from .population import Population
+from .feature_types import FeatureType
+
+ARCHIVE_MAGIC = b'KAYAKPOP'
+ARCHIVE_FORMAT = 1
+_HEADER_ALIGNMENT = 4096
+# Magic, number of codes and length of the JSON description precede the description
+_HEADER_PREFIX = len(ARCHIVE_MAGIC) + 8 + 8
+
+
+def _describe_encoding(encoding):
+    """
+    :return: JSON compatible description of the name, version and layout of the given genetic encoding
+    :rtype: dict
+    """
+    layout = [[name, str(ftype), offset, size] for name, (ftype, offset, size) in encoding.layout().names.items()]
+    # Round trip through JSON, so that descriptions of encodings and of archive headers compare equal
+    return json.loads(json.dumps({'name': encoding.name, 'version': str(encoding.version), 'layout': layout}))
+
+
+def _record_dtype(dtype, size):
+    return np.dtype([('genome', dtype, (size,)), ('fitness', '<f8'), ('age', '<i8'), ('id', '<i8')])
+
+
+class _ArchivedFeature(FeatureType):
+    """
+    Placeholder for a feature of an archived encoding which is not available, only the size of its code is known and checked.
+    """
+    def __init__(self, description, size):
+        self._description = description
+        self._size = size
+
+    def fits(self, code):
+        return len(code) == self._size
+
+    def fits_batch(self, matrix):
+        return np.full(len(matrix), np.shape(matrix)[1] == self._size)
+
+    @property
+    def dynamically_sized(self):
+        return False
+
+    @property
+    def min_size(self):
+        return self._size
+
+    @property
+    def max_size(self):
+        return self._size
+
+    def __str__(self):
+        return self._description
+
+
+class _ArchivedEncoding(GeneticEncoding):
+    """
+    Stand-in for the genetic encoding of an archive opened without it, built from the layout stored in the archive header.
+    Codes can be selected and their features accessed by name, including features of nested sets, but features are not built.
+    """
+    def __init__(self, description):
+        features, order, nested, end = {}, [], [], 0
+        for name, ftype, offset, size in description['layout']:
+            # Named entries of nested sets follow their set and lie within its code
+            if offset < end:
+                nested.append((name, ftype, offset, size))
+                continue
+            features[name] = _ArchivedFeature(ftype, size)
+            order.append(name)
+            end = offset + size
+        super().__init__(description['name'], description['version'], features)
+        self._feature_names = order
+        self._nested = nested
+
+    def _compile_layout(self, code=None):
+        layout = super()._compile_layout(code)
+        for name, ftype, offset, size in self._nested:
+            if name not in layout.names:
+                layout.names[name] = (_ArchivedFeature(ftype, size), offset, size)
+        return layout
+
+
+@export
+class ArchivedPopulation(Population):
+    """
+    Population whose genomes, fitness, age and ids are stored in a memory-mapped archive file instead of memory.
+    Records are mapped lazily on first access, appending grows the file geometrically and writes the codes in place.
+
+    Opening modes follow numpy.memmap:
+    'w+' creates a new archive for the given encoding, replacing an existing file,
+    'r+' opens an existing archive for appending and updating fitness values,
+    'r' opens an existing archive read-only, e.g. for analyzing it from another process while a run appends to it.
+    """
+
+    def __init__(self, path, encoding=None, mode: str='r', capacity: int=1024, dtype=float):
+        """
+        :param path: path of the archive file
+        :param encoding: genetic encoding of the codes, required for creating and appending, checked against the archive header.
+                         Without it, codes of a read-only archive are accessed by the feature layout of the header.
+        :param mode: 'w+', 'r+' or 'r'
+        :param capacity: number of codes to reserve space for when creating an archive
+        :param dtype: numeric dtype of the genomes when creating an archive
+        """
+        if mode not in ('w+', 'r+', 'r'):
+            raise ValueError('Unknown archive mode %s, expecting \'w+\', \'r+\' or \'r\'.' % mode)
+        if encoding is None and mode != 'r':
+            raise ValueError('Creating or appending to an archive requires its genetic encoding.')
+
+        self._path = os.fspath(path)
+        self._mode = mode
+        self._records = None
+        self._ids_resumed = False
+
+        if mode == 'w+':
+            self._create(encoding, capacity, np.dtype(dtype))
+        self._read_header()
+
+        if encoding is not None and _describe_encoding(encoding) != self._description['encoding']:
+            raise ValueError('Genetic encoding %s %s does not match the encoding of archive %s.' % (encoding.name, encoding.version, self._path))
+        self._space = encoding if encoding is not None else _ArchivedEncoding(self._description['encoding'])
+
+    def _create(self, encoding, capacity, dtype):
+        if dtype.kind not in 'biuf':
+            raise ValueError('Archived populations require a numeric dtype, got %s' % dtype)
+        if encoding.dynamically_sized:
+            raise ValueError('Expecting a genetic encoding space of fixed size for the population.')
+
+        description = json.dumps({
+            'format': ARCHIVE_FORMAT,
+            'encoding': _describe_encoding(encoding),
+            'dtype': dtype.str,
+            'genome_size': len(encoding)
+        }).encode('utf-8')
+        header_size = -(-(_HEADER_PREFIX + len(description)) // _HEADER_ALIGNMENT) * _HEADER_ALIGNMENT
+
+        with open(self._path, 'wb') as handle:
+            handle.write(ARCHIVE_MAGIC)
+            handle.write(np.array([0, len(description)], dtype='<u8').tobytes())
+            handle.write(description)
+            handle.truncate(header_size + capacity * _record_dtype(dtype, len(encoding)).itemsize)
+
+    def _read_header(self):
+        with open(self._path, 'rb') as handle:
+            if handle.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                raise ValueError('File %s is not a population archive.' % self._path)
+            _, description_size = np.frombuffer(handle.read(16), dtype='<u8')
+            self._description = json.loads(handle.read(int(description_size)).decode('utf-8'))
+
+        if self._description.get('format') != ARCHIVE_FORMAT:
+            raise ValueError('Unsupported archive format %s of %s.' % (self._description.get('format'), self._path))
+        self._header_size = -(-(_HEADER_PREFIX + int(description_size)) // _HEADER_ALIGNMENT) * _HEADER_ALIGNMENT
+        self._record = _record_dtype(np.dtype(self._description['dtype']), self._description['genome_size'])
+        # Only the number of codes is mapped eagerly, it is shared with other processes using the same archive
+        self._count = np.memmap(self._path, dtype='<u8', mode=self._mode if self._mode == 'r' else 'r+', offset=len(ARCHIVE_MAGIC), shape=(1,))
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def name(self):
+        """
+        :return: name of the genetic encoding stored in the archive header
+        """
+        return self._description['encoding']['name']
+
+    @property
+    def version(self):
+        """
+        :return: version of the genetic encoding stored in the archive header
+        """
+        return self._description['encoding']['version']
+
+    @property
+    def layout(self):
+        """
+        :return: list of [name, feature type, offset, size] of all named features of the archived genetic encoding
+        """
+        return self._description['encoding']['layout']
+
+    def _map_records(self, capacity=None):
+        if self._records is not None and self._mode != 'r':
+            self._records.flush()
+        if capacity is not None:
+            with open(self._path, 'r+b') as handle:
+                handle.truncate(self._header_size + capacity * self._record.itemsize)
+        capacity = (os.path.getsize(self._path) - self._header_size) // self._record.itemsize
+        # Gene codes viewing the previous mapping stay valid, they keep it open and share the same file pages
+        self._records = np.memmap(self._path, dtype=self._record, mode=self._mode if self._mode == 'r' else 'r+',
+                                  offset=self._header_size, shape=(capacity,))
+
+    def _mapped(self):
+        # Records are mapped on first access and remapped when other processes appended beyond the mapped size
+        if self._records is None or len(self._records) < self._size:
+            self._map_records()
+        return self._records
+
+    @property
+    def _size(self):
+        return int(self._count[0])
+
+    @_size.setter
+    def _size(self, size):
+        # Written after the records, so that readers never see codes which are not written yet
+        self._count[0] = size
+
+    @property
+    def _genomes(self):
+        return self._mapped()['genome']
+
+    @_genomes.setter
+    def _genomes(self, genomes):
+        raise ValueError('Archived populations store genomes of the fixed dtype %s, got %s' % (self._record['genome'].base, genomes.dtype))
+
+    @property
+    def _fitness(self):
+        return self._mapped()['fitness']
+
+    @property
+    def _age(self):
+        return self._mapped()['age']
+
+    @property
+    def _ids(self):
+        return self._mapped()['id']
+
+    def _reserve(self, additional):
+        if self._mode == 'r':
+            raise ValueError('Archive %s is opened read-only.' % self._path)
+        if not self._ids_resumed:
+            self._resume_ids()
+
+        required = self._size + additional
+        capacity = len(self._mapped())
+        if required > capacity:
+            self._map_records(max(required, 2 * capacity))
+
+    def _resume_ids(self):
+        # Codes appended by a resumed run must not reuse the ids of archived codes
+        if self._size > 0:
+            with Population._id_lock:
+                Population._next_id = max(Population._next_id, int(self.ids.max()) + 1)
+        self._ids_resumed = True
+
+    def flush(self):
+        """
+        Writes all changes of mapped records to the archive file.
+        """
+        if self._mode != 'r':
+            if self._records is not None:
+                self._records.flush()
+            self._count.flush()
+
+    def close(self):
+        """
+        Flushes and unmaps the archive, gene code views on it stay valid until they are released.
+        """
+        self.flush()
+        self._records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,331 @@
+"""
+Benchmarks of the hot paths of kayak with machine-readable results, so that runs can be compared between commits.
+
+Usage:
+```
+python -m kayak.bench --output results.json
+python -m kayak.bench --widths 4 16 --depths 1 3 --populations 100 10000 --benchmarks fits fits_batch
+```
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import itertools
+import contextlib
+import subprocess
+import numpy as np
+import kayak
+import kayak.feature_types as ft
+from .cache import FitnessCache, code_key, code_keys
+from .feature_types.permutation import FeaturePermutation
+from .feature_types.permutation import ImplicitListPermutationEncoder
+from .feature_types.permutation import RandomKeyPermutationEncoder
+from .feature_types import graph
+
+
+DEFAULT_WIDTHS = (4, 16, 64)
+DEFAULT_DEPTHS = (1, 2, 4)
+DEFAULT_POPULATIONS = (100, 1000, 10000)
+
+_BENCHMARKS = {}
+
+
+def _benchmark(name):
+    def register(function):
+        _BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def build_space(width: int, depth: int):
+    """
+    Builds a genetic encoding space of the given number of features per level and number of nested feature set levels.
+
+    :param width: number of leaf features on each level, alternating integer and float features
+    :param depth: number of levels, each level but the last contains a nested feature set
+    :rtype: kayak.GeneticEncoding
+    """
+    def level(remaining):
+        description = {}
+        for idx in range(width):
+            description['f%s' % idx] = ft.natint if idx % 2 == 0 else ft.unitfloat
+        if remaining > 1:
+            description['nested'] = ft.FeatureSet(level(remaining - 1))
+        return description
+
+    return kayak.GeneticEncoding('bench_w%s_d%s' % (width, depth), '0.1.0', level(depth))
+
+
+class _Case(object):
+    """
+    Shared fixtures of one point of the parameter sweep, built lazily so that benchmarks only pay for what they use.
+    """
+    def __init__(self, width, depth, population, rng):
+        self.width = width
+        self.depth = depth
+        self.population = population
+        self.rng = rng
+        self._space = None
+        self._compiled = None
+        self._matrix = None
+
+    @property
+    def space(self):
+        if self._space is None:
+            self._space = build_space(self.width, self.depth)
+        return self._space
+
+    @property
+    def compiled(self):
+        # Compiling switches the methods of a set to the generated functions, so the generic benchmarks keep their own space
+        if self._compiled is None:
+            self._compiled = build_space(self.width, self.depth).compile()
+        return self._compiled
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = self.space.sample_random_batch(self.population, rng=self.rng)
+        return self._matrix
+
+
+# Benchmarks return the number of processed items, the time of a call is measured around them
+
+@_benchmark('sample_random')
+def _bench_sample_random(case):
+    for _ in range(case.population):
+        case.space.sample_random(rng=case.rng)
+    return case.population
+
+
+@_benchmark('sample_random_batch')
+def _bench_sample_random_batch(case):
+    case.space.sample_random_batch(case.population, rng=case.rng)
+    return case.population
+
+
+@_benchmark('generate_random_chunks')
+def _bench_generate_random_chunks(case):
+    for _ in case.space.generate_random_chunks(case.population, chunk_size=1024, rng=case.rng, prefetch=2):
+        pass
+    return case.population
+
+
+@_benchmark('fits')
+def _bench_fits(case):
+    for code in case.matrix:
+        case.space.fits(code)
+    return case.population
+
+
+@_benchmark('fits_batch')
+def _bench_fits_batch(case):
+    case.space.fits_batch(case.matrix)
+    return case.population
+
+
+@_benchmark('sample_random_compiled')
+def _bench_sample_random_compiled(case):
+    for _ in range(case.population):
+        case.compiled.sample_random(rng=case.rng)
+    return case.population
+
+
+@_benchmark('fits_compiled')
+def _bench_fits_compiled(case):
+    for code in case.matrix:
+        case.compiled.fits(code)
+    return case.population
+
+
+@_benchmark('map_compiled')
+def _bench_map_compiled(case):
+    for code in case.matrix:
+        case.compiled.map(code)
+    return case.population
+
+
+@_benchmark('map')
+def _bench_map(case):
+    for code in case.matrix:
+        case.space.map(code)
+    return case.population
+
+
+@_benchmark('map_batch')
+def _bench_map_batch(case):
+    case.space.map_batch(case.matrix)
+    return case.population
+
+
+@_benchmark('gene_code_getitem')
+def _bench_gene_code_getitem(case):
+    for code in case.matrix:
+        gene_code = kayak.GeneCode(code, case.space)
+        gene_code['f0']
+        gene_code[case.width - 1]
+    return 2 * case.population
+
+
+@_benchmark('permutation_decode')
+def _bench_permutation_decode(case):
+    feature = FeaturePermutation(list(range(case.width)), encoder=ImplicitListPermutationEncoder)
+    codes = feature.sample_random_batch(case.population, rng=case.rng)
+    for code in codes:
+        feature.decode(code)
+    return case.population
+
+
+@_benchmark('permutation_decode_batch')
+def _bench_permutation_decode_batch(case):
+    feature = FeaturePermutation(list(range(case.width)), encoder=RandomKeyPermutationEncoder)
+    feature.decode_batch(feature.sample_random_batch(case.population, rng=case.rng))
+    return case.population
+
+
+@_benchmark('permutation_mutate_batch')
+def _bench_permutation_mutate_batch(case):
+    feature = FeaturePermutation(list(range(case.width)))
+    feature.mutate_batch(feature.sample_random_batch(case.population, rng=case.rng), method='swap', rng=case.rng)
+    return case.population
+
+
+@_benchmark('mutate_random')
+def _bench_mutate_random(case):
+    feature = ft.FloatType(0, 1)
+    for code in case.matrix[:, 1:2]:
+        feature.mutate_random(code, rng=case.rng)
+    return case.population
+
+
+@_benchmark('graph_mutate_batch')
+def _bench_graph_mutate_batch(case):
+    feature = graph.ErdosRenyiGraphType(8 * case.width, 0.1, encoding=graph.graph_encoding_packed)
+    feature.mutate_batch(feature.sample_random_batch(case.population, rng=case.rng), rate=0.01, rng=case.rng, in_place=True)
+    return case.population
+
+
+@_benchmark('cache_lookup')
+def _bench_cache_lookup(case):
+    keys = code_keys(case.space, case.matrix)
+    cache = FitnessCache(max_entries=len(keys) // 2)
+    for key in keys:
+        cache.put(key, 1.0)
+    for key in keys:
+        cache.get(key)
+    return case.population
+
+
+@_benchmark('code_key')
+def _bench_code_key(case):
+    for code in case.matrix:
+        code_key(kayak.GeneCode(code, case.space))
+    return case.population
+
+
+def _measure(function, case, repeat):
+    timings = []
+    items = 0
+    for _ in range(repeat):
+        # Benchmarked code must not mix its own output into machine-readable results
+        with contextlib.redirect_stdout(io.StringIO()):
+            time_start = time.perf_counter()
+            items = function(case)
+            timings.append(time.perf_counter() - time_start)
+    return timings, items
+
+
+def run_benchmarks(benchmarks=None, widths=DEFAULT_WIDTHS, depths=DEFAULT_DEPTHS, populations=DEFAULT_POPULATIONS, repeat: int=3,
+                   seed: int=0):
+    """
+    Runs the given benchmarks for every combination of space width, nesting depth and population size.
+    Failing benchmarks do not stop the run, their error is recorded in the result instead.
+
+    :param benchmarks: names of the benchmarks to run, defaults to all
+    :param widths: numbers of leaf features per level of the benchmark spaces
+    :param depths: numbers of nested levels of the benchmark spaces
+    :param populations: numbers of codes processed per measurement
+    :param repeat: number of measurements per combination, the best one is reported as seconds
+    :param seed: seed of the random generator for all sampled codes
+    :return: one result dictionary per benchmark and combination
+    :rtype: list
+    """
+    names = list(_BENCHMARKS) if benchmarks is None else list(benchmarks)
+    unknown = set(names) - set(_BENCHMARKS)
+    if unknown:
+        raise ValueError('Unknown benchmarks %s, expecting any of %s' % (', '.join(sorted(unknown)), ', '.join(_BENCHMARKS)))
+
+    results = []
+    for width, depth, population in itertools.product(widths, depths, populations):
+        case = _Case(width, depth, population, np.random.default_rng(seed))
+        for name in names:
+            result = {'benchmark': name, 'width': width, 'depth': depth, 'population': population, 'repeat': repeat}
+            try:
+                timings, items = _measure(_BENCHMARKS[name], case, repeat)
+            except Exception as e:
+                result.update({'seconds': None, 'seconds_per_item': None, 'timings': [], 'error': '%s: %s' % (type(e).__name__, e)})
+            else:
+                best = min(timings)
+                result.update({'seconds': best, 'seconds_per_item': best / max(items, 1), 'timings': timings, 'error': None})
+            results.append(result)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """
+    :return: description of the environment the benchmarks run in, for comparing results between machines and commits
+    :rtype: dict
+    """
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m kayak.bench', description='Benchmarks of the hot paths of kayak with JSON results.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(_BENCHMARKS), help='benchmarks to run, defaults to all')
+    parser.add_argument('--widths', nargs='+', type=int, default=list(DEFAULT_WIDTHS), help='leaf features per level of the space')
+    parser.add_argument('--depths', nargs='+', type=int, default=list(DEFAULT_DEPTHS), help='nested feature set levels of the space')
+    parser.add_argument('--populations', nargs='+', type=int, default=list(DEFAULT_POPULATIONS), help='codes per measurement')
+    parser.add_argument('--repeat', type=int, default=3, help='measurements per combination, the best one is reported')
+    parser.add_argument('--seed', type=int, default=0, help='seed for sampling the benchmarked codes')
+    parser.add_argument('--output', default='-', help='file for the JSON results, defaults to standard output')
+    args = parser.parse_args(argv)
+
+    report = {
+        'environment': environment(),
+        'results': run_benchmarks(args.benchmarks, args.widths, args.depths, args.populations, repeat=args.repeat, seed=args.seed)
+    }
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+
+    # Failures are recorded in the results, but must not go unnoticed in scripted runs
+    failures = [result for result in report['results'] if result['error'] is not None]
+    for result in failures:
+        sys.stderr.write('Benchmark %s failed for width=%s depth=%s population=%s: %s\n'
+                         % (result['benchmark'], result['width'], result['depth'], result['population'], result['error']))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,363 @@
+import os
+import sys
+import sqlite3
+import hashlib
+import weakref
+import threading
+import collections
+import numpy as np
+from . import export
+from .kayak import GeneticEncoding
+from .feature_types import FeatureType
+
+
+EVICTION_LRU = 'LRU'
+EVICTION_LFU = 'LFU'
+
+
+def _space_identity(space):
+    if isinstance(space, GeneticEncoding):
+        return space.name, str(space.version)
+    return str(space), ''
+
+
+def _as_code_array(code):
+    array = np.asarray(code)
+    if array.dtype.kind in 'biuf':
+        return array
+    # Converting mixed lists to numpy turns their numbers into strings, so non-numeric codes keep their python values in object arrays
+    return np.asarray(code, dtype=object)
+
+
+def _normalized_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (bool, int, float)) and float(value) == value:
+        # Numbers are hashed as floats like numeric codes, unless they are integers beyond float precision such as long permutation ranks
+        return float(value)
+    return value
+
+
+def _code_digest(code):
+    digest = hashlib.blake2b(digest_size=16)
+    if code.dtype.kind in 'biuf':
+        digest.update(np.ascontiguousarray(code, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    # Equal codes of a list, a string array or an object row of a population share their digest
+    values = [_normalized_value(value) for value in code.ravel()]
+    if all(type(value) is float for value in values):
+        digest.update(np.array(values, dtype=np.float64).tobytes())
+    else:
+        digest.update(repr(values).encode())
+    return digest.hexdigest()
+
+
+@export
+def code_key(gene_code):
+    """
+    Content-based key of a gene code, so that equal codes of the same encoding share their cache entries.
+    Numeric codes are hashed as float64 bytes, thus integer and float representations of the same code are equal.
+    Spaces with canonicalizing features (e.g. graph types with canonical=True) are hashed by their canonical form, so codes of equivalent
+    phenotypes share their cache entries as well.
+
+    :param gene_code: kayak.GeneCode within a genetic encoding space
+    :return: tuple of encoding name, encoding version and hex digest of the code
+    :rtype: tuple
+    """
+    space = gene_code.space
+    code = _as_code_array(gene_code)
+    if isinstance(space, FeatureType) and space.canonicalizes:
+        code = space.canonical_form(code)
+    return _space_identity(space) + (_code_digest(code),)
+
+
+@export
+def code_keys(space, matrix):
+    """
+    Keys of all codes of a matrix like code_key(), canonical forms are computed batched for all codes at once.
+
+    :param space: encoding space of the codes
+    :param matrix: two-dimensional numpy array with one code per row, or an object column of codes of a dynamically sized space
+    :return: list of keys in row order
+    :rtype: list
+    """
+    identity = _space_identity(space)
+    matrix = np.asarray(matrix)
+    if matrix.ndim == 1 and matrix.dtype == object:
+        # Codes of dynamically sized spaces differ in size, they are kept as one object per row
+        codes = [_as_code_array(code) for code in matrix]
+        if isinstance(space, FeatureType) and space.canonicalizes:
+            codes = [space.canonical_form(code) for code in codes]
+        return [identity + (_code_digest(code),) for code in codes]
+    if isinstance(space, FeatureType) and space.canonicalizes:
+        matrix = space.canonical_form_batch(matrix)
+    return [identity + (_code_digest(code),) for code in matrix]
+
+
+def _entry_size(key, fitness):
+    return sum(sys.getsizeof(part) for part in key) + sys.getsizeof(fitness)
+
+
+@export
+class FitnessCache(object):
+    """
+    Bounded in-memory mapping of code keys to fitness values.
+    If the maximum number of entries or bytes is exceeded, entries are evicted either least recently used (LRU) or least frequently used (LFU).
+    Hits, misses and evictions are counted. All operations are thread-safe.
+    """
+    def __init__(self, max_entries: int=None, max_bytes: int=None, eviction: str=EVICTION_LRU):
+        eviction = eviction.upper()
+        if eviction not in (EVICTION_LRU, EVICTION_LFU):
+            raise ValueError('Unknown eviction policy %s, expecting %s or %s.' % (eviction, EVICTION_LRU, EVICTION_LFU))
+
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._eviction = eviction
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # Entries map keys to (fitness, size, frequency)
+        # For LFU eviction, keys are additionally grouped by frequency in insertion order
+        self._entries = collections.OrderedDict()
+        self._frequencies = collections.defaultdict(collections.OrderedDict)
+        self._min_frequency = 0
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self):
+        """
+        :return: approximate memory used by keys and fitness values of all entries
+        """
+        return self._nbytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._touch(key)
+            return self._entries[key][0]
+
+    def put(self, key, fitness):
+        size = _entry_size(key, fitness)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self._max_bytes is not None and size > self._max_bytes or self._max_entries is not None and self._max_entries < 1:
+                return
+            # Evict before inserting, so that the new entry is never the victim
+            self._evict(additional_entries=1, additional_bytes=size)
+            self._entries[key] = (fitness, size, 1)
+            self._frequencies[1][key] = None
+            self._min_frequency = 1
+            self._nbytes += size
+
+    def _touch(self, key):
+        fitness, size, frequency = self._entries[key]
+        if self._eviction == EVICTION_LRU:
+            self._entries.move_to_end(key)
+            return
+
+        self._entries[key] = (fitness, size, frequency + 1)
+        del self._frequencies[frequency][key]
+        if len(self._frequencies[frequency]) < 1:
+            del self._frequencies[frequency]
+            if self._min_frequency == frequency:
+                self._min_frequency = frequency + 1
+        self._frequencies[frequency + 1][key] = None
+
+    def _remove(self, key):
+        _, size, frequency = self._entries.pop(key)
+        self._nbytes -= size
+        del self._frequencies[frequency][key]
+        if len(self._frequencies[frequency]) < 1:
+            del self._frequencies[frequency]
+            if len(self._frequencies) > 0 and self._min_frequency == frequency:
+                self._min_frequency = min(self._frequencies)
+
+    def _exceeded(self, additional_entries, additional_bytes):
+        if self._max_entries is not None and len(self._entries) + additional_entries > self._max_entries:
+            return True
+        return self._max_bytes is not None and self._nbytes + additional_bytes > self._max_bytes
+
+    def _evict(self, additional_entries, additional_bytes):
+        while len(self._entries) > 0 and self._exceeded(additional_entries, additional_bytes):
+            if self._eviction == EVICTION_LRU:
+                victim = next(iter(self._entries))
+            else:
+                victim = next(iter(self._frequencies[self._min_frequency]))
+            self._remove(victim)
+            self.evictions += 1
+
+    def stats(self):
+        return {'entries': len(self), 'bytes': self._nbytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # Locks can not be sent to worker processes
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _open_store(path, timeout):
+    connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('CREATE TABLE IF NOT EXISTS fitness ('
+                       'encoding TEXT NOT NULL, version TEXT NOT NULL, code_hash TEXT NOT NULL, fitness REAL, '
+                       'PRIMARY KEY (encoding, version, code_hash)) WITHOUT ROWID')
+    connection.commit()
+    return connection
+
+
+def _write_pending(connection, pending):
+    with connection:
+        connection.executemany('INSERT OR REPLACE INTO fitness (encoding, version, code_hash, fitness) VALUES (?, ?, ?, ?)',
+                               [(*key, fitness) for key, fitness in pending.items()])
+    pending.clear()
+
+
+def _flush_dropped_store(path, timeout, pending, pid):
+    # Runs when a store is garbage collected or at interpreter exit, pending writes belong to the process which buffered them
+    if len(pending) < 1 or os.getpid() != pid:
+        return
+    connection = _open_store(path, timeout)
+    try:
+        _write_pending(connection, pending)
+    finally:
+        connection.close()
+
+
+def _stored_fitness(value):
+    # SQLite stores NaN as NULL, but a NULL fitness is always a stored NaN and never a missing entry
+    return np.nan if value is None else value
+
+
+@export
+class SQLiteFitnessStore(object):
+    """
+    Persistent fitness store shared across runs and processes, backed by a SQLite database in WAL mode.
+    Fitness values are keyed by code keys, i.e. by encoding name, encoding version and code hash.
+    WAL mode lets readers proceed while another process writes, writes are collected and committed in batches.
+    Each process opens its own connection, copies sent to worker processes write through as workers may exit without notice.
+    Pending writes of a store which is dropped without close() are committed when it is garbage collected or the interpreter exits.
+    """
+    def __init__(self, path, batch_size: int=100, timeout: float=30.0):
+        self._path = str(path)
+        self._batch_size = batch_size
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._track_pending()
+
+    def _track_pending(self):
+        self._pending = {}
+        self._finalizer = weakref.finalize(self, _flush_dropped_store, self._path, self._timeout, self._pending, os.getpid())
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = _open_store(self._path, self._timeout)
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            row = self._connect().execute('SELECT fitness FROM fitness WHERE encoding = ? AND version = ? AND code_hash = ?', key).fetchone()
+        return default if row is None else _stored_fitness(row[0])
+
+    def put(self, key, fitness):
+        with self._lock:
+            self._pending[key] = fitness
+            if len(self._pending) >= self._batch_size:
+                self._flush()
+
+    def flush(self):
+        """
+        Commits all pending writes in a single transaction.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if len(self._pending) < 1:
+            return
+        _write_pending(self._connect(), self._pending)
+
+    def load(self, encoding: str=None, version: str=None, limit: int=None, batch_size: int=1000):
+        """
+        Iterates over all stored entries, optionally only of one encoding name and version.
+        Rows are streamed in batches, so that large stores are never held in memory at once.
+
+        :param limit: maximum number of entries, all by default
+        :param batch_size: number of rows fetched at once
+        :return: iterator over tuples of code key and fitness
+        """
+        query = 'SELECT encoding, version, code_hash, fitness FROM fitness'
+        conditions = [(column, value) for column, value in [('encoding', encoding), ('version', version)] if value is not None]
+        if len(conditions) > 0:
+            query += ' WHERE ' + ' AND '.join('%s = ?' % column for column, _ in conditions)
+        parameters = [value for _, value in conditions]
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters.append(limit)
+        self.flush()
+        with self._lock:
+            cursor = self._connect().execute(query, parameters)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if len(rows) < 1:
+                break
+            for encoding_name, encoding_version, code_hash, fitness in rows:
+                yield (encoding_name, encoding_version, code_hash), _stored_fitness(fitness)
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._connect().execute('SELECT COUNT(*) FROM fitness').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # Connections and locks stay in their process, pending writes are committed by their owning process
+        state = self.__dict__.copy()
+        state.update(_lock=None, _connection=None, _pid=None)
+        del state['_pending']
+        del state['_finalizer']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._batch_size = 1
+        self._track_pending()
@@ -0,0 +1,176 @@
+"""
+Specialized functions for the exact shape of a fixed-size feature set.
+The generic methods of a feature set dispatch on the type of each feature and recurse into nested sets for every single code.
+Compiling a set once generates straight-line Python source with the offsets, bounds and constants of all leaf features inlined.
+"""
+import math
+import numpy as np
+import kayak
+from ..rng import as_generator
+from .native import FeatureType
+from .native import FeatureSet
+from .native import IntegerType
+from .native import FloatType
+from .native import _is_integral
+
+
+def _leaves(space, offset=0):
+    """
+    Yields all leaf features of a fixed-size feature set with absolute offsets, nested feature sets are resolved recursively.
+    """
+    for ftype, position, size in space.layout().positions:
+        if isinstance(ftype, FeatureSet):
+            yield from _leaves(ftype, offset + position)
+        else:
+            yield ftype, offset + position, size
+
+
+def _overrides(ftype, cls, method):
+    """
+    :return: whether the given feature type replaces the method of cls, so that its inlined version can not be used
+    """
+    return not isinstance(ftype, cls) or getattr(type(ftype), method) is not getattr(cls, method)
+
+
+class _SourceBuilder(object):
+    def __init__(self):
+        self.namespace = {'np': np, 'kayak': kayak, '_is_integral': _is_integral}
+        self.lines = []
+
+    def literal(self, value, prefix):
+        """
+        Inlines simple values into the source, all other values are bound by name into the namespace of the generated functions.
+        """
+        if type(value) in (int, str, bool) or (type(value) is float and math.isfinite(value)):
+            return repr(value)
+        name = '%s_%s' % (prefix, len(self.namespace))
+        self.namespace[name] = value
+        return name
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    @property
+    def source(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+class CompiledFeatureSet(object):
+    """
+    Functions of a fixed-size feature set generated for its exact shape, created by FeatureSet.compile().
+    Provides the same results as the generic methods of the set without dispatching on feature types for each code.
+    The generated source is kept in the source attribute for inspection.
+    Sampling consumes a seeded generator in a different order than the generic methods, thus yields other codes for the same seed.
+    """
+
+    def __init__(self, space: FeatureSet, revision: int=None):
+        if space.dynamically_sized:
+            raise ValueError('Only fixed-size feature sets can be compiled, %s is dynamically sized.' % space)
+        self.space = space
+        self.revision = revision
+        self.size = space.layout().size
+
+        builder = _SourceBuilder()
+        leaves = list(_leaves(space))
+        self._generate_fits(builder, leaves)
+        self._generate_map(builder, space.layout())
+        self._generate_sample_random(builder, leaves)
+        self.source = builder.source
+
+        exec(compile(self.source, '<compiled feature set %s>' % id(space), 'exec'), builder.namespace)
+        self.fits = builder.namespace['fits']
+        self.map = builder.namespace['map']
+        self._sample_random = builder.namespace['sample_random']
+
+    def _generate_fits(self, builder, leaves):
+        builder.emit(0, 'def fits(code):')
+        # Leaf features check slices of the raw code, slices of a gene code address features instead of dimensions
+        builder.emit(1, 'if type(code) is kayak.GeneCode:')
+        builder.emit(2, 'code = code._code')
+        builder.emit(1, 'if len(code) < %s:' % self.size)
+        builder.emit(2, 'return False')
+        builder.emit(1, 'try:')
+        for ftype, offset, size in leaves:
+            if not isinstance(ftype, FeatureType):
+                condition = 'code[%s] == %s' % (offset, builder.literal(ftype, 'c'))
+            elif not _overrides(ftype, IntegerType, 'fits'):
+                # Python and numpy floats are checked directly, only other scalar types need the generic check
+                condition = ('(type(code[{0}]) is int or (isinstance(code[{0}], float) and code[{0}].is_integer()) or _is_integral(code[{0}])) '
+                             'and {1} <= code[{0}] <= {2}').format(
+                    offset, builder.literal(ftype._lower_border, 'c'), builder.literal(ftype._upper_border, 'c'))
+            elif not _overrides(ftype, FloatType, 'fits'):
+                condition = '{1} <= code[{0}] <= {2}'.format(
+                    offset, builder.literal(ftype._lower_border, 'c'), builder.literal(ftype._upper_border, 'c'))
+            else:
+                condition = '%s(code[%s:%s])' % (builder.literal(ftype.fits, 'fits'), offset, offset + size)
+            builder.emit(2, 'if not (%s):' % condition)
+            builder.emit(3, 'return False')
+        builder.emit(1, 'except (TypeError, ValueError, IndexError):')
+        builder.emit(2, 'return False')
+        builder.emit(1, 'return True')
+        builder.emit(0, '')
+
+    def _generate_map(self, builder, layout):
+        builder.emit(0, 'def map(code):')
+        builder.emit(1, 'if type(code) is kayak.GeneCode:')
+        builder.emit(2, 'code = code._code')
+        builder.emit(1, 'return {')
+        for name, (ftype, offset, size) in layout.names.items():
+            if isinstance(ftype, FeatureSet):
+                continue
+            if not isinstance(ftype, FeatureType) or (size == 1 and not _overrides(ftype, FeatureType, 'build')):
+                value = 'code[%s]' % offset
+            else:
+                value = '%s(code[%s:%s])' % (builder.literal(ftype.build, 'build'), offset, offset + size)
+            builder.emit(2, '%s: %s,' % (builder.literal(name, 'name'), value))
+        builder.emit(1, '}')
+        builder.emit(0, '')
+
+    def _generate_sample_random(self, builder, leaves):
+        # Bounds of all integer and float leaves are drawn with one vectorized call each, unlike the feature by feature draws of the
+        # generic method, so compiling changes the codes sampled from a seeded generator
+        integers = [ftype for ftype, _, _ in leaves if isinstance(ftype, FeatureType) and not _overrides(ftype, IntegerType, 'sample_random')]
+        floats = [ftype for ftype, _, _ in leaves if isinstance(ftype, FeatureType) and not _overrides(ftype, FloatType, 'sample_random')
+                  and _overrides(ftype, IntegerType, 'sample_random')]
+
+        builder.emit(0, 'def sample_random(rng):')
+        if integers:
+            builder.emit(1, 'integers = rng.integers(%s, %s, endpoint=True).tolist()' % (
+                builder.literal(np.array([ftype._lower_border for ftype in integers], dtype=np.int64), 'low'),
+                builder.literal(np.array([ftype._upper_border for ftype in integers], dtype=np.int64), 'high')))
+        if floats:
+            builder.emit(1, 'floats = rng.uniform(%s, %s).tolist()' % (
+                builder.literal(np.array([ftype._lower_border for ftype in floats], dtype=float), 'low'),
+                builder.literal(np.array([ftype._upper_border for ftype in floats], dtype=float), 'high')))
+        builder.emit(1, 'return [')
+        integer_index, float_index = 0, 0
+        for ftype, offset, size in leaves:
+            if not isinstance(ftype, FeatureType):
+                builder.emit(2, '%s,' % builder.literal(ftype, 'c'))
+            elif not _overrides(ftype, IntegerType, 'sample_random'):
+                builder.emit(2, 'integers[%s],' % integer_index)
+                integer_index += 1
+            elif not _overrides(ftype, FloatType, 'sample_random'):
+                builder.emit(2, 'floats[%s],' % float_index)
+                float_index += 1
+            else:
+                builder.emit(2, '*np.ravel(%s(rng=rng)),' % builder.literal(ftype.sample_random, 'sample'))
+        builder.emit(1, ']')
+        builder.emit(0, '')
+
+    def sample_random(self, rng=None):
+        """
+        :param rng: numpy.random.Generator or seed, None draws from the default generator of this process
+        :return: randomly sampled code of the compiled feature set
+        :rtype: kayak.GeneCode
+        """
+        return kayak.GeneCode(self._sample_random(as_generator(rng)), self.space, validate=False)
+
+    def fits_batch(self, matrix):
+        return self.space.fits_batch(matrix)
+
+    def sample_random_batch(self, n, rng=None, out=None):
+        return self.space.sample_random_batch(n, rng=rng, out=out)
+
+    def __len__(self):
+        return self.size
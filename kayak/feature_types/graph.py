@@ -1,7 +1,11 @@
 import numpy as np
 import math
+import functools
+import itertools
 import kayak
 from .. import export
+from ..rng import as_generator
+from .native import _as_code_matrix
 
 try:
     import networkx as nx
@@ -9,73 +13,658 @@ try:
 except ImportError:
     KAYAK_NETWORKX = False
 
+
+graph_encoding_dense = 'DENSE'  # flattened n*n adjacency matrix
+graph_encoding_triangle = 'TRIANGLE'  # upper triangle of the adjacency matrix, one 0/1 value per node pair
+graph_encoding_packed = 'PACKED'  # upper triangle of the adjacency matrix, eight edges per byte
+graph_encodings = (graph_encoding_dense, graph_encoding_triangle, graph_encoding_packed)
+
+
+@functools.lru_cache(maxsize=32)
+def _triangle_indices(nodes):
+    """
+    :return: row and column indices of the strict upper triangle of an adjacency matrix, shared by all codes of a size
+    """
+    rows, columns = np.triu_indices(nodes, k=1)
+    rows.flags.writeable = False
+    columns.flags.writeable = False
+    return rows, columns
+
+
+def _packed_length(nodes):
+    return (nodes * (nodes - 1) // 2 + 7) // 8
+
+
+def _pack_triangle(adjacency):
+    """
+    :param adjacency: array of shape (..., nodes, nodes)
+    :return: upper triangles bit-packed into uint8 arrays of shape (..., packed length)
+    """
+    adjacency = np.asarray(adjacency)
+    rows, columns = _triangle_indices(adjacency.shape[-1])
+    return np.packbits(adjacency[..., rows, columns] != 0, axis=-1)
+
+
+def _unpack_triangle(packed, nodes):
+    """
+    :param packed: bit-packed upper triangles of shape (..., packed length), also accepts bytes stored in float buffers
+    :return: boolean edge flags of shape (..., nodes*(nodes-1)/2) in the order of _triangle_indices()
+    """
+    packed = np.asarray(packed)
+    if packed.dtype != np.uint8:
+        packed = packed.astype(np.uint8)
+    return np.unpackbits(packed, axis=-1, count=nodes * (nodes - 1) // 2).astype(bool)
+
+
+def _triangle_to_adjacency(edges, nodes, symmetric=True):
+    """
+    :param edges: boolean edge flags of shape (..., nodes*(nodes-1)/2)
+    :return: adjacency matrices of shape (..., nodes, nodes)
+    """
+    rows, columns = _triangle_indices(nodes)
+    adjacency = np.zeros(edges.shape[:-1] + (nodes, nodes), dtype=np.uint8)
+    adjacency[..., rows, columns] = edges
+    if symmetric:
+        adjacency[..., columns, rows] = edges
+    return adjacency
+
+
+# Below this edge probability, skipping over absent edges draws far fewer random numbers than one uniform value per node pair
+_GEOMETRIC_SKIPPING_PROBABILITY = 0.1
+
+
+def _geometric_edge_positions(number, pairs, probability, rng):
+    """
+    Draws the positions of present edges by geometric skipping: the gaps between consecutive edges of a Bernoulli sequence are geometrically
+    distributed, so only about pairs*probability random numbers are needed per graph.
+
+    :return: graph indices and pair positions of all present edges
+    """
+    expected = pairs * probability
+    draws = int(expected + 4 * math.sqrt(expected) + 8)
+    graph_indices, positions = [], []
+    last_position = np.full(number, -1, dtype=np.int64)
+    active = np.arange(number)
+    while active.size:
+        candidates = last_position[active, None] + np.cumsum(rng.geometric(probability, size=(active.size, draws)), axis=1)
+        present = candidates < pairs
+        graph_indices.append(np.broadcast_to(active[:, None], candidates.shape)[present])
+        positions.append(candidates[present])
+        # Graphs whose drawn edges did not reach the last pair continue with another round
+        last_position[active] = candidates[:, -1]
+        active = active[candidates[:, -1] < pairs]
+    return np.concatenate(graph_indices), np.concatenate(positions)
+
+
+def _sample_edge_flags(number, pairs, probability, rng):
+    """
+    :return: boolean matrix of shape (number, pairs) with independently drawn edges
+    """
+    if probability >= _GEOMETRIC_SKIPPING_PROBABILITY:
+        return rng.random((number, pairs)) < probability
+    flags = np.zeros((number, pairs), dtype=bool)
+    if probability > 0 and pairs > 0:
+        flags[_geometric_edge_positions(number, pairs, probability, rng)] = True
+    return flags
+
+
+def _write_edge_flags(flags, nodes, encoding, out, symmetric=True):
+    """
+    Writes edge flags in the order of _triangle_indices() as codes of the given encoding into out.
+    """
+    if encoding == graph_encoding_packed:
+        out[...] = np.packbits(flags, axis=1)
+        return out
+    if encoding == graph_encoding_triangle:
+        out[...] = flags
+        return out
+    rows, columns = _triangle_indices(nodes)
+    out[...] = 0
+    out[:, rows * nodes + columns] = flags
+    if symmetric:
+        out[:, columns * nodes + rows] = flags
+    return out
+
+
+def _edge_flags(codes, nodes, encoding):
+    """
+    :param codes: code or matrix of codes in the given encoding
+    :return: boolean edge flags of shape (..., nodes*(nodes-1)/2) in the order of _triangle_indices()
+    """
+    codes = np.asarray(codes)
+    if encoding == graph_encoding_packed:
+        return _unpack_triangle(codes, nodes)
+    if encoding == graph_encoding_triangle:
+        return codes != 0
+    rows, columns = _triangle_indices(nodes)
+    return codes[..., rows * nodes + columns] != 0
+
+
+# Above this flip rate, positions are drawn by ordering all node pairs of each code instead of rejecting repeated positions
+_DENSE_FLIP_RATE = 0.25
+
+
+def _sample_flip_positions(number, pairs, rate, rng):
+    """
+    Draws the number of flipped edges per code from a binomial distribution and their positions without replacement, vectorized over all
+    codes. For sparse rates positions are drawn in bulk and repeats within a code are redrawn, so the cost is proportional to the number of
+    flips and not to the number of node pairs.
+
+    :return: code indices and pair positions of all flips, positions are distinct within each code
+    """
+    counts = rng.binomial(pairs, rate, size=number)
+    code_indices = np.repeat(np.arange(number, dtype=np.int64), counts)
+    if rate > _DENSE_FLIP_RATE:
+        # The first count positions of a random order of each code, in row-major order like the code indices
+        order = np.argsort(rng.random((number, pairs)), axis=1)
+        return code_indices, order[np.arange(pairs) < counts[:, None]].astype(np.int64)
+
+    positions = rng.integers(pairs, size=len(code_indices), dtype=np.int64)
+    while True:
+        _, first = np.unique(code_indices * pairs + positions, return_index=True)
+        repeated = np.ones(len(positions), dtype=bool)
+        repeated[first] = False
+        if not repeated.any():
+            return code_indices, positions
+        positions[repeated] = rng.integers(pairs, size=np.count_nonzero(repeated), dtype=np.int64)
+
+
+def _flip_edges(codes, code_indices, positions, nodes, encoding, symmetric=True):
+    """
+    Flips the given edges of a code matrix in place, touching only the affected entries.
+    """
+    if encoding == graph_encoding_triangle:
+        codes[code_indices, positions] = 1 - codes[code_indices, positions]
+        return codes
+    if encoding == graph_encoding_dense:
+        rows, columns = _triangle_indices(nodes)
+        for flat in (rows[positions] * nodes + columns[positions],) + ((columns[positions] * nodes + rows[positions],) if symmetric else ()):
+            codes[code_indices, flat] = 1 - codes[code_indices, flat]
+        return codes
+
+    # Several flips may hit the same byte, their bit masks are distinct and can be combined by summation before a single XOR
+    masks = np.left_shift(1, 7 - positions % 8)
+    keys, inverse = np.unique(code_indices * codes.shape[1] + positions // 8, return_inverse=True)
+    combined = np.bincount(inverse, weights=masks).astype(np.uint8)
+    byte_codes, byte_positions = np.divmod(keys, codes.shape[1])
+    codes[byte_codes, byte_positions] = codes[byte_codes, byte_positions].astype(np.uint8) ^ combined
+    return codes
+
+
+def _uniform_crossover_mask(rng, number, nodes):
+    return rng.random((number, nodes * (nodes - 1) // 2)) < 0.5
+
+
+def _block_crossover_mask(rng, number, nodes):
+    # A contiguous range of node pairs in row-major order, i.e. the outgoing edges of a range of nodes
+    pairs = nodes * (nodes - 1) // 2
+    cuts = np.sort(rng.integers(0, pairs + 1, size=(number, 2)), axis=1)
+    positions = np.arange(pairs)
+    return (positions >= cuts[:, :1]) & (positions < cuts[:, 1:])
+
+
+def _subgraph_crossover_mask(rng, number, nodes):
+    # All edges among a random subset of nodes, which keeps the induced subgraph of the first parent intact
+    rows, columns = _triangle_indices(nodes)
+    selected = rng.random((number, nodes)) < 0.5
+    return selected[:, rows] & selected[:, columns]
+
+
+GRAPH_CROSSOVERS = {
+    'uniform': _uniform_crossover_mask,
+    'block': _block_crossover_mask,
+    'subgraph': _subgraph_crossover_mask
+}
+
+
+# Up to this number of nodes, canonical forms are exact by trying all node permutations, larger graphs keep their edges or opt into hashes
+_EXACT_CANONICAL_NODES = 7
+
+
+# Upper bound of permutation scores held at once when canonicalizing a batch of small graphs
+_CANONICAL_BATCH_SCORES = 1 << 22
+
+
+@functools.lru_cache(maxsize=16)
+def _relabelling_weights(nodes, symmetric):
+    """
+    Weights of the adjacency entries for every node permutation, such that the product of a flattened adjacency matrix with them yields the
+    adjacency bits of each relabelled graph read as one number. Up to seven nodes these numbers have at most 42 bits and are exact in float64.
+
+    :return: matrix of shape (nodes*nodes, nodes!) and number of bits
+    """
+    if symmetric:
+        rows, columns = _triangle_indices(nodes)
+    else:
+        rows, columns = np.nonzero(~np.eye(nodes, dtype=bool))
+    permutations = np.array(list(itertools.permutations(range(nodes))), dtype=np.intp).reshape(-1, nodes)
+    weights = np.zeros((nodes * nodes, len(permutations)))
+    # Within one permutation all node pairs map to distinct adjacency entries, so no weights add up
+    entries = permutations[:, rows] * nodes + permutations[:, columns]
+    weights[entries, np.arange(len(permutations))[:, None]] = 2.0 ** np.arange(len(rows) - 1, -1, -1)
+    weights.flags.writeable = False
+    return weights, len(rows)
+
+
+def _exact_canonical_forms(edges, nodes, symmetric):
+    """
+    Relabels small graphs by the node permutation whose adjacency bits form the largest number, vectorized over all graphs.
+    The largest number already is the canonical adjacency bit string, so only the numbers of all permutations are computed.
+
+    :param edges: boolean edge flags of shape (m, nodes*(nodes-1)/2)
+    :return: bit-packed canonical forms of shape (m, bytes)
+    :rtype: np.ndarray
+    """
+    weights, bits = _relabelling_weights(nodes, symmetric)
+    adjacency = _triangle_to_adjacency(edges, nodes, symmetric=symmetric).reshape(len(edges), nodes * nodes).astype(float)
+    best = np.empty(len(edges), dtype=np.int64)
+    chunk = max(1, _CANONICAL_BATCH_SCORES // weights.shape[1])
+    for start in range(0, len(edges), chunk):
+        best[start:start + chunk] = (adjacency[start:start + chunk] @ weights).max(axis=1)
+    shifts = np.arange(bits - 1, -1, -1, dtype=np.int64)
+    return np.packbits((best[:, None] >> shifts) & 1, axis=1)
+
+
+@functools.lru_cache(maxsize=4096)
+def _canonical_graph_form(packed_edges, nodes, symmetric, hashed=False):
+    """
+    Canonical form of a graph given by its bit-packed upper triangle, cached per genome.
+    Small graphs are relabelled by the node permutation whose adjacency bits form the largest number, which is equal for exactly the
+    isomorphic graphs. Larger graphs keep their exact edges, unless hashed is set: then they are represented by their Weisfeiler-Lehman hash,
+    which is equal for isomorphic graphs but may collide for some non-isomorphic ones.
+
+    :return: canonical form as bytes
+    """
+    edges = _unpack_triangle(np.frombuffer(packed_edges, dtype=np.uint8), nodes)
+    if nodes <= _EXACT_CANONICAL_NODES:
+        return _exact_canonical_forms(edges.reshape(1, -1), nodes, symmetric)[0].tobytes()
+    if not hashed:
+        return packed_edges
+
+    adjacency = _triangle_to_adjacency(edges, nodes, symmetric=symmetric)
+    graph = nx.from_numpy_array(adjacency, create_using=nx.Graph if symmetric else nx.DiGraph)
+    return bytes.fromhex(nx.weisfeiler_lehman_graph_hash(graph, iterations=3, digest_size=16))
+
+
+def _binary_fits_batch(matrix, width):
+    if matrix.shape[1] != width:
+        return np.zeros(len(matrix), dtype=bool)
+    return ((matrix == 0) | (matrix == 1)).all(axis=1)
+
+
+def _adjacency_fits_batch(adjacency, symmetric=True):
+    """
+    Checks adjacency matrices of shape (m, nodes, nodes) for binary values and an empty diagonal, and either for symmetry (undirected graphs)
+    or for an empty lower triangle (directed acyclic graphs in topological order).
+    """
+    if adjacency.dtype == object:
+        adjacency = adjacency.astype(float)
+    valid = ((adjacency == 0) | (adjacency == 1)).all(axis=(1, 2))
+    valid &= ~np.diagonal(adjacency, axis1=1, axis2=2).any(axis=1)
+    if symmetric:
+        valid &= (adjacency == np.swapaxes(adjacency, 1, 2)).all(axis=(1, 2))
+    else:
+        rows, columns = np.tril_indices(adjacency.shape[1], k=-1)
+        valid &= ~adjacency[:, rows, columns].any(axis=1)
+    return valid
+
+
+def _packed_fits_batch(matrix, nodes):
+    """
+    Checks bit-packed codes for the expected length, byte values and unused padding bits.
+    """
+    if matrix.shape[1] != _packed_length(nodes):
+        return np.zeros(len(matrix), dtype=bool)
+    if matrix.shape[1] < 1:
+        return np.ones(len(matrix), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        valid = ((matrix >= 0) & (matrix <= 255) & (matrix == np.floor(matrix))).all(axis=1)
+    padding = matrix.shape[1] * 8 - nodes * (nodes - 1) // 2
+    last_byte = np.where(valid, matrix[:, -1], 0).astype(np.uint8)
+    return valid & (last_byte & np.uint8((1 << padding) - 1) == 0)
+
+
 if KAYAK_NETWORKX:
-    @export
-    class ErdosRenyiGraphType(kayak.FeatureType):
-        def __init__(self, nodes, connection_probability):
+    class _AdjacencyGraphType(kayak.FeatureType):
+        """
+        Common base of graph feature types with a fixed number of nodes whose codes are adjacency matrices or their upper triangles.
+        All operators work on the edge flags of the upper triangle, so they never need to build networkx graphs.
+        """
+        _symmetric = True
+
+        def __init__(self, nodes, connection_probability, encoding, canonical=False, canonical_hash=False):
+            if encoding not in graph_encodings:
+                raise ValueError('Unknown graph encoding %s, expecting one of %s' % (encoding, ', '.join(graph_encodings)))
             self._nodes = int(nodes)
             self._prob = float(connection_probability)
+            self._encoding = encoding
+            self._canonical = bool(canonical)
+            self._canonical_hash = bool(canonical_hash)
+
+        @property
+        def nodes(self):
+            return self._nodes
+
+        @property
+        def encoding(self):
+            return self._encoding
+
+        @property
+        def pairs(self):
+            """
+            :return: number of node pairs which may be connected by an edge
+            """
+            return self._nodes * (self._nodes - 1) // 2
+
+        def edge_flags(self, codes):
+            """
+            :return: boolean edge flags of the upper triangle for a code or a matrix of codes, independent of the encoding
+            :rtype: np.ndarray
+            """
+            return _edge_flags(codes, self._nodes, self._encoding)
+
+        def encode_edge_flags(self, flags, out=None):
+            """
+            :param flags: boolean edge flags of shape (m, pairs)
+            :return: matrix of shape (m, len(self)) with the codes in the encoding of this feature type
+            :rtype: np.ndarray
+            """
+            flags = np.asarray(flags, dtype=bool)
+            if out is None:
+                out = np.empty((len(flags), len(self)), dtype=np.uint8 if self._encoding == graph_encoding_packed else float)
+            return _write_edge_flags(flags, self._nodes, self._encoding, out, symmetric=self._symmetric)
+
+        @property
+        def canonicalizes(self):
+            return self._canonical
+
+        def canonical_form(self, code):
+            """
+            :return: canonical form of the graph which is equal for all codes of isomorphic graphs with up to seven nodes, the exact edges of
+                larger graphs or their Weisfeiler-Lehman hash if enabled, the code itself unless canonicalization is enabled
+            :rtype: np.ndarray
+            """
+            if not self._canonical:
+                return np.asarray(code)
+            packed_edges = np.packbits(self.edge_flags(code)).tobytes()
+            return np.frombuffer(_canonical_graph_form(packed_edges, self._nodes, self._symmetric, self._canonical_hash), dtype=np.uint8)
+
+        def canonical_form_batch(self, matrix):
+            """
+            Canonical forms of all rows like canonical_form(), computed at once for graphs of up to seven nodes and for exact edges.
+            Only hashed canonical forms of larger graphs are computed row by row.
+            """
+            matrix = _as_code_matrix(matrix)
+            if not self._canonical:
+                return matrix
+            if self._nodes > _EXACT_CANONICAL_NODES and self._canonical_hash:
+                return super().canonical_form_batch(matrix)
+            flags = self.edge_flags(matrix)
+            if self._nodes > _EXACT_CANONICAL_NODES:
+                return np.packbits(flags, axis=1)
+            return _exact_canonical_forms(flags, self._nodes, self._symmetric)
+
+        def to_adjacency(self, code):
+            """
+            :return: adjacency matrix of shape (nodes, nodes) for a code in the encoding of this feature type
+            :rtype: np.ndarray
+            """
+            code = np.asarray(code)
+            if self._encoding == graph_encoding_dense:
+                return code.reshape(self._nodes, self._nodes)
+            return _triangle_to_adjacency(self.edge_flags(code), self._nodes, symmetric=self._symmetric)
+
+        def _edges(self, code):
+            rows, columns = _triangle_indices(self._nodes)
+            flags = self.edge_flags(code)
+            return rows[flags].tolist(), columns[flags].tolist()
+
+        def build(self, code):
+            return self.to_networkx(code)
 
         def fits(self, code):
-            code_size = len(code)
-            nodes = math.sqrt(code_size)
-            if nodes % 1 != 0:
-                # We have no quadratic code size, so it is no valid adjacency matrix for a graph
-                return False
-            nodes = int(nodes)  # make sure it is an integer
+            code = np.asarray(code)
+            if code.ndim == 2 and self._encoding == graph_encoding_dense:
+                code = code.ravel()
+            return code.ndim == 1 and bool(self.fits_batch(code.reshape(1, -1))[0])
+
+        def fits_batch(self, matrix):
+            matrix = _as_code_matrix(matrix)
+            if self._encoding == graph_encoding_packed:
+                return _packed_fits_batch(matrix, self._nodes)
+            if self._encoding == graph_encoding_triangle:
+                return _binary_fits_batch(matrix, self.pairs)
+            if matrix.shape[1] != self._nodes * self._nodes:
+                return np.zeros(len(matrix), dtype=bool)
+            # Reshaping is a zero-copy view, no networkx graph is built for validation
+            return _adjacency_fits_batch(matrix.reshape(len(matrix), self._nodes, self._nodes), symmetric=self._symmetric)
+
+        def sample_random(self, rng=None):
+            """
+            :return: adjacency matrix of shape (nodes, nodes) for the dense encoding, otherwise the (bit-packed) upper triangle
+            :rtype: np.ndarray
+            """
+            code = self.sample_random_batch(1, rng=rng)[0]
+            if self._encoding == graph_encoding_dense:
+                return code.reshape(self._nodes, self._nodes)
+            return code
+
+        def sample_random_batch(self, n, rng=None, out=None):
+            """
+            Samples n graphs at once without networkx, sparse graphs by geometric skipping and dense graphs by a Bernoulli matrix.
+
+            :param n: number of graphs
+            :param rng: numpy.random.Generator or seed
+            :param out: optional matrix of shape (n, len(self)) to write the codes into, e.g. columns of a population buffer
+            :return: matrix of shape (n, len(self)) with one code in the encoding of this feature type per row, out if given
+            :rtype: np.ndarray
+            """
+            if out is not None and out.shape != (n, len(self)):
+                raise ValueError('Expecting output matrix of shape %s, got %s' % ((n, len(self)), out.shape))
+            return self.encode_edge_flags(_sample_edge_flags(n, self.pairs, self._prob, as_generator(rng)), out=out)
+
+        def cross_over(self, code1, code2, rng=None):
+            """
+            :return: offspring code which inherits each edge from either parent with equal probability
+            :rtype: np.ndarray
+            """
+            return self.cross_over_batch(np.reshape(code1, (1, -1)), np.reshape(code2, (1, -1)), rng=rng)[0]
 
-            if nodes > self._nodes:
-                # Graph is too big for this feature type
-                return False
+        def cross_over_batch(self, parents1, parents2, method: str='uniform', rng=None):
+            """
+            Edge crossover of each pair of rows on the upper triangle, independent of the encoding:
+            'uniform' inherits every edge from either parent with equal probability, 'block' inherits a contiguous range of node pairs (the
+            outgoing edges of a range of nodes) from the first parent and 'subgraph' inherits all edges among a random subset of nodes from the
+            first parent. All other edges come from the second parent.
 
-            numpy_matrix = np.reshape(np.array(code), [nodes, nodes])
-            nx.from_numpy_array(numpy_matrix)
-            return True
+            :param parents1: matrix with one code per row
+            :param parents2: matrix with one code per row
+            :param method: one of 'uniform', 'block' or 'subgraph'
+            :param rng: numpy.random.Generator or seed
+            :return: matrix with one offspring code per row
+            :rtype: np.ndarray
+            """
+            if method not in GRAPH_CROSSOVERS:
+                raise ValueError('Unknown graph crossover %s, expecting one of %s' % (method, ', '.join(GRAPH_CROSSOVERS)))
+            parents1 = _as_code_matrix(parents1)
+            parents2 = _as_code_matrix(parents2)
+            if parents1.shape != parents2.shape:
+                raise ValueError('Expecting parents of equal shape, got %s and %s' % (parents1.shape, parents2.shape))
+            inherit = GRAPH_CROSSOVERS[method](as_generator(rng), len(parents1), self._nodes)
+            flags = np.where(inherit, self.edge_flags(parents1), self.edge_flags(parents2))
+            return self.encode_edge_flags(flags).astype(np.result_type(parents1, parents2), copy=False)
 
-        def sample_random(self):
+        def mutate_random(self, code, rng=None):
             """
-            :return:
+            :return: mutated code, for the dense encoding in the shape of the given code, e.g. an adjacency matrix from sample_random
             :rtype: np.ndarray
             """
-            sampled_graph = nx.erdos_renyi_graph(self._nodes, self._prob)
-            return nx.to_numpy_array(sampled_graph)
+            code = np.asarray(code)
+            if code.ndim == 2 and self._encoding == graph_encoding_dense:
+                return self._wrap_mutate_random(code.ravel(), as_generator(rng)).reshape(code.shape)
+            return self._wrap_mutate_random(code, as_generator(rng))
 
-        def cross_over(self, code1, code2):
+        def _mutate_random(self, code, rng):
+            return self.mutate_batch(np.reshape(code, (1, -1)), rng=rng)[0]
+
+        def mutate_batch(self, codes, rate=None, rng=None, in_place: bool=False):
             """
+            Flips each potential edge independently. The flips are drawn as a binomial count of distinct positions per code and applied
+            directly on the encoded codes, so the cost is proportional to the number of flipped edges instead of the number of node pairs.
 
-            :param code1:
-            :type code1 kayak.GeneCode|list|numpy.array
-            :param code2:
-            :type code2 kayak.GeneCode|list|numpy.array
-            :return:
-            :rtype: kayak.GeneCode
+            :param codes: matrix with one code per row
+            :param rate: probability to flip an edge, by default one edge is flipped per code on average
+            :param rng: numpy.random.Generator or seed
+            :param in_place: whether to flip the edges in the given matrix instead of a copy, e.g. within a population buffer
+            :return: matrix with one mutated code per row
+            :rtype: np.ndarray
             """
-            raise NotImplementedError()
+            codes = _as_code_matrix(codes)
+            if codes.shape[1] != len(self):
+                raise ValueError('Expecting codes of size %s, got shape %s' % (len(self), codes.shape))
+            if not in_place:
+                codes = codes.copy()
+            rate = 1 / max(self.pairs, 1) if rate is None else float(rate)
+            code_indices, positions = _sample_flip_positions(len(codes), self.pairs, rate, as_generator(rng))
+            return _flip_edges(codes, code_indices, positions, self._nodes, self._encoding, symmetric=self._symmetric)
+
+        @property
+        def dynamically_sized(self):
+            return False
+
+        @property
+        def min_size(self):
+            return len(self)
+
+        @property
+        def max_size(self):
+            return len(self)
 
         def __len__(self):
-            return self._nodes
+            if self._encoding == graph_encoding_packed:
+                return _packed_length(self._nodes)
+            if self._encoding == graph_encoding_triangle:
+                return self.pairs
+            return self._nodes * self._nodes
 
 
     @export
-    class DAGraphType(kayak.FeatureType):
-        def __init__(self, graph: nx.DiGraph):
+    class ErdosRenyiGraphType(_AdjacencyGraphType):
+        def __init__(self, nodes, connection_probability, encoding=graph_encoding_dense, canonical: bool=False, canonical_hash: bool=False):
+            """
+            :param nodes: number of nodes of the graphs
+            :param connection_probability: probability of each undirected edge
+            :param encoding: graph_encoding_dense for a flattened adjacency matrix, graph_encoding_triangle for its upper triangle or
+                graph_encoding_packed for the bit-packed upper triangle. Packed codes are 64 times smaller than triangle codes only in uint8
+                matrices, e.g. of kayak.Population(space, dtype=np.uint8). In float64 matrices such as the default population each byte takes
+                eight bytes again, so packed codes are about 16 times smaller than dense and 8 times smaller than triangle codes
+            :param canonical: whether isomorphic graphs share their canonical form and thus their cached fitness
+            :param canonical_hash: whether isomorphic graphs of more than seven nodes share their Weisfeiler-Lehman hash as canonical form,
+                which may collide for non-isomorphic graphs, so that they would share a wrong cached fitness
+            """
+            super().__init__(nodes, connection_probability, encoding, canonical=canonical, canonical_hash=canonical_hash)
+
+        def encode(self, adjacency):
+            """
+            :param adjacency: networkx graph or (batch of) adjacency matrices of shape (..., nodes, nodes)
+            :return: code(s) in the encoding of this feature type
+            :rtype: np.ndarray
+            """
+            if isinstance(adjacency, nx.Graph):
+                adjacency = nx.to_numpy_array(adjacency, nodelist=sorted(adjacency.nodes()))
+            adjacency = np.asarray(adjacency)
+            if self._encoding == graph_encoding_packed:
+                return _pack_triangle(adjacency)
+            if self._encoding == graph_encoding_triangle:
+                rows, columns = _triangle_indices(self._nodes)
+                return (adjacency[..., rows, columns] != 0).astype(float)
+            return adjacency.reshape(adjacency.shape[:-2] + (self._nodes * self._nodes,))
+
+        def to_networkx(self, code):
+            """
+            :return: undirected graph for a code in the encoding of this feature type
+            :rtype: nx.Graph
+            """
+            graph = nx.Graph()
+            graph.add_nodes_from(range(self._nodes))
+            graph.add_edges_from(zip(*self._edges(code)))
+            return graph
+
+        def __str__(self):
+            return 'erdos_renyi(%s, %s)' % (self._nodes, self._prob)
+
+
+    @export
+    class DAGraphType(_AdjacencyGraphType):
+        """
+        Directed acyclic graphs over a fixed topological order of their nodes. Codes only contain edges from earlier to later nodes, i.e. the
+        strict upper triangle of the adjacency matrix, so every code is acyclic by construction and neither validation nor the operators need
+        any cycle detection.
+        """
+        _symmetric = False
+
+        def __init__(self, graph, connection_probability=None, encoding=graph_encoding_triangle, canonical: bool=False,
+                     canonical_hash: bool=False):
+            """
+            :param graph: number of nodes or a template nx.DiGraph whose topological order and labels are used for the nodes
+            :param connection_probability: probability of each forward edge, by default the edge density of the template graph or 0.5
+            :param encoding: graph_encoding_triangle for one 0/1 value per node pair, graph_encoding_packed for the bit-packed pairs or
+                graph_encoding_dense for a flattened adjacency matrix with an empty lower triangle
+            :param canonical: whether isomorphic graphs (ignoring the node labels) share their canonical form and thus their cached fitness
+            :param canonical_hash: whether isomorphic graphs of more than seven nodes share their Weisfeiler-Lehman hash as canonical form,
+                which may collide for non-isomorphic graphs, so that they would share a wrong cached fitness
+            """
             if graph is None:
                 raise ValueError('No graph given')
 
-            numpy_matrix = nx.to_numpy_matrix(graph)
+            if isinstance(graph, nx.DiGraph):
+                if not nx.is_directed_acyclic_graph(graph):
+                    raise ValueError('Template graph has to be acyclic')
+                self._labels = list(nx.topological_sort(graph))
+                if connection_probability is None:
+                    possible_edges = len(self._labels) * (len(self._labels) - 1) / 2
+                    connection_probability = graph.number_of_edges() / possible_edges if possible_edges > 0 else 0.5
+            else:
+                self._labels = list(range(int(graph)))
+            super().__init__(len(self._labels), 0.5 if connection_probability is None else connection_probability, encoding, canonical=canonical,
+                             canonical_hash=canonical_hash)
 
+        @property
+        def labels(self):
+            """
+            :return: node labels in topological order
+            """
+            return list(self._labels)
 
-        def cross_over(self, code1, code2):
-            raise NotImplementedError()
-
-        def _mutate_random(self, code):
-            raise NotImplementedError()
+        def encode(self, graph):
+            """
+            :param graph: nx.DiGraph with the node labels of this feature type, every edge has to follow their topological order
+            :return: code in the encoding of this feature type
+            :rtype: np.ndarray
+            """
+            order = {label: idx for idx, label in enumerate(self._labels)}
+            if set(graph.nodes()) - set(order):
+                raise ValueError('Graph contains unknown nodes %s' % (set(graph.nodes()) - set(order)))
+            edges = np.array([(order[source], order[target]) for source, target in graph.edges()], dtype=int).reshape(-1, 2)
+            if (edges[:, 0] >= edges[:, 1]).any():
+                raise ValueError('Graph contains edges against the topological order of this feature type')
 
-        def sample_random(self):
-            raise NotImplementedError()
+            # Position of the pair (i, j) in the row-major order of the strict upper triangle
+            positions = edges[:, 0] * self._nodes - edges[:, 0] * (edges[:, 0] + 1) // 2 + edges[:, 1] - edges[:, 0] - 1
+            flags = np.zeros((1, self.pairs), dtype=bool)
+            flags[0, positions] = True
+            return self.encode_edge_flags(flags)[0]
 
-        def fits(self, code):
-            raise NotImplementedError()
+        def to_networkx(self, code):
+            """
+            :return: directed acyclic graph for a code in the encoding of this feature type
+            :rtype: nx.DiGraph
+            """
+            sources, targets = self._edges(code)
+            graph = nx.DiGraph()
+            graph.add_nodes_from(self._labels)
+            graph.add_edges_from((self._labels[source], self._labels[target]) for source, target in zip(sources, targets))
+            return graph
 
-        def __len__(self):
-            raise NotImplementedError()
+        def __str__(self):
+            return 'dag(%s, %s)' % (self._nodes, self._prob)
@@ -1,8 +1,11 @@
-import random
+import queue
+import weakref
+import threading
 import numpy as np
 import kayak
 from deprecated import deprecated
 from .. import export
+from ..rng import as_generator
 
 KAYAK_STRING_OPTIONS_DELIMITER = '|'
 
@@ -19,6 +22,128 @@ def extract_single_native_value(code):
         return code
 
 
+def _is_integral(value):
+    """
+    :return: whether the given scalar is an integer or a floating point number without fractional part, as in dense code matrices
+    """
+    if np.issubdtype(type(value), np.integer):
+        return True
+    return np.issubdtype(type(value), np.floating) and float(value).is_integer()
+
+
+def _as_code_matrix(matrix):
+    matrix = np.asarray(matrix)
+    if matrix.ndim != 2:
+        raise ValueError('Expecting a two-dimensional matrix with one code per row, got shape %s' % (matrix.shape,))
+    return matrix
+
+
+def _write_batch(samples, out):
+    """
+    :return: the sampled matrix, or out after copying the samples into it
+    """
+    if out is None:
+        return samples
+    out[...] = samples
+    return out
+
+
+class _PrefetchFailure(object):
+    def __init__(self, error):
+        self.error = error
+
+
+_PREFETCH_DONE = object()
+
+
+def _prefetch(iterator, depth):
+    """
+    Runs the given iterator in a producer thread and yields its items, the producer blocks once it is depth items ahead.
+    Errors of the producer are raised in the consumer, closing the generator early stops the producer.
+    """
+    items = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item):
+        # Waiting in short intervals lets the producer notice a consumer which stopped early
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        outcome = _PREFETCH_DONE
+        try:
+            for item in iterator:
+                if not put(item):
+                    outcome = None
+                    return
+        except BaseException as e:
+            # Also KeyboardInterrupt or SystemExit are handed to the consumer, which would otherwise wait forever
+            outcome = _PrefetchFailure(e)
+        finally:
+            if outcome is not None:
+                put(outcome)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _PREFETCH_DONE:
+                return
+            if isinstance(item, _PrefetchFailure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def _fixed_feature_size(ftype):
+    """
+    :return: Code size of the given feature if it does not depend on the concrete code, otherwise None.
+    """
+    if not isinstance(ftype, FeatureType):
+        # Native python values such as strings or numbers occupy a single dimension
+        return 1
+    try:
+        if ftype.dynamically_sized:
+            return None
+    except NotImplementedError:
+        # Feature types without size boundaries can only be resolved by probing a concrete code
+        return None
+    return len(ftype)
+
+
+def _numeric_feature(ftype):
+    """
+    :return: whether codes of the given feature type or native value are numbers
+    """
+    if isinstance(ftype, FeatureType):
+        return ftype.numeric_codes
+    return isinstance(ftype, (int, float, np.number))
+
+
+def _probe_feature_size(ftype, code, offset):
+    """
+    Finds the code size of a dynamically sized feature by checking shrinking slices of the code starting at offset.
+
+    :return: Size of the largest fitting sub code or None if no sub code fits.
+    """
+    code_length = len(code)
+    check_feature_size = len(ftype) + 1  # Start with maximum possible size of sub feature
+    while check_feature_size > 0:
+        next_subfeature_offset = min(offset + check_feature_size, code_length)
+        if ftype.fits(code[offset:next_subfeature_offset]):
+            return next_subfeature_offset - offset
+        check_feature_size -= 1
+    return None
+
+
 def pythonic_to_object_description(description):
     if isinstance(description, FeatureType):
         return description
@@ -58,58 +183,93 @@ class FeatureType(object):
     The feature type instance decides how to mutate given feature_types (code vectors), sample them randomly or cross them over.
     """
 
-    def cross_over(self, code1, code2):
+    def cross_over(self, code1, code2, rng=None):
         """
 
         :param code1:
         :type code1 kayak.GeneCode|list|numpy.array
         :param code2:
         :type code2 kayak.GeneCode|list|numpy.array
+        :param rng: numpy.random.Generator or seed
         :return:
         :rtype: kayak.GeneCode
         """
         raise NotImplementedError()
 
-    def mutate_random(self, code):
+    def mutate_random(self, code, rng=None):
         """
 
         :param code:
         :type code list|numpy.array
+        :param rng: numpy.random.Generator or seed, None draws from the default generator of this process
         :return:
         :rtype: kayak.GeneCode
         """
         '''
-        Either this interface method can be directly overwritten to implement the random mutation on a given code or the _mutate_random(code) can be
-        used for similar behavious between several classes of feature types.
+        Either this interface method can be directly overwritten to implement the random mutation on a given code or the _mutate_random(code, rng)
+        can be used for similar behavious between several classes of feature types.
         '''
-        return self._wrap_mutate_random(code)
+        return self._wrap_mutate_random(code, as_generator(rng))
 
-    def _wrap_mutate_random(self, code):
+    def _wrap_mutate_random(self, code, rng):
         """
-        Common pre-checking code for a random mutation function of feature type classes. Either implement mutate_random(code) or _mutate_random(code),
-        based on your required behaviour.
+        Common pre-checking code for a random mutation function of feature type classes. Either implement mutate_random(code, rng) or
+        _mutate_random(code, rng), based on your required behaviour.
         """
         if not isinstance(code, np.ndarray):
             code = np.array(code)  # numpy array accepts almost all objects
 
-        if len(self) is not len(code):
+        if len(self) != len(code):
             raise ValueError('Can not mutate code which does not fit this feature type!')
 
-        return self._mutate_random(code)
+        return self._mutate_random(code, rng)
 
-    def _mutate_random(self, code):
+    def _mutate_random(self, code, rng):
         raise NotImplementedError('You have to implement this method for the concrete feature type.')
 
-    def sample_random(self):
+    def sample_random(self, rng=None):
         """
+        :param rng: numpy.random.Generator or seed, None draws from the default generator of this process
         :return:
         :rtype: kayak.GeneCode
         """
         raise NotImplementedError()
 
+    def sample_random_batch(self, n, rng=None, out=None):
+        """
+        Samples n codes at once into a dense matrix with one code per row.
+        Concrete feature types override this with vectorized sampling, by default single samples are stacked.
+
+        :param n: number of codes to sample
+        :param rng: numpy.random.Generator or seed
+        :param out: optional matrix of shape (n, size of a code) to write the codes into, e.g. columns of a population buffer
+        :return: matrix of shape (n, size of a code), out if given
+        :rtype: numpy.ndarray
+        """
+        if _fixed_feature_size(self) is None:
+            raise ValueError('Batched sampling requires a fixed-size feature type, got %s' % self)
+        rng = as_generator(rng)
+        return _write_batch(np.stack([np.ravel(self.sample_random(rng=rng)) for _ in range(n)]).reshape(n, -1), out)
+
     def build(self, code):
         return code
 
+    def build_batch(self, matrix):
+        """
+        Builds each row of a code matrix, e.g. for mapping a whole population at once.
+        Feature types without their own build method get the matrix back unchanged, otherwise rows are built one by one.
+
+        :param matrix: two-dimensional numpy array with one code per row
+        :return: the matrix or an object array with one built value per row
+        :rtype: numpy.ndarray
+        """
+        if type(self).build is FeatureType.build:
+            return matrix
+        built = np.empty(len(matrix), dtype=object)
+        for idx, row in enumerate(matrix):
+            built[idx] = self.build(row)
+        return built
+
     def fits(self, code):
         """
 
@@ -119,6 +279,18 @@ class FeatureType(object):
         """
         raise NotImplementedError()
 
+    def fits_batch(self, matrix):
+        """
+        Checks for each row of a code matrix whether it fits into this feature type.
+        Concrete feature types override this with vectorized checks over all rows, by default each row is checked with fits().
+
+        :param matrix: two-dimensional numpy array with one code per row
+        :return: boolean mask with one flag per row
+        :rtype: numpy.ndarray
+        """
+        matrix = _as_code_matrix(matrix)
+        return np.fromiter((self.fits(row) for row in matrix), dtype=bool, count=len(matrix))
+
     @property
     def min_size(self):
         raise NotImplementedError()
@@ -134,6 +306,42 @@ class FeatureType(object):
         """
         return self.min_size is not self.max_size
 
+    @property
+    def canonicalizes(self):
+        """
+        :return: flag iff different codes of this feature type may describe the same phenotype and canonical_form() maps them onto one form
+        """
+        return False
+
+    @property
+    def numeric_codes(self):
+        """
+        :return: flag iff all sampled codes of this feature type are numbers, so that they can be written into numeric code matrices
+        """
+        return True
+
+    def canonical_form(self, code):
+        """
+        Maps a code onto a canonical representation which is equal for all codes describing the same phenotype, e.g. isomorphic graphs.
+        Fitness caches key codes by their canonical form, so equivalent codes share one evaluation.
+
+        :param code: numpy array or list
+        :return: canonical representation of the code, the code itself if this feature type does not canonicalize
+        :rtype: numpy.ndarray
+        """
+        return np.asarray(code)
+
+    def canonical_form_batch(self, matrix):
+        """
+        :param matrix: two-dimensional numpy array with one code per row
+        :return: matrix with the canonical form of each code per row
+        :rtype: numpy.ndarray
+        """
+        matrix = _as_code_matrix(matrix)
+        if not self.canonicalizes:
+            return matrix
+        return np.stack([self.canonical_form(row) for row in matrix])
+
     def __len__(self):
         """
         :return: Number of dimensions for feature codes sampled from this feature type.
@@ -145,6 +353,37 @@ class FeatureType(object):
         return str(self)
 
 
+class FeatureLayout(object):
+    """
+    Flat table of code offsets and sizes for the features of a feature set.
+    Positional entries follow the order of the feature set, named entries additionally resolve features of nested feature sets.
+    Each entry is a tuple of (feature type, offset, size), so that accessing a feature of a code is a single slice.
+    """
+
+    def __init__(self):
+        self.positions = []
+        self.names = {}
+        self.size = 0
+
+    def add(self, name, ftype, offset, size):
+        entry = (ftype, offset, size)
+        self.positions.append(entry)
+        self.names[name] = entry
+        self.size = max(self.size, offset + size)
+
+    def nest(self, other, offset):
+        """
+        Adds the named entries of a nested layout shifted by the given offset.
+        Names on the outer level take precedence over equally named nested features.
+        """
+        for name, (ftype, nested_offset, size) in other.names.items():
+            if name not in self.names:
+                self.names[name] = (ftype, offset + nested_offset, size)
+
+    def __len__(self):
+        return len(self.positions)
+
+
 class FeatureBundle(FeatureType):
     """
     A FeatureBundle is a set of one or multiple feature types bundled together.
@@ -331,6 +570,21 @@ class FeatureSet(FeatureType):
         # _features['b'] -> ft.float
         self._features = feature_description
 
+        # Counts changes to the structure of this set and its nested sets, cached layouts and compiled functions of an older revision are rebuilt
+        self._revision = 0
+
+        # Sets containing this set by their id as sets are unhashable, notified of structural changes so that checking the revision never walks
+        # the nested sets
+        self._parents = weakref.WeakValueDictionary()
+        self._adopt_nested()
+
+        # Compiled layout table of code offsets and sizes, lazily built and invalidated when features are added
+        self._layout = None
+        self._layout_revision = None
+
+        # Functions generated by compile(), used by fits, map and sample_random once the set has been compiled
+        self._compiled = None
+
     def has_feature(self, name):
         return name in self._features
 
@@ -339,6 +593,140 @@ class FeatureSet(FeatureType):
             raise ValueError('Feature with that name already contained.')
         self._feature_names.append(name)
         self._features[name] = ftype
+        if isinstance(ftype, FeatureSet):
+            ftype._parents[id(self)] = self
+        self._structure_changed()
+
+    def _adopt_nested(self):
+        for ftype in self._features.values():
+            if isinstance(ftype, FeatureSet):
+                ftype._parents[id(self)] = self
+
+    def _structure_changed(self):
+        self._revision += 1
+        self._layout = None
+        for parent in list(self._parents.values()):
+            parent._structure_changed()
+
+    def __getstate__(self):
+        # Weak references can not be pickled, parents register themselves again with their nested sets when they are unpickled
+        state = self.__dict__.copy()
+        del state['_parents']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parents = weakref.WeakValueDictionary()
+        self._adopt_nested()
+
+    @property
+    def dynamically_sized(self):
+        return any(_fixed_feature_size(ftype) is None for ftype in self)
+
+    @property
+    def canonicalizes(self):
+        return any(isinstance(ftype, FeatureType) and ftype.canonicalizes for ftype in self)
+
+    @property
+    def numeric_codes(self):
+        return all(_numeric_feature(ftype) for ftype in self)
+
+    def canonical_form(self, code):
+        """
+        Concatenates the canonical forms of all features, codes of sets without canonicalizing features are returned unchanged.
+        """
+        code = np.asarray(code)
+        if not self.canonicalizes:
+            return code
+        parts = []
+        for ftype, offset, size in self.layout(code).positions:
+            if isinstance(ftype, FeatureType):
+                parts.append(np.ravel(ftype.canonical_form(code[offset:offset + size])))
+            else:
+                parts.append(code[offset:offset + size])
+        return np.concatenate(parts)
+
+    def canonical_form_batch(self, matrix):
+        matrix = _as_code_matrix(matrix)
+        if not self.canonicalizes:
+            return matrix
+        if self.dynamically_sized:
+            return super().canonical_form_batch(matrix)
+        blocks = []
+        for ftype, offset, size in self.layout().positions:
+            block = matrix[:, offset:offset + size]
+            blocks.append(ftype.canonical_form_batch(block) if isinstance(ftype, FeatureType) else block)
+        return np.hstack(blocks)
+
+    def layout(self, code=None):
+        """
+        Returns the flat layout table of all features in this set including the features of nested feature sets.
+        For fixed-size sets the table is compiled only once and cached until a feature is added.
+        Offsets of dynamically sized sets depend on the concrete code, so the table is resolved for the given code.
+
+        :param code: numpy array or list, only required for dynamically sized sets
+        :return: layout table with code offsets and sizes of each feature
+        :rtype: FeatureLayout
+        """
+        if self._layout is not None and self._layout_revision == self._revision:
+            return self._layout
+
+        if not self.dynamically_sized:
+            self._layout = self._compile_layout()
+            self._layout_revision = self._revision
+            return self._layout
+
+        if code is None:
+            raise ValueError('Layout of a dynamically sized feature set can only be resolved for a concrete code.')
+        return self._compile_layout(code)
+
+    def compile(self):
+        """
+        Generates fits, map and sample_random functions for the exact shape of this fixed-size set with all offsets, bounds and constants
+        inlined, so that checking and sampling single codes no longer dispatches on each feature and recurses into nested sets.
+        Compiling is opt-in, afterwards the methods of this set use the generated functions until this set or one of its nested sets changes.
+        The functions are cached and rebuilt by the next call after features were added.
+        Compiled sampling draws all integer and all float features with one call each, so for the same seed it yields different codes than
+        the uncompiled set, which draws feature by feature. Seeded results are reproducible only with the set either compiled or not.
+
+        :return: generated functions of this set, see CompiledFeatureSet.source for their code
+        :rtype: kayak.feature_types.compiled.CompiledFeatureSet
+        """
+        from .compiled import CompiledFeatureSet
+        if self._compiled is None or self._compiled.revision != self._revision:
+            self._compiled = CompiledFeatureSet(self, revision=self._revision)
+        return self._compiled
+
+    def _current_compiled(self):
+        compiled = self._compiled
+        if compiled is None:
+            return None
+        if compiled.revision != self._revision:
+            if self.dynamically_sized:
+                # Added features made the set dynamically sized, so it falls back to the generic methods
+                self._compiled = None
+                return None
+            # The set has been compiled before, so it opted in and is recompiled for its new shape
+            return self.compile()
+        return compiled
+
+    def _compile_layout(self, code=None):
+        layout = FeatureLayout()
+        offset = 0
+        for name in self._feature_names:
+            ftype = self._features[name]
+            size = _fixed_feature_size(ftype)
+            if size is None:
+                size = _probe_feature_size(ftype, code, offset)
+                if size is None:
+                    raise ValueError('Code does not fit into feature %s.' % name)
+            layout.add(name, ftype, offset, size)
+
+            if isinstance(ftype, FeatureSet):
+                subfeature_code = code[offset:offset + size] if code is not None else None
+                layout.nest(ftype.layout(subfeature_code), offset)
+            offset += size
+        return layout
 
     def __getitem__(self, item):
         if type(item) is int:
@@ -354,37 +742,112 @@ class FeatureSet(FeatureType):
         # TODO do we want to provide such transparent access? might deprecate
         return self._features
 
-    def _mutate_random(self, code):
+    def _mutate_random(self, code, rng):
         offset = 0
         for name in self._features:
             ftype = self._features[name]
             fsize = len(ftype)
-            code[offset:fsize] = ftype.mutate_random(code[offset:len(ftype)])
+            code[offset:fsize] = ftype.mutate_random(code[offset:len(ftype)], rng=rng)
             offset += fsize
 
-    def generate_random(self, num_samples):
+    def generate_random(self, num_samples, rng=None):
+        rng = as_generator(rng)
         for idx in range(num_samples):
-            yield self.sample_random()
+            yield self.sample_random(rng=rng)
+
+    def generate_random_chunks(self, num_samples: int, chunk_size: int=4096, rng=None, prefetch: int=0):
+        """
+        Streams randomly sampled codes as matrices of at most chunk_size rows, so that large numbers of samples need constant memory.
+        With prefetch, a producer thread samples the next chunks while the consumer processes the current one,
+        but it never runs more than prefetch chunks ahead.
+
+        :param num_samples: total number of codes to sample
+        :param chunk_size: number of codes per chunk, only the last chunk might be smaller
+        :param rng: numpy.random.Generator or seed
+        :param prefetch: number of chunks sampled ahead in a producer thread, 0 samples each chunk when it is requested
+        :return: generator of matrices with one code per row
+        """
+        if chunk_size < 1:
+            raise ValueError('Expecting a positive chunk size, got %s' % chunk_size)
+        chunks = self._sample_random_chunks(num_samples, chunk_size, as_generator(rng))
+        if prefetch > 0:
+            return _prefetch(chunks, prefetch)
+        return chunks
+
+    def _sample_random_chunks(self, num_samples, chunk_size, rng):
+        for start in range(0, num_samples, chunk_size):
+            yield self.sample_random_batch(min(chunk_size, num_samples - start), rng=rng)
+
+    def sample_random_batch(self, n, rng=None, out=None):
+        """
+        Samples n codes at once, each feature draws all of its columns with a single vectorized call.
+
+        :param n: number of codes to sample
+        :param rng: numpy.random.Generator or seed
+        :param out: optional matrix of shape (n, len(self)), each feature writes directly into its columns
+        :return: matrix of shape (n, len(self)), out if given
+        :rtype: numpy.ndarray
+        """
+        rng = as_generator(rng)
+        if out is not None:
+            return self._sample_random_batch_into(n, rng, out)
+
+        columns = []
+        for ftype in self:
+            if isinstance(ftype, FeatureType):
+                columns.append(ftype.sample_random_batch(n, rng=rng))
+            else:
+                # Fixed native values are repeated, non-numeric values force an object matrix
+                dtype = None if isinstance(ftype, (int, float, np.number)) else object
+                columns.append(np.full((n, 1), ftype, dtype=dtype))
+        if len(columns) < 1:
+            return np.empty((n, 0))
+        if any(column.dtype.kind not in 'biuf' for column in columns):
+            # Stacking numbers with strings would convert the numbers into strings
+            return np.hstack([column.astype(object) for column in columns])
+        return np.hstack(columns)
+
+    def _sample_random_batch_into(self, n, rng, out):
+        if out.shape != (n, self.layout().size):
+            raise ValueError('Expecting output matrix of shape %s, got %s' % ((n, self.layout().size), out.shape))
+        offset = 0
+        for ftype in self:
+            size = _fixed_feature_size(ftype)
+            target = out[:, offset:offset + size]
+            if isinstance(ftype, FeatureType):
+                ftype.sample_random_batch(n, rng=rng, out=target)
+            else:
+                target[...] = ftype
+            offset += size
+        return out
+
+    def sample_random(self, rng=None):
+        rng = as_generator(rng)
+        compiled = self._current_compiled()
+        if compiled is not None:
+            return compiled.sample_random(rng=rng)
 
-    def sample_random(self):
         code = []
-        for name in self._features:
-            ftype = self._features[name]
+        for ftype in self:
             if isinstance(ftype, list):
-                list_choice = random.choice(ftype)
+                list_choice = ftype[rng.integers(len(ftype))]
                 if isinstance(list_choice, FeatureType):
-                    code.extend(list_choice.sample_random())
+                    code.extend(np.ravel(list_choice.sample_random(rng=rng)))
                 else:
                     code.append(list_choice)
             elif isinstance(ftype, FeatureType):
-                code.extend(ftype.sample_random().flatten())
+                # Nested feature sets and permutations sample gene codes, which are flattened like arrays
+                code.extend(np.ravel(ftype.sample_random(rng=rng)))
             else:
                 raise ValueError('Unknown type for feature: %s' % ftype)
         return kayak.GeneCode(code, self)
 
     def fits(self, code):
+        compiled = self._current_compiled()
+        if compiled is not None:
+            return compiled.fits(code)
+
         subfeature_offset = 0
-        code_length = len(code)
 
         for ftype in self:
             if not isinstance(ftype, FeatureType):
@@ -397,31 +860,49 @@ class FeatureSet(FeatureType):
             else:
                 # We have a feature type which might reserve a certain code size
                 # For dynamic feature types (e.g. lists) we must iteratively check different code sizes
-                feature_size = len(ftype)
+                feature_size = _fixed_feature_size(ftype)
 
-                if feature_size is 1:
-                    next_subfeature_offset = subfeature_offset + 1
+                if feature_size is not None:
+                    next_subfeature_offset = subfeature_offset + feature_size
                     subfeature_code = code[subfeature_offset:next_subfeature_offset]
-                    if len(subfeature_code) < 1:
+                    if len(subfeature_code) < feature_size:
                         return False
                     if not ftype.fits(subfeature_code):
                         return False
                     subfeature_offset = next_subfeature_offset
                 else:
-                    check_feature_size = feature_size + 1
-                    subfeature_fits = False
-                    while check_feature_size > 0 and not subfeature_fits:
-                        next_subfeature_offset = min(subfeature_offset + check_feature_size, code_length)
-                        subfeature_code = code[subfeature_offset:next_subfeature_offset]
-                        if ftype.fits(subfeature_code):
-                            subfeature_fits = True
-                            subfeature_offset = next_subfeature_offset
-                        check_feature_size -= 1
-
-                    if not subfeature_fits:
+                    subfeature_size = _probe_feature_size(ftype, code, subfeature_offset)
+                    if subfeature_size is None:
                         return False
+                    subfeature_offset += subfeature_size
         return True
 
+    def fits_batch(self, matrix):
+        """
+        Checks all rows of a code matrix at once by checking the column block of each feature of the compiled layout.
+        Rows have to span exactly the size of this set. Dynamically sized sets have no common layout and are checked row by row.
+
+        :param matrix: two-dimensional numpy array with one code per row
+        :return: boolean mask with one flag per row
+        :rtype: numpy.ndarray
+        """
+        matrix = _as_code_matrix(matrix)
+        if self.dynamically_sized:
+            return super().fits_batch(matrix)
+
+        layout = self.layout()
+        mask = np.full(len(matrix), matrix.shape[1] == layout.size, dtype=bool)
+        if not mask.any():
+            return mask
+
+        for ftype, offset, size in layout.positions:
+            block = matrix[:, offset:offset + size]
+            if isinstance(ftype, FeatureType):
+                mask &= ftype.fits_batch(block)
+            else:
+                mask &= block[:, 0] == ftype
+        return mask
+
     def __eq__(self, other):
         # TODO implement native equality check
         return str(other) == str(self)
@@ -430,7 +911,8 @@ class FeatureSet(FeatureType):
         return '{' + ', '.join([str(feat) for feat in self]) + '}'
 
     def __len__(self):
-        return sum(len(feat) for feat in self)
+        # Native values occupy a single dimension, the length of a fixed string is not its code size
+        return sum(len(feat) if isinstance(feat, FeatureType) else 1 for feat in self)
 
 
 @export
@@ -439,15 +921,18 @@ class IntegerType(FeatureType):
         self._lower_border = lower_border
         self._upper_border = upper_border
 
-    def sample_random(self):
-        return np.array([random.randint(self._lower_border, self._upper_border)])
+    def sample_random(self, rng=None):
+        return as_generator(rng).integers(self._lower_border, self._upper_border, size=1, endpoint=True)
 
-    def mutation_difference(self):
+    def sample_random_batch(self, n, rng=None, out=None):
+        return _write_batch(as_generator(rng).integers(self._lower_border, self._upper_border, size=(n, 1), endpoint=True), out)
+
+    def mutation_difference(self, rng=None):
         range = round((self._upper_border - self._lower_border) * 0.1)
-        return random.randint(-range, range)
+        return as_generator(rng).integers(-range, range, endpoint=True)
 
-    def _mutate_random(self, code):
-        mutation = code + self.mutation_difference()
+    def _mutate_random(self, code, rng):
+        mutation = code + self.mutation_difference(rng)
         if mutation > self._upper_border:
             mutation = self._upper_border
         if mutation < self._lower_border:
@@ -473,7 +958,21 @@ class IntegerType(FeatureType):
             return False
 
         # Fits must not assert but return False on problematic / non-fitting code.
-        return np.issubdtype(type(code), np.signedinteger) and self._lower_border <= code <= self._upper_border
+        return _is_integral(code) and self._lower_border <= code <= self._upper_border
+
+    def fits_batch(self, matrix):
+        matrix = _as_code_matrix(matrix)
+        if matrix.shape[1] != 1:
+            return np.zeros(len(matrix), dtype=bool)
+        column = matrix[:, 0]
+        if np.issubdtype(column.dtype, np.integer):
+            integral = True
+        elif np.issubdtype(column.dtype, np.floating):
+            integral = np.equal(np.mod(column, 1), 0)
+        else:
+            # Object columns of mixed matrices can only be checked value by value
+            return super().fits_batch(matrix)
+        return integral & (self._lower_border <= column) & (column <= self._upper_border)
 
     def __str__(self):
         return 'int(%.2f, %.2f)' % (self._lower_border, self._upper_border)
@@ -488,15 +987,18 @@ class FloatType(FeatureType):
         self._lower_border = lower_border
         self._upper_border = upper_border
 
-    def sample_random(self):
-        return np.array([random.uniform(self._lower_border, self._upper_border)])
+    def sample_random(self, rng=None):
+        return as_generator(rng).uniform(self._lower_border, self._upper_border, size=1)
 
-    def mutation_difference(self):
+    def sample_random_batch(self, n, rng=None, out=None):
+        return _write_batch(as_generator(rng).uniform(self._lower_border, self._upper_border, size=(n, 1)), out)
+
+    def mutation_difference(self, rng=None):
         sigma = (self._upper_border - self._lower_border) * 0.1
-        return random.normalvariate(0, sigma)
+        return as_generator(rng).normal(0, sigma)
 
-    def _mutate_random(self, code):
-        mutation = code + self.mutation_difference()
+    def _mutate_random(self, code, rng):
+        mutation = code + self.mutation_difference(rng)
         if mutation > self._upper_border:
             mutation = self._upper_border
         if mutation < self._lower_border:
@@ -510,6 +1012,16 @@ class FloatType(FeatureType):
             return False
         return self._lower_border <= code <= self._upper_border
 
+    def fits_batch(self, matrix):
+        matrix = _as_code_matrix(matrix)
+        if matrix.shape[1] != 1:
+            return np.zeros(len(matrix), dtype=bool)
+        column = matrix[:, 0]
+        if not np.issubdtype(column.dtype, np.number):
+            return super().fits_batch(matrix)
+        # Comparisons with NaN are always false, so they do not fit
+        return (self._lower_border <= column) & (column <= self._upper_border)
+
     @property
     def dynamically_sized(self):
         return False
@@ -544,12 +1056,15 @@ class Matrix(FeatureType):
         self._lower_border = kwargs['lower_border'] if 'lower_border' in kwargs else -100
         self._upper_border = kwargs['upper_border'] if 'upper_border' in kwargs else 100
 
-    def sample_random(self):
-        return np.random.uniform(self._lower_border, self._upper_border, self._shape)
+    def sample_random(self, rng=None):
+        return as_generator(rng).uniform(self._lower_border, self._upper_border, self._shape)
+
+    def sample_random_batch(self, n, rng=None, out=None):
+        return _write_batch(as_generator(rng).uniform(self._lower_border, self._upper_border, size=(n, len(self))), out)
 
-    def mutation_difference(self):
+    def mutation_difference(self, rng=None):
         range = round((self._upper_border - self._lower_border) * 0.1)
-        return np.random.randint(-range, range)
+        return as_generator(rng).integers(-range, range)
 
     def fits(self, code):
         code = np.array(code)
@@ -557,11 +1072,18 @@ class Matrix(FeatureType):
             return np.all(np.equal(code.shape, self._shape))
         return code.shape[0] is len(self) # Code can be exactly reshaped
 
+    def fits_batch(self, matrix):
+        matrix = _as_code_matrix(matrix)
+        return np.full(len(matrix), matrix.shape[1] == len(self), dtype=bool)
+
     def build(self, code):
         code = np.array(code)
         code.resize(self._shape)
         return code
 
+    def build_batch(self, matrix):
+        return np.array(matrix).reshape([len(matrix)] + self._shape)
+
     @property
     def dynamically_sized(self):
         return False
@@ -582,6 +1104,16 @@ class Matrix(FeatureType):
 @deprecated(reason='FeatureList will be replaced by FeatureOptions to distinguish more clearly between python lists and a option list of features in a description space.', version='0.3')
 @export
 class FeatureList(FeatureType):
+    """
+    A choice of exactly one of several options, each option is a feature type or a native value.
+    Codes are stored in one of three encodings:
+    The dynamic encoding stores the index of the chosen option followed by its code, so the code size depends on the choice.
+    The maximum option encoding stores the index followed by a slot of the size of the largest option,
+    the chosen option is written to the start of the slot and the remaining dimensions are zero padding.
+    The one-hot encoding stores one indicator per option followed by a block for the code of each option,
+    so that switching the chosen option keeps the codes of all other options.
+    Both fixed encodings require options of fixed size and let all codes of a list be processed as one matrix.
+    """
 
     def __init__(self, feature_description, encoding=None):
         """
@@ -606,52 +1138,232 @@ class FeatureList(FeatureType):
 
         self._features = feature_description
 
+        if self._encoding in (encoding_one_hot, encoding_max_option):
+            self._option_sizes = [_fixed_feature_size(ftype) for ftype in feature_description]
+            if len(feature_description) < 1:
+                raise ValueError('Expecting at least one option for a feature list.')
+            if None in self._option_sizes:
+                raise ValueError('The %s encoding requires options of fixed size, got %s' % (self._encoding, self))
+        elif self._encoding != encoding_dynamic:
+            raise ValueError('Unknown feature list encoding %s' % self._encoding)
+
+    @property
+    def encoding(self):
+        return self._encoding
+
     def __getitem__(self, item):
         if type(item) is int:
             if item >= len(self._features):
                 raise IndexError('Index exceeds number of features in set.')
             return self._features[item]
 
-    def cross_over(self, code1, code2):
+    def cross_over(self, code1, code2, rng=None):
         pass
 
-    def _mutate_random(self, code):
+    def _mutate_random(self, code, rng):
         pass
 
-    def sample_random(self):
+    @property
+    def dynamically_sized(self):
+        # A dynamic encoding only stores the code of the chosen option, so its size depends on the choice
+        return self._encoding == encoding_dynamic
+
+    @property
+    def numeric_codes(self):
+        return all(_numeric_feature(ftype) for ftype in self._features)
+
+    def _option_blocks(self):
+        """
+        :return: (offset, size) of the code of each option within codes of the fixed encodings
+        """
+        if self._encoding == encoding_max_option:
+            return [(1, size) for size in self._option_sizes]
+        offsets = len(self._features) + np.concatenate([[0], np.cumsum(self._option_sizes)[:-1]])
+        return [(int(offset), size) for offset, size in zip(offsets, self._option_sizes)]
+
+    def sample_random(self, rng=None):
+        rng = as_generator(rng)
         feature_list = self._features
         encoding = self._encoding
 
         if encoding == encoding_dynamic:
-            list_choice = random.randint(0, len(feature_list) - 1)
+            list_choice = int(rng.integers(len(feature_list)))
             ftype = feature_list[list_choice]
             code = [list_choice]
             if isinstance(ftype, FeatureType):
-                code.extend(ftype.sample_random().as_numpy())
+                code.extend(np.ravel(ftype.sample_random(rng=rng)))
             else:
                 code.append(ftype)
             return kayak.GeneCode(code, self)
 
-        if encoding == encoding_one_hot:
-            #One Hot Encoding
-            raise NotImplementedError('The one_hot_encoding option is not implemented.')
+        return kayak.GeneCode(self.sample_random_batch(1, rng=rng)[0], self, validate=False)
 
-        if encoding == encoding_max_option:
-            #Maximum Option Encoding
-            raise NotImplementedError('The maximum_option_encoding option is not implemented.')
+    def sample_random_batch(self, n, rng=None, out=None):
+        """
+        Samples n codes of a fixed encoding at once, each option samples the codes of all rows which chose it with a single call.
+        With the one-hot encoding every option is sampled for all rows, so that each code carries valid codes of all options.
+
+        :param n: number of codes to sample
+        :param rng: numpy.random.Generator or seed
+        :param out: optional matrix of shape (n, len(self)) to write the codes into
+        :return: matrix of shape (n, len(self)), out if given
+        :rtype: numpy.ndarray
+        """
+        if self._encoding == encoding_dynamic:
+            return super().sample_random_batch(n, rng=rng, out=out)
+
+        rng = as_generator(rng)
+        samples = np.zeros((n, len(self)), dtype=float if self.numeric_codes else object)
+        choices = rng.integers(len(self._features), size=n)
+        if self._encoding == encoding_max_option:
+            samples[:, 0] = choices
+        else:
+            samples[np.arange(n), choices] = 1
 
-        raise ValueError('Wrong type of encoding.')
+        for index, (ftype, (offset, size)) in enumerate(zip(self._features, self._option_blocks())):
+            rows = np.flatnonzero(choices == index) if self._encoding == encoding_max_option else np.arange(n)
+            if len(rows) < 1:
+                continue
+            if isinstance(ftype, FeatureType):
+                samples[rows, offset:offset + size] = ftype.sample_random_batch(len(rows), rng=rng)
+            else:
+                samples[rows, offset] = ftype
+        return _write_batch(samples, out)
 
     def fits(self, code):
+        if self._encoding != encoding_dynamic:
+            if not isinstance(code, (list, tuple)):
+                return bool(self.fits_batch(np.asarray(code).reshape(1, -1))[0])
+            row = np.empty((1, len(code)), dtype=object)
+            row[0, :] = list(code)
+            return bool(self.fits_batch(row)[0])
+
+        if len(code) < 1:
+            return False
         index = code[0]
-        feature = self._features[index]
+        # Indices of flattened codes, e.g. of nested lists within a feature set, are integral floats
+        if not _is_integral(index) or not 0 <= index < len(self._features):
+            return False
+        feature = self._features[int(index)]
         subcode = code[1:]
         if len(subcode) > len(feature) or not feature.fits(subcode):
             return False
 
         return True
 
+    def _choices_batch(self, matrix):
+        """
+        :return: flags whether each row encodes a valid choice and the index of the chosen option of each row, 0 for invalid rows
+        """
+        options = len(self._features)
+        if self._encoding == encoding_max_option:
+            column = matrix[:, 0]
+            if column.dtype.kind in 'iuf':
+                valid = np.equal(np.mod(column, 1), 0) & (column >= 0) & (column < options)
+            else:
+                valid = np.fromiter((_is_integral(value) and 0 <= value < options for value in column), dtype=bool, count=len(column))
+            return valid, np.where(valid, column, 0).astype(int)
+
+        indicators = matrix[:, :options]
+        if indicators.dtype.kind not in 'biuf':
+            # Values which are no numbers can not be indicators, they become NaN
+            indicators = np.array([[float(value) if _is_integral(value) else np.nan for value in row] for row in indicators],
+                                  dtype=float).reshape(len(matrix), options)
+        valid = ((indicators == 0) | (indicators == 1)).all(axis=1) & (indicators.sum(axis=1) == 1)
+        return valid, np.argmax(indicators, axis=1)
+
+    def fits_batch(self, matrix):
+        """
+        Checks all rows of a code matrix at once by grouping the rows by their chosen option.
+        Each option then checks the sub codes of its rows with a single vectorized call.
+        Padding of the maximum option encoding and the blocks of options which are not chosen in the one-hot encoding are not checked.
+
+        :param matrix: two-dimensional numpy array with one code per row
+        :return: boolean mask with one flag per row
+        :rtype: numpy.ndarray
+        """
+        matrix = _as_code_matrix(matrix)
+        if self._encoding != encoding_dynamic:
+            return self._fits_fixed_batch(matrix)
+        if matrix.shape[1] < 1:
+            return super().fits_batch(matrix)
+
+        mask = np.zeros(len(matrix), dtype=bool)
+        choices = matrix[:, 0]
+        subcodes = matrix[:, 1:]
+        for index, feature in enumerate(self._features):
+            rows = np.flatnonzero(choices == index)
+            if len(rows) < 1:
+                continue
+            if isinstance(feature, FeatureType):
+                if subcodes.shape[1] <= len(feature):
+                    mask[rows] = feature.fits_batch(subcodes[rows])
+            else:
+                mask[rows] = subcodes.shape[1] == 1 and subcodes[rows, 0] == feature
+        return mask
+
+    def _fits_fixed_batch(self, matrix):
+        if matrix.shape[1] != len(self):
+            return np.zeros(len(matrix), dtype=bool)
+        mask, choices = self._choices_batch(matrix)
+        for index, (ftype, (offset, size)) in enumerate(zip(self._features, self._option_blocks())):
+            rows = np.flatnonzero(mask & (choices == index))
+            if len(rows) < 1:
+                continue
+            if isinstance(ftype, FeatureType):
+                mask[rows] = ftype.fits_batch(matrix[rows, offset:offset + size])
+            else:
+                mask[rows] = matrix[rows, offset] == ftype
+        return mask
+
+    def decode(self, code):
+        """
+        :param code: code of this feature list in any encoding
+        :return: index of the chosen option and its code, or its native value
+        :rtype: tuple
+        """
+        if self._encoding == encoding_dynamic:
+            index = int(code[0])
+            ftype = self._features[index]
+            return index, code[1:1 + len(ftype)] if isinstance(ftype, FeatureType) else code[1]
+
+        choices, subcodes = self.decode_batch(np.asarray(code).reshape(1, -1))
+        index = int(choices[0])
+        ftype = self._features[index]
+        return index, subcodes[0, :self._option_sizes[index]] if isinstance(ftype, FeatureType) else subcodes[0, 0]
+
+    def decode_batch(self, matrix):
+        """
+        Decodes all rows of a code matrix of a fixed encoding at once.
+
+        :param matrix: two-dimensional numpy array with one code per row
+        :return: index of the chosen option of each row and a matrix with the code of the chosen option at the start of each row,
+                 dimensions beyond the size of the chosen option are padding
+        :rtype: tuple
+        """
+        if self._encoding == encoding_dynamic:
+            raise ValueError('Batched decoding requires a fixed encoding, codes of the dynamic encoding differ in size.')
+        matrix = _as_code_matrix(matrix)
+        if matrix.shape[1] != len(self):
+            raise ValueError('Expecting codes of size %s, got a matrix of shape %s' % (len(self), matrix.shape))
+
+        valid, choices = self._choices_batch(matrix)
+        if not valid.all():
+            raise ValueError('Codes at rows %s do not encode a valid option.' % np.flatnonzero(~valid))
+        if self._encoding == encoding_max_option:
+            return choices, matrix[:, 1:]
+
+        subcodes = np.zeros((len(matrix), max(self._option_sizes)), dtype=matrix.dtype)
+        for index, (offset, size) in enumerate(self._option_blocks()):
+            rows = np.flatnonzero(choices == index)
+            subcodes[rows, :size] = matrix[rows, offset:offset + size]
+        return choices, subcodes
+
     def __len__(self):
+        if self._encoding == encoding_max_option:
+            return 1 + max(self._option_sizes)
+        if self._encoding == encoding_one_hot:
+            return len(self._features) + sum(self._option_sizes)
         length_list = []
         for feature in self._features:
             length_list.append(len(feature))
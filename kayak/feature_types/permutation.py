@@ -1,11 +1,378 @@
 import math
-import random
 import numpy as np
 import kayak
-import itertools
 
 from kayak import FeatureType
 from .. import export
+from ..rng import as_generator
+from .native import _write_batch, _is_integral
+
+class _FenwickTree(object):
+    """
+    Binary indexed tree over flags of still available positions, used to convert between permutations and their Lehmer codes in O(n log n).
+    """
+    def __init__(self, size):
+        self._size = size
+        self._tree = [0] * (size + 1)
+        for position in range(1, size + 1):
+            # Initialize all positions as available in O(n)
+            self._tree[position] += 1
+            parent = position + (position & -position)
+            if parent <= size:
+                self._tree[parent] += self._tree[position]
+        self._highest_bit = 1 << (size.bit_length() - 1) if size > 0 else 0
+
+    def count_before(self, position):
+        """
+        :return: number of available positions smaller than the given position
+        """
+        count = 0
+        while position > 0:
+            count += self._tree[position]
+            position -= position & -position
+        return count
+
+    def remove(self, position):
+        position += 1
+        while position <= self._size:
+            self._tree[position] -= 1
+            position += position & -position
+
+    def pop_kth(self, k):
+        """
+        Removes and returns the k-th (zero-based) available position.
+        """
+        position = 0
+        step = self._highest_bit
+        while step > 0:
+            next_position = position + step
+            if next_position <= self._size and self._tree[next_position] <= k:
+                position = next_position
+                k -= self._tree[next_position]
+            step >>= 1
+        self.remove(position)
+        return position
+
+
+def lehmer_decode(rank, length):
+    """
+    Decodes the lexicographic rank of a permutation of range(length) via its Lehmer code (factorial number system) in O(n log n).
+
+    :param rank: integer in [0, length!)
+    :param length: number of permuted elements
+    :return: permuted positions
+    :rtype: list
+    """
+    rank = int(rank)
+    if rank < 0 or rank >= math.factorial(length):
+        raise ValueError('Permutation rank %s out of range for %s elements.' % (rank, length))
+
+    digits = [0] * length
+    for radix in range(1, length + 1):
+        rank, digits[length - radix] = divmod(rank, radix)
+
+    available = _FenwickTree(length)
+    return [available.pop_kth(digit) for digit in digits]
+
+
+def lehmer_encode(positions):
+    """
+    Computes the exact lexicographic rank of a permutation of range(n) via its Lehmer code in O(n log n).
+
+    :param positions: permuted positions
+    :return: rank of the permutation, a python integer of arbitrary size
+    :rtype: int
+    """
+    length = len(positions)
+    available = _FenwickTree(length)
+    rank = 0
+    for idx, position in enumerate(positions):
+        position = int(position)
+        # Horner scheme over the factorial number system
+        rank = rank * (length - idx) + available.count_before(position)
+        available.remove(position)
+    return rank
+
+
+def lehmer_decode_batch(ranks, length):
+    """
+    Decodes many permutation ranks at once into a matrix of permuted positions, vectorized over all ranks.
+
+    :param ranks: array of m ranks, ranks beyond int64 are supported as python integers
+    :param length: number of permuted elements
+    :return: matrix of shape (m, length) with one permutation of range(length) per row
+    :rtype: numpy.ndarray
+    """
+    ranks = np.asarray(ranks).reshape(-1)
+    if math.factorial(length) > np.iinfo(np.int64).max:
+        ranks = ranks.astype(object)
+    else:
+        ranks = ranks.astype(np.int64)
+    if np.any(ranks < 0) or np.any(ranks >= math.factorial(length)):
+        raise ValueError('Permutation ranks out of range for %s elements.' % length)
+
+    digits = np.zeros((len(ranks), length), dtype=np.int64)
+    for radix in range(1, length + 1):
+        # Floor division and modulo separately as divmod does not support object arrays of large integers
+        digits[:, length - radix] = (ranks % radix).astype(np.int64)
+        ranks = ranks // radix
+
+    rows = np.arange(len(digits))
+    available = np.ones((len(digits), length), dtype=bool)
+    positions = np.empty((len(digits), length), dtype=np.int64)
+    for idx in range(length):
+        # The first position at which the count of available positions exceeds the digit is the digit-th available one
+        chosen = np.argmax(np.cumsum(available, axis=1) > digits[:, idx:idx + 1], axis=1)
+        positions[:, idx] = chosen
+        available[rows, chosen] = False
+    return positions
+
+
+def _segments(rng, number, length):
+    """
+    :return: sorted random cut points a <= b per row and a mask of the positions within [a, b)
+    """
+    cuts = np.sort(rng.integers(0, length + 1, size=(number, 2)), axis=1)
+    columns = np.arange(length)
+    segment = (columns >= cuts[:, :1]) & (columns < cuts[:, 1:])
+    return cuts[:, 0], cuts[:, 1], segment
+
+
+def _check_parents(parents1, parents2):
+    parents1 = np.asarray(parents1)
+    parents2 = np.asarray(parents2)
+    if parents1.ndim != 2 or parents1.shape != parents2.shape:
+        raise ValueError('Expecting two matrices of permutations with equal shape, got %s and %s' % (parents1.shape, parents2.shape))
+    return parents1, parents2
+
+
+def crossover_pmx(parents1, parents2, rng=None):
+    """
+    Partially mapped crossover: a random segment is taken from the first parent, all other positions from the second parent.
+    Elements of the second parent which already occur in the segment are replaced by following the mapping of the segment.
+
+    :param parents1: matrix of shape (m, n) with one permutation of range(n) per row
+    :param parents2: matrix of shape (m, n) with one permutation of range(n) per row
+    :param rng: numpy.random.Generator or seed
+    :return: matrix of shape (m, n) with one offspring permutation per row
+    :rtype: numpy.ndarray
+    """
+    parents1, parents2 = _check_parents(parents1, parents2)
+    number, length = parents1.shape
+    rows = np.arange(number)[:, None]
+    _, _, segment = _segments(as_generator(rng), number, length)
+
+    mapping = np.tile(np.arange(length), (number, 1))
+    mapping[rows, parents1] = np.where(segment, parents2, parents1)
+
+    # Elements outside the segment are fixed points of the mapping, pointer jumping resolves all chains in O(log n) steps
+    for _ in range(max(1, int(np.ceil(np.log2(length))))):
+        mapping = mapping[rows, mapping]
+    return np.where(segment, parents1, mapping[rows, parents2])
+
+
+def crossover_ox(parents1, parents2, rng=None):
+    """
+    Order crossover: a random segment is taken from the first parent, the remaining positions are filled with the missing elements in the
+    order in which they appear in the second parent, starting after the segment.
+
+    :param parents1: matrix of shape (m, n) with one permutation of range(n) per row
+    :param parents2: matrix of shape (m, n) with one permutation of range(n) per row
+    :param rng: numpy.random.Generator or seed
+    :return: matrix of shape (m, n) with one offspring permutation per row
+    :rtype: numpy.ndarray
+    """
+    parents1, parents2 = _check_parents(parents1, parents2)
+    number, length = parents1.shape
+    rows = np.arange(number)[:, None]
+    columns = np.arange(length)
+    start, end, segment = _segments(as_generator(rng), number, length)
+
+    in_segment = np.zeros((number, length), dtype=bool)
+    in_segment[rows, parents1] = segment
+
+    # Walk both the second parent and the free positions of the offspring cyclically, starting after the segment
+    rotation = (end[:, None] + columns) % length
+    candidates = parents2[rows, rotation]
+    kept = ~in_segment[rows, candidates]
+    free = ~segment[rows, rotation]
+
+    # Stable sorting moves kept elements and free positions to the front, both in walking order
+    kept_elements = candidates[rows, np.argsort(~kept, axis=1, kind='stable')]
+    free_positions = rotation[rows, np.argsort(~free, axis=1, kind='stable')]
+    valid = columns < (length - (end - start))[:, None]
+
+    offspring = np.where(segment, parents1, 0)
+    offspring[np.broadcast_to(rows, valid.shape)[valid], free_positions[valid]] = kept_elements[valid]
+    return offspring
+
+
+def crossover_cx(parents1, parents2, rng=None):
+    """
+    Cycle crossover: positions are partitioned into the cycles formed by both parents, the offspring alternately inherits whole cycles from
+    the first and the second parent. Each element keeps the position it has in one of the parents.
+
+    :param parents1: matrix of shape (m, n) with one permutation of range(n) per row
+    :param parents2: matrix of shape (m, n) with one permutation of range(n) per row
+    :param rng: unused, cycle crossover is deterministic
+    :return: matrix of shape (m, n) with one offspring permutation per row
+    :rtype: numpy.ndarray
+    """
+    parents1, parents2 = _check_parents(parents1, parents2)
+    number, length = parents1.shape
+    rows = np.arange(number)[:, None]
+    columns = np.arange(length)
+
+    positions1 = np.empty_like(parents1)
+    positions1[rows, parents1] = columns
+    successor = positions1[rows, parents2]
+
+    # Pointer jumping labels each position with the smallest position of its cycle in O(log n) steps
+    label = np.tile(columns, (number, 1))
+    for _ in range(max(1, int(np.ceil(np.log2(length))) + 1)):
+        label = np.minimum(label, label[rows, successor])
+        successor = successor[rows, successor]
+
+    cycle_starts = np.cumsum(label == columns, axis=1) - 1
+    cycle_number = cycle_starts[rows, label]
+    return np.where(cycle_number % 2 == 0, parents1, parents2)
+
+
+def crossover_erx(parents1, parents2, rng=None):
+    """
+    Edge recombination crossover: the offspring is built as a tour which preferably continues with an element adjacent to the current one in
+    either parent, choosing the neighbour with the fewest remaining neighbours. Ties and dead ends are resolved randomly.
+    The tour is built step by step, each step is vectorized over all rows.
+
+    :param parents1: matrix of shape (m, n) with one permutation of range(n) per row
+    :param parents2: matrix of shape (m, n) with one permutation of range(n) per row
+    :param rng: numpy.random.Generator or seed
+    :return: matrix of shape (m, n) with one offspring permutation per row
+    :rtype: numpy.ndarray
+    """
+    parents1, parents2 = _check_parents(parents1, parents2)
+    rng = as_generator(rng)
+    number, length = parents1.shape
+    rows = np.arange(number)
+
+    # Neighbours of each element in both cyclic parent tours
+    neighbours = np.empty((number, length, 4), dtype=parents1.dtype)
+    for idx, parents in enumerate([parents1, parents2]):
+        neighbours[rows[:, None], parents, 2 * idx] = np.roll(parents, 1, axis=1)
+        neighbours[rows[:, None], parents, 2 * idx + 1] = np.roll(parents, -1, axis=1)
+    unique = np.ones(neighbours.shape, dtype=bool)
+    for slot in range(1, 4):
+        unique[:, :, slot] = ~(neighbours[:, :, :slot] == neighbours[:, :, slot:slot + 1]).any(axis=2)
+    degree = unique.sum(axis=2)
+
+    # Dead ends continue with the next unused element of a random order per row
+    fallback_order = np.argsort(rng.random((number, length)), axis=1)
+
+    used = np.zeros((number, length), dtype=bool)
+    offspring = np.empty((number, length), dtype=parents1.dtype)
+    current = parents1[:, 0]
+    for step in range(length):
+        offspring[:, step] = current
+        used[rows, current] = True
+        current_neighbours = neighbours[rows, current]
+        current_unique = unique[rows, current]
+        # Unique neighbours are distinct within a row, so the flat indices never collide
+        degree.ravel()[(rows[:, None] * length + current_neighbours)[current_unique]] -= 1
+        if step == length - 1:
+            break
+
+        available = current_unique & ~used[rows[:, None], current_neighbours]
+        scores = np.where(available, degree[rows[:, None], current_neighbours] + rng.random((number, 4)) * 0.5, np.inf)
+        current = current_neighbours[rows, np.argmin(scores, axis=1)]
+        dead_ends = np.flatnonzero(~available.any(axis=1))
+        if dead_ends.size:
+            order = fallback_order[dead_ends]
+            first_unused = np.argmax(~used[dead_ends[:, None], order], axis=1)
+            current[dead_ends] = order[np.arange(dead_ends.size), first_unused]
+    return offspring
+
+
+def mutate_swap(permutations, rng=None):
+    """
+    Swaps two random positions in each row.
+
+    :param permutations: matrix of shape (m, n) with one permutation per row
+    :param rng: numpy.random.Generator or seed
+    :return: mutated copy of the matrix
+    :rtype: numpy.ndarray
+    """
+    permutations = np.array(permutations)
+    number, length = permutations.shape
+    rows = np.arange(number)
+    positions = as_generator(rng).integers(0, length, size=(number, 2))
+    first = permutations[rows, positions[:, 0]]
+    permutations[rows, positions[:, 0]] = permutations[rows, positions[:, 1]]
+    permutations[rows, positions[:, 1]] = first
+    return permutations
+
+
+def mutate_inversion(permutations, rng=None):
+    """
+    Reverses a random segment in each row.
+
+    :param permutations: matrix of shape (m, n) with one permutation per row
+    :param rng: numpy.random.Generator or seed
+    :return: mutated copy of the matrix
+    :rtype: numpy.ndarray
+    """
+    permutations = np.asarray(permutations)
+    number, length = permutations.shape
+    start, end, segment = _segments(as_generator(rng), number, length)
+    columns = np.arange(length)
+    source = np.where(segment, start[:, None] + end[:, None] - 1 - columns, columns)
+    return permutations[np.arange(number)[:, None], source]
+
+
+def mutate_scramble(permutations, rng=None):
+    """
+    Shuffles a random segment in each row.
+
+    :param permutations: matrix of shape (m, n) with one permutation per row
+    :param rng: numpy.random.Generator or seed
+    :return: mutated copy of the matrix
+    :rtype: numpy.ndarray
+    """
+    permutations = np.asarray(permutations)
+    rng = as_generator(rng)
+    number, length = permutations.shape
+    start, end, segment = _segments(rng, number, length)
+    columns = np.arange(length)
+    # Keys outside the segment keep their position, keys inside are spread randomly over [start, end)
+    keys = np.where(segment, start[:, None] + rng.random((number, length)) * (end - start)[:, None], columns)
+    return permutations[np.arange(number)[:, None], np.argsort(keys, axis=1, kind='stable')]
+
+
+PERMUTATION_CROSSOVERS = {
+    'pmx': crossover_pmx,
+    'ox': crossover_ox,
+    'cx': crossover_cx,
+    'erx': crossover_erx
+}
+PERMUTATION_MUTATIONS = {
+    'swap': mutate_swap,
+    'inversion': mutate_inversion,
+    'scramble': mutate_scramble
+}
+
+
+def _random_rank(possible_codings, rng):
+    """
+    Draws a uniform rank below possible_codings, ranks of long permutations exceed 64 bits and are drawn from random bytes with rejection.
+    """
+    if possible_codings <= np.iinfo(np.int64).max:
+        return int(rng.integers(possible_codings))
+    bits = (possible_codings - 1).bit_length()
+    length = -(-bits // 8)
+    while True:
+        rank = int.from_bytes(rng.bytes(length), 'little') >> (8 * length - bits)
+        if rank < possible_codings:
+            return rank
+
 
 @export
 class PermutationEncoder(object):
@@ -23,6 +390,29 @@ class PermutationEncoder(object):
     def encode(self, explicit_permutation):
         raise NotImplementedError('Concrete Encoder has to implement this.')
 
+    def decode_batch(self, encoded_permutations):
+        raise NotImplementedError('Concrete Encoder has to implement this.')
+
+    def to_positions(self, encoded_permutations):
+        """
+        :param encoded_permutations: matrix with one encoded permutation per row
+        :return: matrix of shape (m, decoded_length) with the positions of the decoded elements within the default permutation
+        :rtype: numpy.ndarray
+        """
+        raise NotImplementedError('Concrete Encoder has to implement this.')
+
+    def from_positions(self, positions):
+        """
+        Inverse of to_positions(), encodes a matrix of permutations of range(decoded_length).
+        """
+        raise NotImplementedError('Concrete Encoder has to implement this.')
+
+    def cross_over(self, code1, code2, rng=None):
+        raise NotImplementedError('Concrete Encoder has to implement this.')
+
+    def mutate(self, code, rng=None):
+        raise NotImplementedError('Concrete Encoder has to implement this.')
+
     @property
     def encoded_length(self):
         """
@@ -72,12 +462,26 @@ class ExplicitListPermutationEncoder(PermutationEncoder):
     def encode(self, decoded_permutation):
         return decoded_permutation
 
-    def sample_random(self):
+    def decode_batch(self, encoded_permutations):
+        return np.asarray(encoded_permutations)
+
+    def to_positions(self, encoded_permutations):
+        default_permutation = np.asarray(self._default_permutation)
+        sorter = np.argsort(default_permutation)
+        return sorter[np.searchsorted(default_permutation, encoded_permutations, sorter=sorter)]
+
+    def from_positions(self, positions):
+        return np.asarray(self._default_permutation)[positions]
+
+    def sample_random(self, rng=None):
         # Fisher-Yates Shuffle
         # https://gist.github.com/JenkinsDev/1e4bff898c72ec55df6f
         permut = list(self._default_permutation)
-        random.shuffle(permut)
-        return permut
+        return [permut[idx] for idx in as_generator(rng).permutation(len(permut))]
+
+    def sample_random_batch(self, n, rng=None):
+        positions = np.tile(np.arange(self.decoded_length), (n, 1))
+        return np.asarray(self._default_permutation)[as_generator(rng).permuted(positions, axis=1)]
 
     @property
     def encoded_length(self):
@@ -98,8 +502,47 @@ class ExplicitListPermutationEncoder(PermutationEncoder):
         return "ExplicitListPermutationEncoder"
 
 
+class _RankPermutationEncoder(PermutationEncoder):
+    """
+    Implicit encoding of a permutation by its single integer rank in lexicographic order of all permutations.
+    """
+    def decode(self, encoded_permutation):
+        return tuple(self._default_permutation[position] for position in lehmer_decode(encoded_permutation, self.decoded_length))
+
+    def encode(self, decoded_permutation):
+        element_positions = {element: position for position, element in enumerate(self._default_permutation)}
+        return lehmer_encode([element_positions[element] for element in decoded_permutation])
+
+    def decode_batch(self, encoded_permutations):
+        """
+        :param encoded_permutations: array of m permutation ranks
+        :return: matrix of shape (m, decoded_length) with one decoded permutation per row
+        :rtype: numpy.ndarray
+        """
+        return np.asarray(self._default_permutation)[lehmer_decode_batch(encoded_permutations, self.decoded_length)]
+
+    def to_positions(self, encoded_permutations):
+        return lehmer_decode_batch(np.asarray(encoded_permutations).reshape(-1), self.decoded_length)
+
+    def from_positions(self, positions):
+        # Exact ranks may exceed int64, so they are computed row by row
+        return np.array([lehmer_encode(row) for row in positions], dtype=object).reshape(-1, 1)
+
+    def fits(self, code):
+        # Float genome matrices of populations hold ranks as integral floats
+        return _is_integral(code) and 0 <= code < math.factorial(self.decoded_length)
+
+    def sample_random_batch(self, n, rng=None):
+        rng = as_generator(rng)
+        possible_codings = math.factorial(self.decoded_length)
+        if possible_codings <= np.iinfo(np.int64).max:
+            return rng.integers(possible_codings, size=(n, 1))
+        # Ranks beyond int64 are drawn one by one as python integers
+        return np.array([_random_rank(possible_codings, rng) for _ in range(n)], dtype=object).reshape(-1, 1)
+
+
 @export
-class ImplicitListPermutationEncoder(PermutationEncoder):
+class ImplicitListPermutationEncoder(_RankPermutationEncoder):
     @staticmethod
     def create(permutation_description):
         return ImplicitListPermutationEncoder(permutation_description)
@@ -111,16 +554,9 @@ class ImplicitListPermutationEncoder(PermutationEncoder):
         """
         self._default_permutation = description
 
-    def decode(self, encoded_permutation):
-        # TODO can we solve this more efficient?
-        last_permut = None
-        for _, permut in zip(range(encoded_permutation + 1), itertools.permutations(self._default_permutation)):
-            last_permut = permut
-        return last_permut
-
-    def sample_random(self):
+    def sample_random(self, rng=None):
         possible_codings = math.factorial(self.decoded_length)
-        return np.random.randint(possible_codings)
+        return _random_rank(possible_codings, as_generator(rng))
 
     @property
     def encoded_length(self):
@@ -134,14 +570,11 @@ class ImplicitListPermutationEncoder(PermutationEncoder):
     def version(self):
         return 1
 
-    def fits(self, code):
-        return np.issubdtype(type(code), np.signedinteger)
-
     def __str__(self):
         return "ListPermutationEncoder"
 
 @export
-class RangePermutationEncoder(PermutationEncoder):
+class RangePermutationEncoder(_RankPermutationEncoder):
     """
     '1:10'
     'A:E'
@@ -161,16 +594,9 @@ class RangePermutationEncoder(PermutationEncoder):
         self._range_end = range_end
         self._default_permutation = range(range_start, range_end + 1)
 
-    def decode(self, encoded_permutation):
-        # TODO can we solve this more efficient?
-        last_permut = None
-        for _, permut in zip(range(encoded_permutation + 1), itertools.permutations(self._default_permutation)):
-            last_permut = permut
-        return last_permut
-
-    def sample_random(self):
+    def sample_random(self, rng=None):
         possible_codings = math.factorial(self.decoded_length)
-        return np.random.randint(possible_codings)
+        return _random_rank(possible_codings, as_generator(rng))
 
     @property
     def encoded_length(self):
@@ -184,11 +610,115 @@ class RangePermutationEncoder(PermutationEncoder):
     def version(self):
         return 1
 
+    def __str__(self):
+        return "ListPermutationEncoder"
+
+@export
+class RandomKeyPermutationEncoder(PermutationEncoder):
+    """
+    Encodes a permutation as a vector of float keys in [0, 1) which is decoded by sorting the elements by their keys.
+    This works for permutations of any length, as no rank beyond the int64 range has to be represented.
+    Every key vector decodes to a valid permutation, thus crossover and mutation of keys never need a repair step.
+
+    [0.7, 0.1, 0.4] with ['A', 'B', 'C'] decodes to ('B', 'C', 'A')
+    """
+    @staticmethod
+    def create(permutation_description):
+        return RandomKeyPermutationEncoder(permutation_description)
+
+    def __init__(self, description):
+        """
+        ['A', 'B', 'C', 'D'] or '1:10'
+        :param description:
+        """
+        if type(description) is str:
+            parts = description.split(':')
+            if len(parts) != 2:
+                raise ValueError('Expecting a range description like 1:10, got %s' % description)
+            description = range(int(parts[0]), int(parts[1]) + 1)
+        self._default_permutation = description
+
+    def decode(self, encoded_permutation):
+        order = np.argsort(np.asarray(encoded_permutation), kind='stable')
+        return tuple(self._default_permutation[position] for position in order)
+
+    def decode_batch(self, encoded_permutations):
+        """
+        :param encoded_permutations: matrix of shape (m, decoded_length) with one key vector per row
+        :return: matrix of shape (m, decoded_length) with one decoded permutation per row
+        :rtype: numpy.ndarray
+        """
+        return np.asarray(self._default_permutation)[np.argsort(encoded_permutations, axis=1, kind='stable')]
+
+    def to_positions(self, encoded_permutations):
+        return np.argsort(encoded_permutations, axis=1, kind='stable')
+
+    def from_positions(self, positions):
+        positions = np.asarray(positions)
+        keys = np.empty(positions.shape)
+        keys[np.arange(len(positions))[:, None], positions] = (np.arange(positions.shape[1]) + 0.5) / positions.shape[1]
+        return keys
+
+    def encode(self, decoded_permutation):
+        element_positions = {element: position for position, element in enumerate(self._default_permutation)}
+        keys = np.empty(self.decoded_length)
+        # The element at the i-th place of the permutation gets the i-th smallest key
+        keys[[element_positions[element] for element in decoded_permutation]] = (np.arange(self.decoded_length) + 0.5) / self.decoded_length
+        return keys
+
+    def sample_random(self, rng=None):
+        return as_generator(rng).random(self.decoded_length)
+
+    def sample_random_batch(self, n, rng=None):
+        return as_generator(rng).random((n, self.decoded_length))
+
+    def cross_over(self, code1, code2, rng=None):
+        """
+        Uniform crossover of keys, works on single key vectors as well as on matrices of them.
+        """
+        code1 = np.asarray(code1)
+        mask = as_generator(rng).random(code1.shape) < 0.5
+        return np.where(mask, code1, code2)
+
+    def mutate(self, code, rng=None, rate: float=None):
+        """
+        Redraws each key with the given rate, by default one key per permutation is redrawn on average.
+        Works on single key vectors as well as on matrices of them.
+        """
+        rng = as_generator(rng)
+        mutation = np.array(code, dtype=float)
+        if rate is None:
+            rate = 1.0 / self.decoded_length
+        mask = rng.random(mutation.shape) < rate
+        mutation[mask] = rng.random(np.count_nonzero(mask))
+        return mutation
+
+    @property
+    def encoded_length(self):
+        return len(self._default_permutation)
+
+    @property
+    def decoded_length(self):
+        return len(self._default_permutation)
+
+    @property
+    def version(self):
+        return 1
+
     def fits(self, code):
-        return np.issubdtype(type(code), np.signedinteger)
+        # Rows of mixed populations are object arrays, so the keys are checked by their values instead of the container dtype
+        code = np.asarray(code)
+        if code.shape != (self.decoded_length,) or code.dtype.kind not in 'fiuO':
+            return False
+        try:
+            keys = code.astype(float)
+        except (TypeError, ValueError):
+            return False
+        return bool(np.isfinite(keys).all())
 
     def __str__(self):
-        return "ListPermutationEncoder"
+        return "RandomKeyPermutationEncoder"
+
 
 @export
 class FeaturePermutation(FeatureType):
@@ -212,11 +742,100 @@ class FeaturePermutation(FeatureType):
 
         self._encoder = encoder.create(permutation_description)
 
-    def sample_random(self):
-        return kayak.GeneCode(np.array([self._encoder.sample_random()]), self)
+    def _unwrap(self, code):
+        # Codes are flat vectors of the encoded length, encoders with a single dimension expect a scalar
+        code = np.asarray(code)
+        return code[0] if self._encoder.encoded_length == 1 else code
+
+    def sample_random(self, rng=None):
+        return kayak.GeneCode(np.reshape(self._encoder.sample_random(rng=rng), self._encoder.encoded_length), self)
+
+    def sample_random_batch(self, n, rng=None, out=None):
+        return _write_batch(self._encoder.sample_random_batch(n, rng=rng).reshape(n, self._encoder.encoded_length), out)
+
+    def cross_over(self, code1, code2, rng=None):
+        return self._encoder.cross_over(np.asarray(code1), np.asarray(code2), rng=rng)
+
+    def _mutate_random(self, code, rng):
+        try:
+            return self._encoder.mutate(code, rng=rng)
+        except NotImplementedError:
+            # Encoders without an own mutation swap two elements of the decoded permutation
+            mutation = self.mutate_batch(code.reshape(1, -1), method='swap', rng=rng)
+            return np.reshape(mutation, self._encoder.encoded_length).astype(code.dtype)
+
+    def cross_over_batch(self, parents1, parents2, method: str='ox', rng=None):
+        """
+        Breeds one offspring per pair of rows with a permutation crossover operator, vectorized over all rows.
+
+        :param parents1: matrix with one code of this feature per row
+        :param parents2: matrix with one code of this feature per row
+        :param method: one of 'pmx', 'ox', 'cx' or 'erx'
+        :param rng: numpy.random.Generator or seed
+        :return: matrix with one offspring code per row
+        :rtype: numpy.ndarray
+        """
+        if method not in PERMUTATION_CROSSOVERS:
+            raise ValueError('Unknown permutation crossover %s, expecting one of %s' % (method, ', '.join(PERMUTATION_CROSSOVERS)))
+        positions1 = self._encoder.to_positions(parents1)
+        positions2 = self._encoder.to_positions(parents2)
+        return self._encoder.from_positions(PERMUTATION_CROSSOVERS[method](positions1, positions2, rng=rng))
+
+    def mutate_batch(self, codes, method: str='swap', rng=None):
+        """
+        Mutates each row with a permutation mutation operator, vectorized over all rows.
+
+        :param codes: matrix with one code of this feature per row
+        :param method: one of 'swap', 'inversion' or 'scramble'
+        :param rng: numpy.random.Generator or seed
+        :return: matrix with one mutated code per row
+        :rtype: numpy.ndarray
+        """
+        if method not in PERMUTATION_MUTATIONS:
+            raise ValueError('Unknown permutation mutation %s, expecting one of %s' % (method, ', '.join(PERMUTATION_MUTATIONS)))
+        return self._encoder.from_positions(PERMUTATION_MUTATIONS[method](self._encoder.to_positions(codes), rng=rng))
 
     def decode(self, code):
-        return self._encoder.decode(code[0])
+        return self._encoder.decode(self._unwrap(code))
+
+    def decode_batch(self, matrix):
+        """
+        :param matrix: matrix with one encoded permutation per row
+        :return: matrix with one decoded permutation per row
+        :rtype: numpy.ndarray
+        """
+        matrix = np.asarray(matrix)
+        return self._encoder.decode_batch(matrix[:, 0] if self._encoder.encoded_length == 1 else matrix)
+
+    def encode(self, permutation):
+        return np.reshape(self._encoder.encode(permutation), self._encoder.encoded_length)
 
     def fits(self, code):
-        return self._encoder.fits(code[0])
+        if len(code) != self._encoder.encoded_length:
+            return False
+        return self._encoder.fits(self._unwrap(code))
+
+    @property
+    def dynamically_sized(self):
+        return False
+
+    @property
+    def numeric_codes(self):
+        # Explicit lists encode permutations by their elements, e.g. labels, all other encoders by numbers
+        if isinstance(self._encoder, ExplicitListPermutationEncoder):
+            return np.asarray(self._encoder._default_permutation).dtype.kind in 'biuf'
+        if isinstance(self._encoder, _RankPermutationEncoder):
+            # Ranks beyond 2**53 are not exactly representable in float64 code matrices and are kept as python integers
+            return math.factorial(self._encoder.decoded_length) <= 2 ** 53
+        return True
+
+    @property
+    def min_size(self):
+        return self._encoder.encoded_length
+
+    @property
+    def max_size(self):
+        return self._encoder.encoded_length
+
+    def __str__(self):
+        return 'permutation(%s)' % self._encoder
@@ -1,11 +1,18 @@
-import random
 import numpy
 import semantic_version
 from deprecated import deprecated
 from .feature_types import FeatureType
 from .feature_types import FeatureSet
+from .feature_types.native import _as_code_matrix
+from .rng import as_generator
 from . import export
 
+try:
+    import pandas
+    KAYAK_PANDAS = True
+except ImportError:
+    KAYAK_PANDAS = False
+
 
 @export
 class GeneticEncoding(FeatureSet):
@@ -25,11 +32,23 @@ class GeneticEncoding(FeatureSet):
         super().__init__(feature_description)
 
         self._name = name
+        self._map_index = None
         try:
             self._version = semantic_version.Version(version)
         except ValueError as e:
             raise ValueError('Invalid semantic version for genetic encoding given', e)
 
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def version(self):
+        """
+        :rtype: semantic_version.Version
+        """
+        return self._version
+
     @deprecated
     def contains(self, code):
         """
@@ -54,49 +73,78 @@ class GeneticEncoding(FeatureSet):
             yield feature['type']
 
     def map(self, code, type_check=False):
-        print('Code: ', code)
-        print('Features: ', self._features)
-        print()
-        map = {}
-        code_offset = 0
-        #for feature in self._features:
-        #    feature_size = len(feature['type'])
-        #    map[feature['name']] = code[code_offset:feature_size]
-        for feature in self._features:
-            print(feature)
-            print(feature['type'])
-            print(feature['offset'])
-            map = {**map, **_map_feature(feature['name'], feature['type'], code, feature['offset'], feature['one_hot'])}
-            print()
-        return map
-
-
-def _map_feature(feature_name, feature_type, code, offset=0, one_hot=False):
-    feature_size = len(feature_type)
-    if isinstance(feature_type, FeatureSet):
-        map = {}
-        subfeature_offset = offset
-        for subfeature_name in feature_type.get_features():
-            subfeature_type = feature_type.get_features()[subfeature_name]
-            subfeature_size = len(subfeature_type)
-            if isinstance(subfeature_type, list):
-                one_hot_encoding = any(hasattr(f, '__len__') and len(f) > 1 for f in subfeature_type) if len(subfeature_type) > 1 else False
-            map = {**map, **_map_feature(subfeature_name, subfeature_type, code, subfeature_offset, one_hot)}
-            subfeature_offset += subfeature_size
-        return map
-    elif isinstance(feature_type, FeatureType):
-        value = code[offset:feature_size] if feature_size > 1 else code[offset]
-        return {feature_name: value}
-    elif isinstance(feature_type, list):
-        if one_hot:
-            list_choice = code[offset]
-            print(list_choice)
-            offset += 1
-            return {feature_name: list_choice, **_map_feature(feature_name, feature_type[list_choice], code, offset, False)}
+        """
+        Maps a code to its features by name, including the features of nested feature sets.
+        Single-dimensional features are mapped to their value, all other features to the result of their build method.
+
+        :param code: GeneCode, numpy array or list
+        :param type_check: whether to raise an error if the code does not fit into this space
+        :return: dictionary of feature names and mapped values
+        :rtype: dict
+        """
+        if isinstance(code, GeneCode):
+            code = code._code
+        if type_check and not self.fits(code):
+            raise ValueError('Code %s does not fit into genetic encoding space %s.' % (code, self))
+
+        compiled = self._current_compiled()
+        if compiled is not None:
+            return compiled.map(code)
+
+        return {name: code[offset] if scalar else ftype.build(code[offset:stop])
+                for name, ftype, offset, stop, scalar in self._mapping_index(self.layout(code))}
+
+    def map_batch(self, matrix, frame: bool=False):
+        """
+        Maps all rows of a code matrix at once into one column per feature name, e.g. for analyzing a whole population.
+        Single-dimensional features are mapped to a view on their column, all other features are built with build_batch.
+
+        :param matrix: two-dimensional numpy array with one code per row, any sequence of codes for dynamically sized spaces
+        :param frame: whether to return a pandas.DataFrame instead of a dictionary, requires pandas
+        :return: dictionary of feature names and arrays with one entry per row, or a DataFrame of them
+        :rtype: dict|pandas.DataFrame
+        """
+        if frame and not KAYAK_PANDAS:
+            raise ImportError('Mapping codes into a data frame requires pandas.')
+
+        if self.dynamically_sized:
+            # Codes have different sizes and layouts, so each code is mapped on its own and missing features are None
+            rows = [self.map(code) for code in matrix]
+            names = list(dict.fromkeys(name for row in rows for name in row))
+            columns = {}
+            for name in names:
+                columns[name] = numpy.empty(len(rows), dtype=object)
+                columns[name][:] = [row.get(name) for row in rows]
         else:
-            return {feature_name: code[offset]}
-    else:
-        return {}
+            matrix = _as_code_matrix(matrix)
+            layout = self.layout()
+            if matrix.shape[1] != layout.size:
+                raise ValueError('Expecting codes of size %s, got a matrix of shape %s' % (layout.size, matrix.shape))
+            columns = {name: matrix[:, offset] if scalar else ftype.build_batch(matrix[:, offset:stop])
+                       for name, ftype, offset, stop, scalar in self._mapping_index(layout)}
+
+        if frame:
+            return pandas.DataFrame({name: column if column.ndim == 1 else list(column) for name, column in columns.items()})
+        return columns
+
+    def _mapping_index(self, layout):
+        """
+        Index of (name, feature type, offset, stop, scalar) for each named feature which is not a nested feature set.
+        Scalar features are mapped to their single value, all others are built from their slice.
+        The index of the cached layout of fixed-size spaces is kept until the layout changes.
+        """
+        if self._map_index is not None and self._map_index[0] is layout:
+            return self._map_index[1]
+
+        index = []
+        for name, (ftype, offset, size) in layout.names.items():
+            if isinstance(ftype, FeatureSet):
+                continue
+            scalar = not isinstance(ftype, FeatureType) or (size == 1 and type(ftype).build is FeatureType.build)
+            index.append((name, ftype, offset, offset + size, scalar))
+        if not self.dynamically_sized:
+            self._map_index = (layout, index)
+        return index
 
 
 def _sample_random_from_feature(feature_type):
@@ -124,12 +172,50 @@ class GeneCode(object):
     A gene is a vector (code) fitting into a certain vector space - its genetic encoding space.
     In addition to a simple numpy array it also provides optimized functionality to access single feature_types of the gene code with respect
     to its genetic encoding space.
+    A gene code might be a view on a row of a population matrix, reading and writing its features then directly accesses the matrix.
+    Views stay valid until the population grows and reallocates its matrix, use copy() for a standalone gene code.
     """
-    def __init__(self, code, space: FeatureType):
-        if not space.fits(code):
+    __slots__ = ('_code', '_space', '_layout')
+
+    def __init__(self, code, space: FeatureType, validate: bool=True):
+        """
+        :param code: numpy array or list, numpy arrays are referenced and not copied
+        :param space: genetic encoding space the code fits into
+        :param validate: whether to check that the code fits into the space, can be skipped for codes known to fit, e.g. rows of a population
+        """
+        if validate and not space.fits(code):
             raise ValueError('Code %s does not fit into genetic encoding space %s.' % (code, space))
         self._code = code
         self._space = space
+        self._layout = None
+
+    @classmethod
+    def view(cls, matrix, row: int, space: FeatureType):
+        """
+        Wraps a row of a code matrix without copying or validating it, e.g. a row of a population matrix.
+
+        :param matrix: two-dimensional numpy array with one code per row which fit into the space
+        :param row: index of the row to wrap
+        :param space: genetic encoding space of the codes
+        :rtype: GeneCode
+        """
+        return cls(matrix[row], space, validate=False)
+
+    @property
+    def is_view(self):
+        """
+        :return: whether the code shares its memory with another array, e.g. the matrix of a population
+        :rtype: bool
+        """
+        return isinstance(self._code, numpy.ndarray) and self._code.base is not None
+
+    def copy(self):
+        """
+        :return: standalone gene code with a copy of this code, changing it does not affect this code
+        :rtype: GeneCode
+        """
+        code = self._code.copy() if isinstance(self._code, numpy.ndarray) else list(self._code)
+        return GeneCode(code, self._space, validate=False)
 
     @deprecated(reason='Kayak by definition will wrap numpy arrays.', version='0.3')
     def as_numpy(self):
@@ -143,60 +229,95 @@ class GeneCode(object):
         :return:
         """
         self._space = space
+        self._layout = None
         return self
 
-    def mutate_random(self):
-        print('mutate_random()')
-        offset = 0
-        for feature in self._space.get_ordered_feature_types():
-            feature_size = len(feature)
-            if isinstance(feature, FeatureType):
-                self._code[offset] = feature.mutate_random(self._code[offset])
-            elif isinstance(feature, list):
-                print(random.choice(feature))
+    @property
+    def space(self):
+        return self._space
+
+    def mutate_random(self, rng=None):
+        """
+        Mutates the code of each feature in place with the random mutation of its feature type, nested feature sets mutate their features.
+        Native values of the space are fixed and stay unchanged, as do features whose type mutates nothing.
+
+        :param rng: numpy.random.Generator or seed, None draws from the default generator of this process
+        :return: this gene code
+        :rtype: GeneCode
+        """
+        rng = as_generator(rng)
+        for ftype, offset, size in self._resolve_layout().positions:
+            if not isinstance(ftype, FeatureType):
+                continue
+            code = self._code[offset:offset + size]
+            if isinstance(ftype, FeatureSet):
+                mutated = GeneCode(code, ftype, validate=False).mutate_random(rng=rng)._code
             else:
-                raise ValueError('Unknown feature type')
-        print(' -- mutate_random')
+                try:
+                    mutated = ftype.mutate_random(code, rng=rng)
+                except NotImplementedError:
+                    # Feature types without a random mutation, e.g. matrices, keep their code
+                    continue
+                if mutated is None:
+                    continue
+                mutated = numpy.ravel(mutated)
+            self._code[offset:offset + size] = mutated if isinstance(self._code, numpy.ndarray) else list(mutated)
+        return self
 
-    def __getitem__(self, item):
+    def _resolve_layout(self):
+        """
+        Resolves the layout table of this code within its space only once, as offsets of dynamically sized spaces depend on the code.
+        """
+        if self._layout is None:
+            if not isinstance(self._space, FeatureSet):
+                raise ValueError('Accessing features of a gene code requires a feature set as its space.')
+            self._layout = self._space.layout(self._code)
+        return self._layout
+
+    def _resolve_feature(self, item):
+        layout = self._resolve_layout()
         if type(item) is int:
-            if item >= len(self._space):
+            if item >= len(layout):
                 raise IndexError('Index exceeds number of features in Gene Code.')
+            return layout.positions[item]
+        elif item in layout.names:
+            return layout.names[item]
+        else:
+            raise ValueError('Unknown feature %s in Gene Code.' % item)
+
+    def __getitem__(self, item):
+        if type(item) is slice:
+            # Slices address dimensions of the raw code, e.g. when a feature set checks the code of each of its features
+            return self._code[item]
+        if isinstance(item, (list, numpy.ndarray)):
+            return numpy.asarray(self._code)[item]
+        ftype, offset, size = self._resolve_feature(item)
+        if not isinstance(ftype, FeatureType):
+            # Native python values of a space occupy exactly one dimension
+            return self._code[offset]
+        return ftype.build(self._code[offset:offset + size])
+
+    def __setitem__(self, item, value):
+        """
+        Writes the code of a single feature in place, for views directly into the underlying matrix.
+        Only the written feature is checked to fit, the size of a feature can not be changed.
+        """
+        ftype, offset, size = self._resolve_feature(item)
+        if not isinstance(ftype, FeatureType):
+            if value != ftype:
+                raise ValueError('Feature %s has the fixed value %s, can not assign %s.' % (item, ftype, value))
+            return
+
+        value = numpy.ravel(value)
+        if len(value) != size or not ftype.fits(value):
+            raise ValueError('Code %s does not fit into feature %s of type %s.' % (value, item, ftype))
+        if isinstance(self._code, numpy.ndarray):
+            self._code[offset:offset + size] = value
+        else:
+            self._code[offset:offset + size] = list(value)
 
-            # Count increasing code_index for all ftypes
-            return_code = False
-            code_offset = 0
-            code_length = len(self._code)
-            for ftype_idx, ftype in enumerate(self._space):
-                # Only count up to ftype_idx which was requested
-                if ftype_idx is item:
-                    return_code = True
-
-                feature_size = len(ftype)
-
-                if not ftype.dynamically_sized:
-                    if return_code:
-                        next_subfeature_offset = min(code_offset + feature_size, code_length)
-                        subfeature_code = self._code[code_offset:next_subfeature_offset]
-                        return ftype.build(subfeature_code)
-
-                    # Fixed-sized ftype lets us simply add its size to jump over its code
-                    code_offset += feature_size
-                else:
-                    check_feature_size = feature_size + 1  # Start with maximum possible size of sub feature
-                    subfeature_fits = False
-                    while check_feature_size > 0 and not subfeature_fits:
-                        next_subfeature_offset = min(code_offset + check_feature_size, code_length)
-                        subfeature_code = self._code[code_offset:next_subfeature_offset]
-                        if ftype.fits(subfeature_code):
-                            subfeature_fits = True
-                            if return_code:
-                                return ftype.build(subfeature_code)
-
-                            code_offset = next_subfeature_offset  # Update next code offset
-                        check_feature_size -= 1  # Decrease feature size to check
-
-        raise ValueError('Accessing non-integer indices not supported.')
+    def __array__(self, dtype=None, copy=None):
+        return numpy.asarray(self._code, dtype=dtype)
 
     def __str__(self):
         return str(self.as_numpy())
@@ -1,76 +1,549 @@
+import os
+import asyncio
+import threading
+import itertools
+import functools
+import collections
+import collections.abc
+import concurrent.futures
 import numpy as np
 from .kayak import GeneticEncoding, GeneCode
+from .cache import FitnessCache, code_key, code_keys, EVICTION_LRU
+
+_MISSING = object()
+
+
+def _as_code_column(codes):
+    """
+    Converts codes of a dynamically sized space into an object column with one code per row, as their sizes differ.
+    A single code is recognized by not containing any codes itself, as codes are flat.
+    """
+    if isinstance(codes, np.ndarray) and codes.ndim == 1 and codes.dtype == object:
+        return codes
+    if isinstance(codes, GeneCode) or not any(isinstance(code, (list, tuple, np.ndarray, GeneCode)) for code in codes):
+        codes = [codes]
+    column = np.empty(len(codes), dtype=object)
+    for idx, code in enumerate(codes):
+        # Assigned one by one, so that codes of equal size are not broadcast into a matrix
+        column[idx] = code._code if isinstance(code, GeneCode) else code
+    return column
+
 
 class Population(object):
-    _pop = set()
+    """
+    Columnar store of gene codes of one genetic encoding space.
+    All genomes are rows of one contiguous matrix, their fitness, age and id are kept in parallel arrays.
+    Fitness values are NaN until they are assigned.
+    Appending grows the arrays geometrically, so that appending single codes is amortized O(1).
+    Codes of dynamically sized spaces (e.g. with plain list options) have no common size, they are kept as one object per row instead.
+    Use fixed encodings such as ft.FeatureList(options, encoding=ft.encoding_one_hot) for a contiguous matrix.
+    Spaces of bit-packed graphs (graph_encoding_packed) can use dtype=np.uint8, as each byte would take eight bytes in a float64 matrix.
+    """
+    _next_id = 0
+    _id_lock = threading.Lock()
+    _ragged = False
 
-    def __init__(self, encoding):
+    def __init__(self, encoding, capacity: int=16, dtype=float):
         if not isinstance(encoding, GeneticEncoding):
             raise ValueError('Expecting a genetic encoding space description for the population.')
 
         self._space = encoding
+        self._size = 0
+        if encoding.dynamically_sized:
+            self._ragged = True
+            self._genomes = np.empty(capacity, dtype=object)
+        else:
+            self._genomes = np.empty((capacity, len(encoding)), dtype=dtype)
+        self._fitness = np.full(capacity, np.nan)
+        self._age = np.zeros(capacity, dtype=np.int64)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+
+    @classmethod
+    def _allocate_ids(cls, number):
+        # Ids are unique across all populations of a process, so that they survive merging populations
+        with cls._id_lock:
+            start = Population._next_id
+            Population._next_id += number
+        return np.arange(start, start + number, dtype=np.int64)
+
+    @property
+    def space(self):
+        return self._space
+
+    @property
+    def genomes(self):
+        """
+        :return: view on the genome matrix with one code per row, an object column of codes for dynamically sized spaces
+        :rtype: numpy.ndarray
+        """
+        return self._genomes[:self._size]
+
+    @property
+    def fitness(self):
+        return self._fitness[:self._size]
+
+    @property
+    def age(self):
+        return self._age[:self._size]
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    def _reserve(self, additional):
+        required = self._size + additional
+        capacity = len(self._genomes)
+        if required <= capacity:
+            return
+
+        capacity = max(required, 2 * capacity)
+        genomes = np.empty((capacity,) + self._genomes.shape[1:], dtype=self._genomes.dtype)
+        genomes[:self._size] = self.genomes
+        fitness = np.full(capacity, np.nan)
+        fitness[:self._size] = self.fitness
+        age = np.zeros(capacity, dtype=np.int64)
+        age[:self._size] = self.age
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self.ids
+        self._genomes, self._fitness, self._age, self._ids = genomes, fitness, age, ids
+
+    def append(self, genomes, fitness=None, age=None, ids=None, validate: bool=True):
+        """
+        Appends a matrix of codes with one code per row to this population.
+
+        :param genomes: two-dimensional matrix of codes or a single code, a sequence of codes for dynamically sized spaces
+        :param fitness: optional fitness values of the codes, otherwise they are unknown (NaN)
+        :param age: optional age of the codes, otherwise zero
+        :param ids: optional ids of the codes, otherwise new ids are assigned
+        :param validate: whether all codes have to be checked to fit into the encoding space of this population
+        :return: ids of the appended codes
+        :rtype: numpy.ndarray
+        """
+        if self._ragged:
+            return self._append_ragged(_as_code_column(genomes), fitness, age, ids, validate)
+
+        genomes = np.asarray(genomes)
+        if genomes.ndim == 1:
+            genomes = genomes.reshape(1, -1)
+        if genomes.ndim != 2 or genomes.shape[1] != self._genomes.shape[1]:
+            raise ValueError('Expecting codes of size %s to append to population, got shape %s' % (self._genomes.shape[1], genomes.shape))
+        if validate:
+            mask = self._space.fits_batch(genomes)
+            if not mask.all():
+                raise ValueError('Codes at rows %s do not fit into encoding space of this population.' % np.flatnonzero(~mask))
+
+        if not np.can_cast(genomes.dtype, self._genomes.dtype, casting='same_kind'):
+            # E.g. codes with native string values require an object matrix
+            numeric = self._genomes.dtype.kind in 'biuf' and genomes.dtype.kind in 'biuf'
+            self._genomes = self._genomes.astype(np.result_type(self._genomes.dtype, genomes.dtype) if numeric else object)
+        return self._write_rows(genomes, fitness, age, ids)
+
+    def _append_ragged(self, genomes, fitness, age, ids, validate):
+        if validate:
+            mask = np.fromiter((self._space.fits(code) for code in genomes), dtype=bool, count=len(genomes))
+            if not mask.all():
+                raise ValueError('Codes at rows %s do not fit into encoding space of this population.' % np.flatnonzero(~mask))
+        return self._write_rows(genomes, fitness, age, ids)
+
+    def _write_rows(self, genomes, fitness, age, ids):
+        number = len(genomes)
+        self._reserve(number)
+
+        rows = slice(self._size, self._size + number)
+        self._genomes[rows] = genomes
+        self._fitness[rows] = np.nan if fitness is None else fitness
+        self._age[rows] = 0 if age is None else age
+        self._ids[rows] = self._allocate_ids(number) if ids is None else ids
+        self._size += number
+        return self._ids[rows]
 
     def add_gene(self, gene_code):
         if not isinstance(gene_code, GeneCode):
             raise ValueError('Expecting valid gene code object fitting in encoding space of this population: type %s' % type(gene_code))
         if not self._space.fits(gene_code):
             raise ValueError('Given gene code does not fit into encoding space of this population.')
-        self._pop.add(gene_code)
+        self.append(gene_code, validate=False)
 
     def add_population(self, other):
-        self._pop = self.merge_population(other)
+        self._check_compatible(other)
+        self.append(other.genomes, fitness=other.fitness, age=other.age, ids=other.ids, validate=False)
 
     def merge_population(self, other):
+        """
+        :return: new population containing the codes of this and the other population
+        :rtype: Population
+        """
+        self._check_compatible(other)
+
+        merged = Population(self._space, capacity=len(self) + len(other), dtype=np.result_type(self._genomes.dtype, other._genomes.dtype))
+        merged.add_population(self)
+        merged.add_population(other)
+        return merged
+
+    def _check_compatible(self, other):
         assert isinstance(other, Population), 'Expecting other object to add to be a population object, got type %s' % type(other)
 
         if self._space != other._space:
             raise ValueError('Encoding spaces of populations to merge do not fit')
 
-        return self._pop | other._pop
+    def select(self, selection):
+        """
+        Selects codes of this population by a slice, a boolean mask or an index array.
+
+        :return: new population containing copies of the selected codes
+        :rtype: Population
+        """
+        selected = Population(self._space, capacity=0, dtype=self._genomes.dtype)
+        selected.append(self.genomes[selection], fitness=self.fitness[selection], age=self.age[selection], ids=self.ids[selection], validate=False)
+        return selected
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            if not -self._size <= item < self._size:
+                raise IndexError('Index exceeds number of codes in population.')
+            return GeneCode.view(self.genomes, item, self._space)
+        return self.select(item)
 
     def __iadd__(self, other):
         if isinstance(other, Population):
             self.add_population(other)
+        elif type(other) is int:
+            self._append_random(int(other))
+        elif isinstance(other, np.ndarray) or isinstance(other, collections.abc.Iterator):
+            # E.g. chunks streamed by GeneticEncoding.generate_random_chunks()
+            self.extend(other)
         else:
-            if not type(other) is int:
-                raise ValueError('Can not add non-population or non-integer value to population object.')
-
-            for gene in self._space.generate_random(int(other)):
-                self.add_gene(gene)
+            raise ValueError('Can not add non-population, non-integer or non-chunk value to population object.')
         return self
 
+    def extend(self, chunks, validate: bool=True):
+        """
+        Appends codes chunk by chunk, e.g. streamed from generate_random_chunks(), without holding more than one chunk in memory.
+
+        :param chunks: iterable of two-dimensional code matrices or a single matrix
+        :param validate: whether all codes have to be checked to fit into the encoding space of this population
+        :return: number of appended codes
+        :rtype: int
+        """
+        if isinstance(chunks, np.ndarray):
+            chunks = [chunks]
+        number = 0
+        for chunk in chunks:
+            number += len(self.append(chunk, validate=validate))
+        return number
+
+    def _append_random(self, number):
+        if self._ragged:
+            self.append(list(self._space.generate_random(number)), validate=False)
+            return
+        dtype = self._genomes.dtype
+        if dtype != object and not (dtype.kind in 'fc' and self._space.numeric_codes):
+            # Non-numeric values (e.g. labels of permutations) or floats do not fit into the buffer, append promotes its dtype
+            self.append(self._space.sample_random_batch(number), validate=False)
+            return
+
+        # Codes are sampled directly into the buffer, without an intermediate matrix of samples
+        self._reserve(number)
+        rows = slice(self._size, self._size + number)
+        self._space.sample_random_batch(number, out=self._genomes[rows])
+        self._fitness[rows] = np.nan
+        self._age[rows] = 0
+        self._ids[rows] = self._allocate_ids(number)
+        self._size += number
+
     def __radd__(self, other):
         return other + len(self)
 
     def __len__(self):
-        return len(self._pop)
+        return self._size
 
     def __iter__(self):
-        return iter(self._pop)
+        # Each gene code wraps a row view on the genome matrix without copying or validating it again
+        genomes, space = self._genomes, self._space
+        for idx in range(self._size):
+            yield GeneCode.view(genomes, idx, space)
+
+
+FitnessEvaluation = collections.namedtuple('FitnessEvaluation', ['fitness', 'errors'])
+FitnessEvaluation.__doc__ = """
+Result of evaluating a population, fitness values are in population order and NaN for codes whose evaluation failed.
+Errors map the position of each failed code in the population to the raised exception.
+"""
+
+
+FitnessResult = collections.namedtuple('FitnessResult', ['position', 'fitness', 'error'])
+FitnessResult.__doc__ = """
+Fitness of a single code streamed from an asynchronous evaluation, fitness is NaN and error is set if the evaluation failed.
+"""
+
+
+def _obtain_fitness_safely(fitness_map, gene_code):
+    # Module-level function so that it can be sent to worker processes
+    try:
+        return fitness_map.obtain_fitness(gene_code), None
+    except Exception as e:
+        return np.nan, e
+
+
+def _calculate_fitness_safely(fitness_map, gene_code):
+    try:
+        return fitness_map.calculate_fitness(gene_code), None
+    except Exception as e:
+        return np.nan, e
+
+
+def _resolve_executor(executor, workers):
+    if isinstance(executor, concurrent.futures.Executor):
+        return executor, False
+    if executor == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers), True
+    if executor == 'process':
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers), True
+    raise ValueError('Unknown executor %s, expecting \'thread\', \'process\' or a concurrent.futures.Executor.' % executor)
 
 
 class FitnessMap(object):
     def obtain_fitness(self, gene_code):
         raise NotImplementedError('Concrete fitness mapping object for population has to be implemented.')
 
+    def evaluate_population(self, population, executor='thread', workers: int=None, chunksize: int=1):
+        """
+        Obtains the fitness of all codes of a population in parallel and stores them in the fitness column of the population.
+        A failing evaluation does not stop the others, its fitness is NaN and its exception is reported in the result.
+        For a process pool this fitness map and the codes have to be picklable.
+
+        :param population: population of gene codes to evaluate
+        :param executor: 'thread', 'process' or an existing concurrent.futures.Executor which is not shut down afterwards
+        :param workers: number of workers of a new pool, defaults to the number of cores
+        :param chunksize: number of codes sent to a worker process at once
+        :return: fitness values in population order and errors by position
+        :rtype: FitnessEvaluation
+        """
+        assert isinstance(population, Population), 'Expecting a population to evaluate, got type %s' % type(population)
+        results = self._map_parallel(_obtain_fitness_safely, population, executor, workers, chunksize)
+
+        fitness = np.array([value for value, _ in results], dtype=float)
+        errors = {position: error for position, (_, error) in enumerate(results) if error is not None}
+        population.fitness[:] = fitness
+        return FitnessEvaluation(fitness, errors)
+
+    def _map_parallel(self, function, gene_codes, executor, workers, chunksize):
+        """
+        :return: list of tuples of fitness and error of function(self, gene_code) for all gene codes, in their order
+        """
+        if workers is None:
+            workers = os.cpu_count()
+
+        pool, owns_pool = _resolve_executor(executor, workers)
+        try:
+            return list(pool.map(functools.partial(function, self), gene_codes, chunksize=chunksize))
+        finally:
+            if owns_pool:
+                pool.shutdown()
+
     def __getitem__(self, item):
-        assert isinstance(item, GeneCode), 'Expecting selected item object to be a GeneCode, got type %s' % type(gene_code)
+        assert isinstance(item, GeneCode), 'Expecting selected item object to be a GeneCode, got type %s' % type(item)
         return self.obtain_fitness(item)
 
 
 class CachedFitnessMap(FitnessMap):
-    _cached_fitness = {}
+    """
+    Caches calculated fitness values by the content of codes, so that duplicate codes are only calculated once.
+    The cache belongs to this instance and is bounded by the given maximum number of entries and bytes.
+    An optional persistent store, e.g. a kayak.cache.SQLiteFitnessStore, is consulted on cache misses and receives all calculated values.
+    With warm set, the in-memory cache is filled from the store at construction, with the entries of the given encoding only if one is given
+    and never beyond the bounds of the cache.
+    """
+    def __init__(self, max_entries: int=None, max_bytes: int=None, eviction: str=EVICTION_LRU, store=None, warm: bool=True,
+                 encoding: GeneticEncoding=None):
+        self._cache = FitnessCache(max_entries=max_entries, max_bytes=max_bytes, eviction=eviction)
+        self._store = store
+        if store is not None and warm:
+            self._warm(encoding, max_entries)
+
+    def _warm(self, encoding, max_entries):
+        name, version = (encoding.name, str(encoding.version)) if encoding is not None else (None, None)
+        for key, fitness in self._store.load(encoding=name, version=version, limit=max_entries):
+            self._cache.put(key, fitness)
+            if self._cache.evictions > 0:
+                # The byte bound is reached, further entries would only evict the loaded ones
+                break
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def cache(self):
+        """
+        :rtype: kayak.cache.FitnessCache
+        """
+        return self._cache
+
+    def evaluate_population(self, population, executor='thread', workers: int=None, chunksize: int=1):
+        """
+        Like FitnessMap.evaluate_population(), but codes with equal keys are evaluated only once, even when running in parallel.
+        With canonicalizing features, this includes codes of equivalent phenotypes such as isomorphic graphs.
+        Cached and stored values are looked up in this process, workers only calculate the missing ones and their results are cached here.
+        Pending writes of the store are committed afterwards, so that a crash after the evaluation does not lose its fitness values.
+        """
+        try:
+            return self._evaluate_population(population, executor, workers, chunksize)
+        finally:
+            if self._store is not None:
+                self._store.flush()
+
+    def _evaluate_population(self, population, executor, workers, chunksize):
+        assert isinstance(population, Population), 'Expecting a population to evaluate, got type %s' % type(population)
+        keys = code_keys(population.space, population.genomes)
+        fitness = np.full(len(keys), np.nan)
+        errors = {}
+        missing = {}
+        for position, key in enumerate(keys):
+            value = self._lookup(key)
+            if value is _MISSING:
+                missing.setdefault(key, []).append(position)
+            else:
+                fitness[position] = value
+
+        if len(missing) > 0:
+            representatives = population.select(np.fromiter((positions[0] for positions in missing.values()), dtype=int, count=len(missing)))
+            results = self._map_parallel(_calculate_fitness_safely, representatives, executor, workers, chunksize)
+            for (key, positions), (value, error) in zip(missing.items(), results):
+                fitness[positions] = value
+                if error is None:
+                    self._remember(key, value)
+                else:
+                    errors.update((position, error) for position in positions)
+
+        population.fitness[:] = fitness
+        return FitnessEvaluation(fitness, errors)
+
+    def _lookup(self, key):
+        fitness = self._cache.get(key, _MISSING)
+        if fitness is _MISSING and self._store is not None:
+            fitness = self._store.get(key, _MISSING)
+            if fitness is not _MISSING:
+                self._cache.put(key, fitness)
+        return fitness
+
+    def _remember(self, key, fitness):
+        if self._store is not None:
+            self._store.put(key, fitness)
+        self._cache.put(key, fitness)
 
     def obtain_fitness(self, gene_code):
         assert isinstance(gene_code, GeneCode), 'Expecting object to obtain fitness for to be a GeneCode, got type %s' % type(gene_code)
 
-        if gene_code not in self._cached_fitness:
-            self._cached_fitness[gene_code] = self.calculate_fitness(gene_code)
-        return self._cached_fitness[gene_code]
+        key = code_key(gene_code)
+        fitness = self._lookup(key)
+        if fitness is _MISSING:
+            fitness = self.calculate_fitness(gene_code)
+            self._remember(key, fitness)
+        return fitness
 
     def calculate_fitness(self, gene_code):
         raise NotImplementedError('Concrete fitness value calculation for gene code has to be implemented.')
 
+    def __getstate__(self):
+        # Worker processes only calculate fitness values, the cache and the store stay with this instance in its process
+        state = self.__dict__.copy()
+        state.update(_cache=FitnessCache(), _store=None)
+        return state
+
+
+class AsyncFitnessMap(object):
+    """
+    Counterpart of FitnessMap for I/O-bound fitness functions which await external processes instead of blocking a thread.
+    """
+    async def obtain_fitness(self, gene_code):
+        raise NotImplementedError('Concrete asynchronous fitness mapping object for population has to be implemented.')
+
+    async def evaluate_population_async(self, population, concurrency: int=100):
+        """
+        Obtains the fitness of all codes of a population on the running event loop with at most concurrency evaluations in flight.
+        Results are streamed in completion order and stored in the fitness column of the population as they arrive.
+        Tasks are only created for the evaluations in flight and refilled as they complete, so populations of any size can be streamed.
+
+        Usage:
+        ```
+        async for result in fitness_map.evaluate_population_async(pop, concurrency=1000):
+            print(result.position, result.fitness)
+        ```
+
+        :param population: population of gene codes to evaluate
+        :param concurrency: maximum number of simultaneously running evaluations
+        :return: asynchronous iterator over the fitness results
+        :rtype: typing.AsyncIterator[FitnessResult]
+        """
+        assert isinstance(population, Population), 'Expecting a population to evaluate, got type %s' % type(population)
+
+        async def evaluate(position, gene_code):
+            try:
+                return FitnessResult(position, await self.obtain_fitness(gene_code), None)
+            except Exception as e:
+                return FitnessResult(position, np.nan, e)
+
+        gene_codes = enumerate(population)
+        pending = set()
+        try:
+            while True:
+                for position, gene_code in itertools.islice(gene_codes, concurrency - len(pending)):
+                    pending.add(asyncio.ensure_future(evaluate(position, gene_code)))
+                if len(pending) < 1:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                results = [task.result() for task in done]
+                for result in results:
+                    population.fitness[result.position] = result.fitness
+                for result in results:
+                    yield result
+        finally:
+            # Stopping the iteration early must not leave evaluations running in the background
+            for task in pending:
+                task.cancel()
+
+
+class AsyncCachedFitnessMap(AsyncFitnessMap):
+    """
+    Caches calculated fitness values by the content of codes like CachedFitnessMap.
+    Concurrent requests for the same code share a single running calculation.
+    """
+    def __init__(self, max_entries: int=None, max_bytes: int=None, eviction: str=EVICTION_LRU):
+        self._cache = FitnessCache(max_entries=max_entries, max_bytes=max_bytes, eviction=eviction)
+        self._running = {}
+
+    @property
+    def cache(self):
+        """
+        :rtype: kayak.cache.FitnessCache
+        """
+        return self._cache
+
+    async def obtain_fitness(self, gene_code):
+        assert isinstance(gene_code, GeneCode), 'Expecting object to obtain fitness for to be a GeneCode, got type %s' % type(gene_code)
+
+        key = code_key(gene_code)
+        fitness = self._cache.get(key, _MISSING)
+        if fitness is not _MISSING:
+            return fitness
+
+        running = self._running.get(key)
+        if running is None:
+            running = asyncio.ensure_future(self.calculate_fitness(gene_code))
+            self._running[key] = running
+        try:
+            fitness = await asyncio.shield(running)
+        finally:
+            # Failed calculations are not cached so that they can be retried
+            if running.done() and self._running.get(key) is running:
+                del self._running[key]
+        self._cache.put(key, fitness)
+        return fitness
+
+    async def calculate_fitness(self, gene_code):
+        raise NotImplementedError('Concrete asynchronous fitness value calculation for gene code has to be implemented.')
+
 
 class DelayedRandomFitnessMap(CachedFitnessMap):
     def calculate_fitness(self, gene_code):
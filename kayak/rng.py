@@ -0,0 +1,66 @@
+import os
+import threading
+import numpy as np
+
+_default_generator = None
+_default_generator_lock = threading.Lock()
+
+
+def _reset_default_generator():
+    global _default_generator
+    _default_generator = None
+
+
+if hasattr(os, 'register_at_fork'):
+    # Forked worker processes must not continue the random stream of their parent
+    os.register_at_fork(after_in_child=_reset_default_generator)
+
+
+def default_generator():
+    """
+    :return: generator of this process seeded with fresh entropy, used wherever no explicit generator or seed is given
+    :rtype: numpy.random.Generator
+    """
+    global _default_generator
+    if _default_generator is None:
+        with _default_generator_lock:
+            if _default_generator is None:
+                _default_generator = np.random.default_rng()
+    return _default_generator
+
+
+def as_generator(rng=None):
+    """
+    Resolves the given seed or generator into a numpy random generator.
+
+    :param rng: None for the default generator of this process, an integer seed, a numpy.random.SeedSequence or a numpy.random.Generator
+                which is used as is
+    :return: generator to draw samples from
+    :rtype: numpy.random.Generator
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        return default_generator()
+    return np.random.default_rng(rng)
+
+
+def spawn(rng=None, number: int=1):
+    """
+    Derives statistically independent child generators, e.g. one per worker of a thread or process pool.
+    Children of the same seed are reproducible regardless of the order in which the workers use them, and workers do not share any state.
+
+    ```
+    generators = spawn(42, workers)
+    executor.map(evaluate, chunks, generators)
+    ```
+
+    :param rng: integer seed, numpy.random.SeedSequence or numpy.random.Generator to derive the children from, None for fresh entropy
+    :param number: number of child generators
+    :return: list of independent generators
+    :rtype: list
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng.spawn(number)
+    sequence = rng if isinstance(rng, np.random.SeedSequence) else np.random.SeedSequence(rng)
+    return [np.random.default_rng(child) for child in sequence.spawn(number)]
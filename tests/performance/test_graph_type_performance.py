@@ -39,4 +39,33 @@ class GraphTypePerformanceTest(unittest.TestCase):
 
             # Assert
             self.assertTrue(fits)
-            self.assertGreater(time_fits_delta, 0)
\ No newline at end of file
+            self.assertGreater(time_fits_delta, 0)
+
+    def test_fits_scales_linearly(self):
+        # Arrange
+        # All sizes exceed the CPU caches so that memory bandwidth is comparable
+        graph_sizes = [2000, 3500, 5000]
+        rng = np.random.default_rng(0)
+        time_per_entry = []
+
+        for graph_size in graph_sizes:
+            graph_feature = fg.ErdosRenyiGraphType(graph_size, 0.1)
+            upper = np.triu(rng.random((graph_size, graph_size)) < 0.1, k=1)
+            code = (upper | upper.T).astype(float).ravel()
+
+            # Act
+            time_fits_delta = min(self._time_fits(graph_feature, code) for _ in range(3))
+            time_per_entry.append(time_fits_delta / code.size)
+            print("\t%s - %.6f" % (graph_size, time_fits_delta))
+
+            # Assert
+            self.assertTrue(graph_feature.fits(code))
+
+        # Time per entry must stay roughly constant, a check quadratic in the entries would grow it more than sixfold
+        self.assertLess(time_per_entry[-1], 2 * time_per_entry[0])
+
+    @staticmethod
+    def _time_fits(graph_feature, code):
+        time_fits_start = time.perf_counter()
+        graph_feature.fits(code)
+        return time.perf_counter() - time_fits_start
@@ -0,0 +1,28 @@
+import time
+import numpy as np
+import unittest
+from kayak.feature_types.permutation import PERMUTATION_CROSSOVERS
+from kayak.feature_types.permutation import PERMUTATION_MUTATIONS
+
+
+class PermutationOperatorPerformanceTest(unittest.TestCase):
+    def test_batch_operator_timing(self):
+        # Arrange
+        rng = np.random.default_rng(0)
+        population_size, cities = 10000, 200
+        parents1 = np.argsort(rng.random((population_size, cities)), axis=1)
+        parents2 = np.argsort(rng.random((population_size, cities)), axis=1)
+
+        for method, operator in list(PERMUTATION_CROSSOVERS.items()) + list(PERMUTATION_MUTATIONS.items()):
+            # Act
+            time_start = time.perf_counter()
+            if method in PERMUTATION_CROSSOVERS:
+                operator(parents1, parents2, rng=rng)
+            else:
+                operator(parents1, rng=rng)
+            time_delta = time.perf_counter() - time_start
+            print('%s on %s x %s: %.3fs' % (method, population_size, cities, time_delta))
+
+            # Assert
+            # Edge recombination builds tours step by step and is allowed more time
+            self.assertLess(time_delta, 5.0 if method == 'erx' else 1.0)
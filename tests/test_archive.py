@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import kayak
+
+
+class ArchivedPopulationTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._path = os.path.join(self._directory, 'population.kpop')
+        self._encoding = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_append_and_read_only_access(self):
+        # Arrange
+        archive = kayak.ArchivedPopulation(self._path, self._encoding, mode='w+', capacity=4)
+        reader = kayak.ArchivedPopulation(self._path)
+
+        # Act
+        archive += 10
+        archive.fitness[:] = np.arange(10)
+        archive.append([[3, 0.5]], fitness=[1.5])
+        archive.flush()
+
+        # Assert
+        self.assertEqual(len(archive), 11)
+        self.assertEqual(len(reader), 11)
+        self.assertTrue(np.array_equal(reader.genomes, archive.genomes))
+        self.assertListEqual(list(reader.fitness), list(range(10)) + [1.5])
+        self.assertEqual(reader.name, 'test_enc')
+        self.assertEqual(reader.version, '0.1.0')
+        self.assertListEqual([entry[0] for entry in reader.layout], ['a', 'b'])
+        with self.assertRaises(ValueError):
+            reader += 1
+
+    def test_read_only_selection_without_encoding(self):
+        # Arrange
+        encoding = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'n': kayak.feature_types.FeatureSet({'c': kayak.feature_types.unitfloat, 'm': kayak.feature_types.Matrix(1, 2)})
+        })
+        with kayak.ArchivedPopulation(self._path, encoding, mode='w+') as archive:
+            archive += 6
+            archive.fitness[:] = np.arange(6)
+        reader = kayak.ArchivedPopulation(self._path)
+
+        # Act
+        best = reader[reader.fitness > 3]
+        first = reader[:2]
+        code = reader[4]
+
+        # Assert
+        self.assertEqual(len(best), 2)
+        self.assertTrue(np.array_equal(best.genomes, reader.genomes[4:]))
+        self.assertListEqual(list(first.ids), list(reader.ids[:2]))
+        self.assertEqual(code['a'][0], reader.genomes[4, 0])
+        self.assertEqual(code['c'][0], reader.genomes[4, 1])
+        self.assertListEqual(list(code['m']), list(reader.genomes[4, 2:4]))
+        self.assertEqual(len(code['n']), 3)
+
+    def test_views_write_into_archive(self):
+        # Arrange
+        with kayak.ArchivedPopulation(self._path, self._encoding, mode='w+') as archive:
+            archive += 3
+
+            # Act
+            codes = list(archive)
+            codes[1]['a'] = 42
+
+        # Assert
+        reopened = kayak.ArchivedPopulation(self._path, self._encoding)
+        self.assertEqual(reopened.genomes[1, 0], 42)
+        self.assertTrue(self._encoding.fits_batch(reopened.genomes).all())
+
+    def test_resume_appending(self):
+        # Arrange
+        with kayak.ArchivedPopulation(self._path, self._encoding, mode='w+', capacity=2) as archive:
+            archive += 5
+            ids = list(archive.ids)
+
+        # Act
+        resumed = kayak.ArchivedPopulation(self._path, self._encoding, mode='r+')
+        resumed += 5
+
+        # Assert
+        self.assertEqual(len(resumed), 10)
+        self.assertListEqual(list(resumed.ids[:5]), ids)
+        self.assertEqual(len(set(resumed.ids)), 10)
+
+    def test_open_with_other_encoding_fail(self):
+        # Arrange
+        kayak.ArchivedPopulation(self._path, self._encoding, mode='w+').close()
+        other_encoding = kayak.GeneticEncoding('test_enc', '0.2.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            kayak.ArchivedPopulation(self._path, other_encoding, mode='r+')
+        with self.assertRaises(ValueError):
+            kayak.ArchivedPopulation(self._path, mode='r+')
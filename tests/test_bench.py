@@ -0,0 +1,64 @@
+import io
+import json
+import unittest
+import contextlib
+import kayak.bench as bench
+
+
+class BenchTest(unittest.TestCase):
+    def test_run_benchmarks_sweep(self):
+        # Arrange
+        benchmarks = ['sample_random_batch', 'fits_batch', 'cache_lookup']
+
+        # Act
+        results = bench.run_benchmarks(benchmarks, widths=[2, 4], depths=[1, 2], populations=[10], repeat=1)
+
+        # Assert
+        self.assertEqual(len(results), len(benchmarks) * 4)
+        for result in results:
+            self.assertIsNone(result['error'])
+            self.assertGreater(result['seconds'], 0)
+
+    def test_main_writes_json(self):
+        # Arrange
+        output = io.StringIO()
+
+        # Act
+        with contextlib.redirect_stdout(output):
+            bench.main(['--benchmarks', 'fits', 'map', '--widths', '3', '--depths', '1', '--populations', '5', '--repeat', '1'])
+        report = json.loads(output.getvalue())
+
+        # Assert
+        self.assertIn('environment', report)
+        self.assertListEqual([result['benchmark'] for result in report['results']], ['fits', 'map'])
+
+    def test_main_fails_on_failing_benchmark(self):
+        # Arrange
+        def failing(case):
+            raise RuntimeError('broken')
+        bench._BENCHMARKS['failing'] = failing
+        output = io.StringIO()
+        errors = io.StringIO()
+
+        # Act
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+                exit_code = bench.main(['--benchmarks', 'failing', '--widths', '3', '--depths', '1', '--populations', '5', '--repeat', '1'])
+        finally:
+            del bench._BENCHMARKS['failing']
+
+        # Assert
+        self.assertEqual(exit_code, 1)
+        self.assertIn('broken', errors.getvalue())
+        self.assertIn('broken', json.loads(output.getvalue())['results'][0]['error'])
+
+    def test_permutation_decode_beyond_int64_ranks(self):
+        # Act
+        results = bench.run_benchmarks(['permutation_decode'], widths=[64], depths=[1], populations=[10], repeat=1)
+
+        # Assert
+        self.assertIsNone(results[0]['error'])
+
+    def test_unknown_benchmark_fail(self):
+        with self.assertRaises(ValueError):
+            bench.run_benchmarks(['unknown'])
@@ -0,0 +1,267 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+import kayak
+import kayak.feature_types as ft
+import kayak.feature_types.graph as fg
+import networkx as nx
+from kayak.feature_types.permutation import FeaturePermutation
+from kayak.cache import FitnessCache, SQLiteFitnessStore, code_key, code_keys
+
+
+class CountingFitnessMap(kayak.CachedFitnessMap):
+    calculations = 0
+
+    def calculate_fitness(self, gene_code):
+        self.calculations += 1
+        return float(np.asarray(gene_code).sum())
+
+
+class FitnessCacheTest(unittest.TestCase):
+    def test_code_key_content_based(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.natint, 'b': ft.unitfloat})
+        other_version = kayak.GeneticEncoding('test', '0.2.0', {'a': ft.natint, 'b': ft.unitfloat})
+
+        # Act
+        key1 = code_key(kayak.GeneCode([3, 0.5], space))
+        key2 = code_key(kayak.GeneCode(np.array([3.0, 0.5]), space))
+        key3 = code_key(kayak.GeneCode([4, 0.5], space))
+        key4 = code_key(kayak.GeneCode([3, 0.5], other_version))
+
+        # Assert
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, key3)
+        self.assertNotEqual(key1, key4)
+
+    def test_code_key_matches_code_keys_for_label_and_mixed_codes(self):
+        for description in [{'p': FeaturePermutation(['A', 'B', 'C'])}, {'a': ft.natint, 'p': FeaturePermutation(['A', 'B', 'C'])}]:
+            # Arrange
+            space = kayak.GeneticEncoding('test', '0.1.0', description)
+            pop = kayak.Population(space)
+            pop += 3
+
+            # Act
+            keys = code_keys(space, pop.genomes)
+            list_keys = [code_key(kayak.GeneCode(list(row), space)) for row in pop.genomes]
+            view_keys = [code_key(gene_code) for gene_code in pop]
+
+            # Assert
+            self.assertListEqual(list_keys, keys)
+            self.assertListEqual(view_keys, keys)
+
+    def test_cached_fitness_map_dedupes_codes(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.natint, 'b': ft.unitfloat})
+        fitness_map = CountingFitnessMap()
+        other_map = CountingFitnessMap()
+
+        # Act
+        fitness_map.obtain_fitness(kayak.GeneCode([3, 0.5], space))
+        fitness_map.obtain_fitness(kayak.GeneCode([3, 0.5], space))
+        other_map.obtain_fitness(kayak.GeneCode([3, 0.5], space))
+
+        # Assert
+        self.assertEqual(fitness_map.calculations, 1)
+        self.assertEqual(fitness_map.cache.hits, 1)
+        self.assertEqual(fitness_map.cache.misses, 1)
+        self.assertEqual(other_map.calculations, 1)
+
+    def test_process_workers_receive_no_cache(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.IntegerType(1, 1000), 'b': ft.unitfloat})
+        pop = kayak.Population(space)
+        pop += 10
+        fitness_map = CountingFitnessMap()
+        fitness_map.evaluate_population(pop, executor='thread', workers=2)
+
+        # Act
+        copy = pickle.loads(pickle.dumps(fitness_map))
+        result = fitness_map.evaluate_population(pop, executor='process', workers=2)
+
+        # Assert
+        self.assertEqual(len(copy.cache), 0)
+        self.assertEqual(len(fitness_map.cache), len(np.unique(pop.genomes, axis=0)))
+        self.assertEqual(len(result.errors), 0)
+        self.assertTrue(np.allclose(result.fitness, pop.genomes.sum(axis=1)))
+
+    def test_isomorphic_graphs_share_evaluation(self):
+        # Arrange
+        graphs = {}
+        for canonical in [True, False]:
+            graphs[canonical] = fg.ErdosRenyiGraphType(5, 0.5, encoding=fg.graph_encoding_packed, canonical=canonical)
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.natint, 'g': graphs[True]})
+        path = nx.path_graph(5)
+        relabelled_path = nx.relabel_nodes(path, {0: 3, 1: 0, 2: 4, 3: 1, 4: 2})
+        star = nx.star_graph(4)
+        population = kayak.Population(space)
+        for graph in [path, relabelled_path, star, path]:
+            population.append(np.concatenate([[3], graphs[True].encode(graph)]))
+        fitness_map = CountingFitnessMap()
+
+        # Act
+        keys = code_keys(space, population.genomes)
+        evaluation = fitness_map.evaluate_population(population, workers=2)
+
+        # Assert
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+        self.assertEqual(keys[0], code_key(population[1]))
+        self.assertNotEqual(graphs[False].encode(path).tolist(), graphs[False].encode(relabelled_path).tolist())
+        self.assertEqual(fitness_map.calculations, 2)
+        self.assertEqual(evaluation.fitness[0], evaluation.fitness[1])
+        self.assertEqual(evaluation.fitness[0], evaluation.fitness[3])
+
+    def test_lru_eviction(self):
+        # Arrange
+        cache = FitnessCache(max_entries=2)
+
+        # Act
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        # Assert
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_lfu_eviction(self):
+        # Arrange
+        cache = FitnessCache(max_entries=2, eviction='lfu')
+
+        # Act
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        cache.put('c', 3)
+        cache.get('c')
+        cache.get('c')
+        cache.get('c')
+        cache.put('d', 4)
+
+        # Assert
+        self.assertSetEqual({key for key in ['a', 'b', 'c', 'd'] if key in cache}, {'c', 'd'})
+        self.assertEqual(cache.evictions, 2)
+
+    def test_max_bytes(self):
+        # Arrange
+        cache = FitnessCache(max_bytes=2000)
+
+        # Act
+        for idx in range(1000):
+            cache.put(('test', '0.1.0', '%032x' % idx), float(idx))
+
+        # Assert
+        self.assertLessEqual(cache.nbytes, 2000)
+        self.assertGreater(len(cache), 0)
+        self.assertEqual(cache.evictions, 1000 - len(cache))
+
+
+class SQLiteFitnessStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'fitness.sqlite')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_batched_writes_persist(self):
+        # Arrange
+        store = SQLiteFitnessStore(self._path, batch_size=10)
+        keys = [('test', '0.1.0', '%032x' % idx) for idx in range(25)]
+
+        # Act
+        for idx, key in enumerate(keys):
+            store.put(key, float(idx))
+        pending_visible = store.get(keys[-1])
+        store.close()
+        reopened = SQLiteFitnessStore(self._path)
+
+        # Assert
+        self.assertEqual(pending_visible, 24.0)
+        self.assertEqual(len(reopened), 25)
+        self.assertEqual(reopened.get(keys[3]), 3.0)
+        self.assertIsNone(reopened.get(('test', '0.2.0', keys[3][2])))
+        self.assertEqual(len(list(reopened.load(encoding='test', version='0.1.0'))), 25)
+        reopened.close()
+
+    def test_store_shared_across_runs_and_processes(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.IntegerType(1, 1000), 'b': ft.unitfloat})
+        pop = kayak.Population(space)
+        pop += 20
+
+        # Act
+        with SQLiteFitnessStore(self._path) as store:
+            first_run = CountingFitnessMap(store=store)
+            first_run.evaluate_population(pop, executor='process', workers=2, chunksize=4)
+        with SQLiteFitnessStore(self._path) as store:
+            second_run = CountingFitnessMap(store=store)
+            result = second_run.evaluate_population(pop)
+
+        # Assert
+        self.assertEqual(len(first_run.cache), len(np.unique(pop.genomes, axis=0)))
+        self.assertEqual(second_run.calculations, 0)
+        self.assertEqual(len(second_run.cache), len(np.unique(pop.genomes, axis=0)))
+        self.assertTrue(np.allclose(result.fitness, pop.genomes.sum(axis=1)))
+
+    def test_warm_bounded_to_encoding_and_cache_size(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.natint})
+        with SQLiteFitnessStore(self._path) as store:
+            for idx in range(20):
+                store.put(('test', '0.1.0', '%032x' % idx), float(idx))
+                store.put(('test', '0.2.0', '%032x' % idx), float(idx))
+                store.put(('other', '0.1.0', '%032x' % idx), float(idx))
+
+            # Act
+            unbounded = CountingFitnessMap(store=store, encoding=space)
+            bounded = CountingFitnessMap(store=store, encoding=space, max_entries=5)
+            everything = CountingFitnessMap(store=store)
+
+        # Assert
+        self.assertEqual(len(unbounded.cache), 20)
+        self.assertTrue(all(key[:2] == ('test', '0.1.0') for key in unbounded.cache._entries))
+        self.assertEqual(len(bounded.cache), 5)
+        self.assertEqual(bounded.cache.evictions, 0)
+        self.assertEqual(len(everything.cache), 60)
+
+    def test_nan_fitness_and_dropped_store_persist(self):
+        # Arrange
+        store = SQLiteFitnessStore(self._path, batch_size=10)
+        keys = [('test', '0.1.0', '%032x' % idx) for idx in range(2)]
+
+        # Act
+        store.put(keys[0], 1.0)
+        store.put(keys[1], float('nan'))
+        del store
+        reopened = SQLiteFitnessStore(self._path)
+
+        # Assert
+        self.assertEqual(reopened.get(keys[0]), 1.0)
+        self.assertTrue(np.isnan(reopened.get(keys[1], default='DEFAULT')))
+        self.assertTrue(np.isnan(dict(reopened.load())[keys[1]]))
+        reopened.close()
+
+    def test_cached_fitness_map_flushes_store(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '0.1.0', {'a': ft.IntegerType(1, 1000), 'b': ft.unitfloat})
+        pop = kayak.Population(space)
+        pop += 5
+        store = SQLiteFitnessStore(self._path)
+
+        # Act
+        CountingFitnessMap(store=store).evaluate_population(pop)
+        reader = SQLiteFitnessStore(self._path)
+
+        # Assert
+        self.assertEqual(len(reader), len(np.unique(pop.genomes, axis=0)))
+        reader.close()
+        store.close()
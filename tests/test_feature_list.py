@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 import kayak.feature_types as ft
 
 
@@ -42,4 +43,85 @@ class FeatureListTest(unittest.TestCase):
         space = ft.FeatureList(space_description)
 
         # Assert
-        self.assertEqual(len(space), 2)
\ No newline at end of file
+        self.assertEqual(len(space), 2)
+
+    def test_fits_batch_feature_list(self):
+        # Arrange
+        feature_list = ft.FeatureList([ft.natint, {'a': ft.unitfloat, 'b': ft.unitfloat}])
+        matrix = [
+            [0, 5, 0.1],
+            [1, 0.2, 0.3],
+            [1, 0.2, 1.3],
+            [2, 0.2, 0.3]
+        ]
+
+        # Act
+        result = feature_list.fits_batch(matrix)
+
+        # Assert
+        self.assertListEqual(list(result), [False, True, False, False])
+
+    def test_fixed_encodings_sample_and_fit(self):
+        for encoding, size in [(ft.encoding_max_option, 4), (ft.encoding_one_hot, 11)]:
+            # Arrange
+            feature_list = ft.FeatureList([ft.natint, {'a': ft.unitfloat, 'b': ft.unitfloat}, ft.Matrix(1, 3), 7], encoding=encoding)
+
+            # Act
+            matrix = feature_list.sample_random_batch(200, rng=0)
+            code = feature_list.sample_random(rng=1)
+
+            # Assert
+            self.assertFalse(feature_list.dynamically_sized)
+            self.assertEqual(len(feature_list), size)
+            self.assertEqual(matrix.shape, (200, size))
+            self.assertTrue(feature_list.fits_batch(matrix).all())
+            self.assertTrue(feature_list.fits(code))
+            self.assertSetEqual(set(feature_list.decode_batch(matrix)[0]), {0, 1, 2, 3})
+
+    def test_max_option_encoding_decode(self):
+        # Arrange
+        feature_list = ft.FeatureList([ft.natint, {'a': ft.unitfloat, 'b': ft.unitfloat}, 'fixed'], encoding=ft.encoding_max_option)
+        matrix = np.array([
+            [0, 5, 0],
+            [1, 0.2, 0.3],
+            [2, 'fixed', 0],
+            [1, 0.2, 1.3],
+            [0.5, 5, 0],
+            [3, 5, 0]
+        ], dtype=object)
+
+        # Act
+        result = feature_list.fits_batch(matrix)
+        choice, subcode = feature_list.decode(matrix[1])
+
+        # Assert
+        self.assertListEqual(list(result), [True, True, True, False, False, False])
+        self.assertEqual(choice, 1)
+        self.assertListEqual(list(subcode), [0.2, 0.3])
+        self.assertEqual(feature_list.decode(matrix[2]), (2, 'fixed'))
+
+    def test_one_hot_encoding_decode(self):
+        # Arrange
+        feature_list = ft.FeatureList([ft.natint, {'a': ft.unitfloat, 'b': ft.unitfloat}], encoding=ft.encoding_one_hot)
+        matrix = np.array([
+            [1, 0, 5, 0.2, 0.3],
+            [0, 1, 5, 0.2, 0.3],
+            [0, 1, 0, 0.2, 0.3],
+            [1, 1, 5, 0.2, 0.3],
+            [0, 0, 5, 0.2, 0.3],
+            [0, 1, 5, 0.2, 1.3]
+        ])
+
+        # Act
+        result = feature_list.fits_batch(matrix)
+        choices, subcodes = feature_list.decode_batch(matrix[:3])
+
+        # Assert
+        self.assertListEqual(list(result), [True, True, True, False, False, False])
+        self.assertListEqual(list(choices), [0, 1, 1])
+        self.assertListEqual(subcodes.tolist(), [[5, 0], [0.2, 0.3], [0.2, 0.3]])
+
+    def test_fixed_encoding_dynamic_option_fail(self):
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            ft.FeatureList([ft.natint, [ft.natint, ft.Matrix(2, 2)]], encoding=ft.encoding_one_hot)
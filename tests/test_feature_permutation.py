@@ -1,5 +1,17 @@
+import math
+import itertools
 import unittest
+import numpy as np
 from kayak.feature_types.permutation import FeaturePermutation
+from kayak.feature_types.permutation import ImplicitListPermutationEncoder
+from kayak.feature_types.permutation import RangePermutationEncoder
+from kayak.feature_types.permutation import RandomKeyPermutationEncoder
+from kayak.feature_types.permutation import PERMUTATION_CROSSOVERS
+from kayak.feature_types.permutation import PERMUTATION_MUTATIONS
+from kayak.feature_types.permutation import crossover_cx
+from kayak.feature_types.permutation import crossover_ox
+from kayak.feature_types.permutation import crossover_pmx
+from kayak.feature_types.permutation import _segments
 
 class FeaturePermutationTest(unittest.TestCase):
     def test_named_construction_success(self):
@@ -25,3 +37,192 @@ class FeaturePermutationTest(unittest.TestCase):
         print('Code=%s' % code)
         print('decoded := %s' % [feature.decode(code)])
         self.assertEqual(len(feature.decode(code)), length)
+
+    def test_sample_batch(self):
+        # Arrange
+        feature = FeaturePermutation(['A', 'B', 'C', 'D'])
+
+        # Act
+        batch = feature.sample_random_batch(20)
+
+        # Assert
+        self.assertEqual(batch.shape, (20, 4))
+        for row in batch:
+            self.assertListEqual(sorted(row), ['A', 'B', 'C', 'D'])
+
+    def test_rank_decode_matches_lexicographic_order(self):
+        # Arrange
+        encoder = ImplicitListPermutationEncoder(['A', 'B', 'C', 'D', 'E'])
+        expected = list(itertools.permutations(['A', 'B', 'C', 'D', 'E']))
+
+        # Act
+        decoded = [encoder.decode(rank) for rank in range(len(expected))]
+        encoded = [encoder.encode(permutation) for permutation in expected]
+        decoded_batch = encoder.decode_batch(np.arange(len(expected)))
+
+        # Assert
+        self.assertListEqual(decoded, expected)
+        self.assertListEqual(encoded, list(range(len(expected))))
+        self.assertTrue((decoded_batch == np.array(expected)).all())
+
+    def test_rank_round_trip_large(self):
+        # Arrange
+        length = 200
+        encoder = RangePermutationEncoder(1, length)
+        ranks = [0, 1, math.factorial(length) // 3, math.factorial(length) - 1]
+
+        for rank in ranks:
+            # Act
+            permutation = encoder.decode(rank)
+
+            # Assert
+            self.assertListEqual(sorted(permutation), list(range(1, length + 1)))
+            self.assertEqual(encoder.encode(permutation), rank)
+
+        decoded_batch = encoder.decode_batch(np.array(ranks, dtype=object))
+        self.assertEqual(decoded_batch.shape, (len(ranks), length))
+        self.assertListEqual(list(decoded_batch[2]), list(encoder.decode(ranks[2])))
+
+    def test_rank_sample_batch_large(self):
+        # Arrange
+        length = 25
+        encoder = ImplicitListPermutationEncoder(list(range(length)))
+
+        # Act
+        batch = encoder.sample_random_batch(10, rng=1)
+        decoded_batch = encoder.decode_batch(batch)
+
+        # Assert
+        self.assertEqual(batch.shape, (10, 1))
+        self.assertTrue(all(0 <= rank < math.factorial(length) for rank in batch.ravel()))
+        for row in decoded_batch:
+            self.assertListEqual(sorted(row), list(range(length)))
+
+    def test_rank_decode_out_of_range_fail(self):
+        # Arrange
+        encoder = RangePermutationEncoder(1, 4)
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            encoder.decode(24)
+
+    def test_random_key_large_permutation(self):
+        # Arrange
+        length = 500
+        feature = FeaturePermutation('1:%s' % length, encoder=RandomKeyPermutationEncoder)
+
+        # Act
+        code = feature.sample_random()
+        permutation = feature.decode(code)
+
+        # Assert
+        self.assertEqual(len(code), length)
+        self.assertTrue(feature.fits(code))
+        self.assertListEqual(sorted(permutation), list(range(1, length + 1)))
+        self.assertEqual(feature.decode(feature.encode(permutation)), permutation)
+
+    def test_random_key_operators_keep_permutations_valid(self):
+        # Arrange
+        length = 50
+        feature = FeaturePermutation(list(range(length)), encoder=RandomKeyPermutationEncoder)
+        parents1 = feature.sample_random_batch(200, rng=1)
+        parents2 = feature.sample_random_batch(200, rng=2)
+
+        # Act
+        offspring = feature.cross_over(parents1, parents2, rng=3)
+        mutated = RandomKeyPermutationEncoder(list(range(length))).mutate(offspring, rng=4, rate=0.2)
+        decoded = feature.decode_batch(mutated)
+
+        # Assert
+        self.assertEqual(decoded.shape, (200, length))
+        self.assertTrue((np.sort(decoded, axis=1) == np.arange(length)).all())
+        self.assertFalse(np.array_equal(mutated, offspring))
+
+    def test_batch_operators_keep_permutations_valid(self):
+        # Arrange
+        rng = np.random.default_rng(0)
+        parents1 = np.argsort(rng.random((300, 17)), axis=1)
+        parents2 = np.argsort(rng.random((300, 17)), axis=1)
+
+        for method in list(PERMUTATION_CROSSOVERS) + list(PERMUTATION_MUTATIONS):
+            # Act
+            if method in PERMUTATION_CROSSOVERS:
+                offspring = PERMUTATION_CROSSOVERS[method](parents1, parents2, rng=1)
+            else:
+                offspring = PERMUTATION_MUTATIONS[method](parents1, rng=1)
+
+            # Assert
+            self.assertEqual(offspring.shape, parents1.shape, method)
+            self.assertTrue((np.sort(offspring, axis=1) == np.arange(17)).all(), method)
+
+    def test_batch_crossover_inherits_from_parents(self):
+        # Arrange
+        rng = np.random.default_rng(1)
+        parents1 = np.argsort(rng.random((300, 12)), axis=1)
+        parents2 = np.argsort(rng.random((300, 12)), axis=1)
+
+        # Act
+        cycle = crossover_cx(parents1, parents2)
+        ordered = crossover_ox(parents1, parents2, rng=2)
+        mapped = crossover_pmx(parents1, parents2, rng=2)
+
+        # Assert
+        self.assertTrue(((cycle == parents1) | (cycle == parents2)).all())
+        _, _, segment = _segments(np.random.default_rng(2), 300, 12)
+        self.assertTrue((ordered[segment] == parents1[segment]).all())
+        self.assertTrue((mapped[segment] == parents1[segment]).all())
+        self.assertTrue((mapped[~segment] == parents2[~segment]).mean() > 0.5)
+
+    def test_feature_batch_operators_for_all_encoders(self):
+        # Arrange
+        features = [
+            FeaturePermutation(['A', 'B', 'C', 'D', 'E', 'F']),
+            FeaturePermutation(['A', 'B', 'C', 'D', 'E', 'F'], encoder=ImplicitListPermutationEncoder),
+            FeaturePermutation('1:6'),
+            FeaturePermutation('1:6', encoder=RandomKeyPermutationEncoder)
+        ]
+
+        for feature in features:
+            parents1 = feature.sample_random_batch(50, rng=1)
+            parents2 = feature.sample_random_batch(50, rng=2)
+
+            # Act
+            offspring = feature.cross_over_batch(parents1, parents2, method='pmx', rng=3)
+            mutated = feature.mutate_batch(offspring, method='inversion', rng=4)
+            decoded = feature.decode_batch(mutated)
+
+            # Assert
+            self.assertEqual(offspring.shape, parents1.shape)
+            self.assertEqual(decoded.shape, (50, 6))
+            for row in decoded:
+                self.assertEqual(len(set(row)), 6)
+
+    def test_mutate_random_for_all_encoders(self):
+        # Arrange
+        features = [
+            FeaturePermutation(['A', 'B', 'C', 'D', 'E', 'F']),
+            FeaturePermutation(['A', 'B', 'C', 'D', 'E', 'F'], encoder=ImplicitListPermutationEncoder),
+            FeaturePermutation('1:6'),
+            FeaturePermutation('1:6', encoder=RandomKeyPermutationEncoder)
+        ]
+
+        for feature in features:
+            code = feature.sample_random(rng=1)
+
+            # Act
+            mutation = feature.mutate_random(code, rng=2)
+
+            # Assert
+            self.assertTrue(feature.fits(mutation))
+            self.assertEqual(len(set(feature.decode(mutation))), 6)
+
+    def test_feature_batch_operator_unknown_fail(self):
+        # Arrange
+        feature = FeaturePermutation(['A', 'B', 'C'])
+        codes = feature.sample_random_batch(5)
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            feature.cross_over_batch(codes, codes, method='unknown')
+        with self.assertRaises(ValueError):
+            feature.mutate_batch(codes, method='unknown')
@@ -1,5 +1,8 @@
+import pickle
 import unittest
+import numpy as np
 import kayak.feature_types as ft
+from kayak.feature_types.native import _prefetch
 
 
 class FeatureSetTest(unittest.TestCase):
@@ -179,3 +182,193 @@ class FeatureSetTest(unittest.TestCase):
 
             # Assert
             self.assertTrue(fits, 'Code %s should fit in %s' % (code, feature_set_description))
+
+    def test_fits_batch_matches_fits(self):
+        # Arrange
+        feature_set = ft.FeatureSet({
+            'a': ft.IntegerType(1, 10),
+            'b': ft.FeatureSet({
+                'c': ft.FloatType(-10.6, 5.3),
+                'd': ft.IntegerType(9, 18)
+            }),
+            'e': ft.FloatType(10, 16.8)
+        })
+        matrix = [
+            [8, 3.5, 9, 10],
+            [8.1, 3.5, 9, 10],
+            [8, 6.5, 9, 10],
+            [8, 3.5, 19, 10],
+            [10, -10.6, 18, 16.8]
+        ]
+
+        # Act
+        result = feature_set.fits_batch(matrix)
+
+        # Assert
+        self.assertListEqual(list(result), [True, False, False, False, True])
+        self.assertListEqual(list(result), [feature_set.fits(code) for code in matrix])
+
+    def test_fits_batch_sampled(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.natint, 'b': ft.unitfloat, 'c': ft.Matrix(3, 2)})
+        matrix = feature_set.sample_random_batch(1000)
+
+        # Act
+        result = feature_set.fits_batch(matrix)
+        result_narrow = feature_set.fits_batch(matrix[:, :-1])
+
+        # Assert
+        self.assertTrue(result.all())
+        self.assertFalse(result_narrow.any())
+
+    def test_compiled_fits_matches_fits(self):
+        # Arrange
+        feature_set = ft.FeatureSet({
+            'a': ft.IntegerType(1, 10),
+            'b': ft.FeatureSet({
+                'c': ft.FloatType(-10.6, 5.3),
+                'd': ft.IntegerType(9, 18)
+            }),
+            'e': ft.FloatType(10, 16.8),
+            'f': ft.Matrix(2, 2)
+        })
+        matrix = [
+            [8, 3.5, 9, 10, 0.1, 0.2, 0.3, 0.4],
+            [8.1, 3.5, 9, 10, 0.1, 0.2, 0.3, 0.4],
+            [8, 6.5, 9, 10, 0.1, 0.2, 0.3, 0.4],
+            [8, 3.5, 19, 10, 0.1, 0.2, 0.3, 0.4],
+            [10, -10.6, 18, 16.8, 0.1, 0.2, 0.3, 0.4],
+            [10, -10.6, 18, 16.8, 0.1, 0.2, 0.3],
+            ['x', -10.6, 18, 16.8, 0.1, 0.2, 0.3, 0.4]
+        ]
+        expected = [feature_set.fits(code) for code in matrix[:-1]]
+
+        # Act
+        compiled = feature_set.compile()
+        result = [compiled.fits(code) for code in matrix]
+
+        # Assert
+        self.assertListEqual(result, expected + [False])
+        self.assertListEqual([feature_set.fits(code) for code in matrix], result)
+
+    def test_compiled_sample_random_and_map(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.natint, 'b': ft.FeatureSet({'c': ft.unitfloat, 'd': 'fixed'}), 'e': ft.Matrix(2, 3)})
+
+        # Act
+        compiled = feature_set.compile()
+        code = compiled.sample_random()
+        mapped = compiled.map(code)
+
+        # Assert
+        self.assertEqual(len(code), len(feature_set))
+        self.assertTrue(feature_set.fits_batch(np.asarray(code, dtype=object)[np.newaxis]).all())
+        self.assertListEqual(sorted(mapped.keys()), ['a', 'c', 'd', 'e'])
+        self.assertEqual(mapped['d'], 'fixed')
+        self.assertEqual(mapped['e'].shape, (2, 3))
+
+    def test_compiled_fits_gene_code_with_matrix(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.natint, 'm': ft.Matrix(2, 2)})
+        feature_set.compile()
+
+        # Act
+        code = feature_set.sample_random(rng=0)
+
+        # Assert
+        self.assertTrue(feature_set.fits(code))
+        self.assertTrue(feature_set.fits(np.asarray(code)))
+
+    def test_compile_rebuilt_after_adding_features(self):
+        # Arrange
+        nested = ft.FeatureSet({'b': ft.natint})
+        feature_set = ft.FeatureSet({'a': ft.unitfloat, 'n': nested})
+        compiled = feature_set.compile()
+        unchanged = feature_set.compile()
+
+        # Act
+        nested.add_feature('c', ft.unitfloat)
+        recompiled = feature_set.compile()
+
+        # Assert
+        self.assertIs(compiled, unchanged)
+        self.assertIsNot(compiled, recompiled)
+        self.assertEqual(len(recompiled), 3)
+        self.assertFalse(feature_set.fits([0.5, 3]))
+        self.assertTrue(feature_set.fits([0.5, 3, 0.5]))
+
+    def test_unrelated_sets_keep_layout_and_compiled(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.unitfloat, 'n': ft.FeatureSet({'b': ft.natint})})
+        other = ft.FeatureSet({'x': ft.natint})
+        layout = feature_set.layout()
+        compiled = feature_set.compile()
+
+        # Act
+        other.add_feature('y', ft.unitfloat)
+
+        # Assert
+        self.assertIs(feature_set.layout(), layout)
+        self.assertIs(feature_set.compile(), compiled)
+        self.assertEqual(other.layout().size, 2)
+
+    def test_nested_change_reaches_shared_and_unpickled_parents(self):
+        # Arrange
+        nested = ft.FeatureSet({'b': ft.natint})
+        first = ft.FeatureSet({'a': ft.unitfloat, 'n': nested})
+        second = ft.FeatureSet({'m': nested})
+        copy = pickle.loads(pickle.dumps(first))
+        sizes = (first.layout().size, second.layout().size, copy.layout().size)
+
+        # Act
+        nested.add_feature('c', ft.unitfloat)
+        copy['n'].add_feature('c', ft.unitfloat)
+
+        # Assert
+        self.assertEqual(sizes, (2, 1, 2))
+        self.assertEqual(first.layout().size, 3)
+        self.assertEqual(second.layout().size, 2)
+        self.assertEqual(copy.layout().size, 3)
+
+    def test_compile_dynamically_sized_fail(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': [ft.natint, ft.Matrix(2, 2)]})
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            feature_set.compile()
+
+    def test_generate_random_chunks(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.natint, 'b': ft.unitfloat})
+
+        for prefetch in [0, 2]:
+            # Act
+            chunks = list(feature_set.generate_random_chunks(2500, chunk_size=1000, rng=0, prefetch=prefetch))
+
+            # Assert
+            self.assertListEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+            self.assertTrue(all(feature_set.fits_batch(chunk).all() for chunk in chunks))
+
+    def test_generate_random_chunks_prefetch_error(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.natint, 'b': [ft.natint, ft.Matrix(2, 2)]})
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            list(feature_set.generate_random_chunks(10, chunk_size=5, prefetch=1))
+
+    def test_prefetch_forwards_base_exceptions(self):
+        # Arrange
+        def exiting():
+            yield 1
+            raise SystemExit(3)
+
+        # Act
+        consumed = []
+        with self.assertRaises(SystemExit):
+            for item in _prefetch(exiting(), 1):
+                consumed.append(item)
+
+        # Assert
+        self.assertListEqual(consumed, [1])
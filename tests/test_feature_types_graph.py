@@ -1,4 +1,6 @@
 import unittest
+import itertools
+import numpy as np
 import networkx as nx
 import kayak.feature_types as ft
 import kayak.feature_types.graph as fg
@@ -57,3 +59,260 @@ class FeatureTypesGraphTest(unittest.TestCase):
 
         # Assert
         self.assertTrue(fits)
+
+    def test_packed_encoding_round_trip(self):
+        # Arrange
+        graph_size = 13
+        graph_feature = fg.ErdosRenyiGraphType(graph_size, 0.3, encoding=fg.graph_encoding_packed)
+        generated_graph = nx.erdos_renyi_graph(graph_size, 0.3, seed=4)
+
+        # Act
+        code = graph_feature.encode(generated_graph)
+        built_graph = graph_feature.build(code)
+
+        # Assert
+        self.assertEqual(len(code), len(graph_feature))
+        self.assertEqual(len(graph_feature), 10)  # 78 edge bits in 10 bytes
+        self.assertTrue(graph_feature.fits(code))
+        self.assertTrue(nx.utils.graphs_equal(built_graph, generated_graph))
+
+    def test_packed_encoding_fits_fail(self):
+        # Arrange
+        graph_feature = fg.ErdosRenyiGraphType(13, 0.3, encoding=fg.graph_encoding_packed)
+        code = graph_feature.sample_random()
+        padding_set = code.copy()
+        padding_set[-1] |= 1
+
+        # Act & Assert
+        self.assertFalse(graph_feature.fits(code[:-1]))
+        self.assertFalse(graph_feature.fits(padding_set))
+        self.assertFalse(graph_feature.fits(code + 0.5))
+
+    def test_packed_graph_in_feature_set(self):
+        # Arrange
+        feature_set = ft.FeatureSet({
+            'a': ft.natint,
+            'b': fg.ErdosRenyiGraphType(20, 0.2, encoding=fg.graph_encoding_packed),
+            'c': ft.unitfloat
+        })
+
+        # Act
+        batch = feature_set.sample_random_batch(8, rng=1)
+
+        # Assert
+        self.assertEqual(batch.shape, (8, 1 + 24 + 1))
+        self.assertTrue(feature_set.fits_batch(batch).all())
+        self.assertTrue(feature_set.fits(batch[0]))
+
+    def test_dense_fits_fail(self):
+        # Arrange
+        graph_size = 10
+        graph_feature = fg.ErdosRenyiGraphType(graph_size, 0.3)
+        adjacency = nx.to_numpy_array(nx.erdos_renyi_graph(graph_size, 0.5, seed=1))
+        asymmetric = adjacency.copy()
+        asymmetric[0, 1], asymmetric[1, 0] = 1, 0
+        self_loop = adjacency.copy()
+        self_loop[3, 3] = 1
+        weighted = adjacency * 2
+
+        # Act & Assert
+        self.assertTrue(graph_feature.fits(adjacency.flatten()))
+        self.assertFalse(graph_feature.fits(asymmetric.flatten()))
+        self.assertFalse(graph_feature.fits(self_loop.flatten()))
+        self.assertFalse(graph_feature.fits(weighted.flatten()))
+        self.assertFalse(graph_feature.fits(adjacency[:9, :9].flatten()))
+        self.assertListEqual(list(graph_feature.fits_batch(np.stack([adjacency, asymmetric, self_loop]).reshape(3, -1))), [True, False, False])
+
+    def test_sample_batch_edge_density(self):
+        # Arrange
+        graph_size = 60
+        pairs = graph_size * (graph_size - 1) // 2
+
+        for connection_probability in [0.02, 0.5]:
+            for encoding in [fg.graph_encoding_dense, fg.graph_encoding_packed]:
+                graph_feature = fg.ErdosRenyiGraphType(graph_size, connection_probability, encoding=encoding)
+
+                # Act
+                batch = graph_feature.sample_random_batch(200, rng=np.random.default_rng(7))
+                edges = [graph_feature.to_adjacency(code).sum() / 2 for code in batch]
+
+                # Assert
+                self.assertEqual(batch.shape, (200, len(graph_feature)))
+                self.assertTrue(graph_feature.fits_batch(batch).all())
+                self.assertAlmostEqual(np.mean(edges) / pairs, connection_probability, delta=0.01)
+
+    def test_sample_batch_into_buffer(self):
+        # Arrange
+        feature_set = ft.FeatureSet({
+            'a': ft.natint,
+            'b': fg.ErdosRenyiGraphType(8, 0.05, encoding=fg.graph_encoding_packed),
+            'c': fg.ErdosRenyiGraphType(5, 0.7)
+        })
+        buffer = np.full((10, 1 + 4 + 25), -1.0)
+
+        # Act
+        result = feature_set.sample_random_batch(10, rng=3, out=buffer)
+        expected = feature_set.sample_random_batch(10, rng=3)
+
+        # Assert
+        self.assertIs(result, buffer)
+        self.assertTrue(np.array_equal(buffer, expected))
+        self.assertTrue(feature_set.fits_batch(buffer).all())
+
+    def test_mutate_batch_in_place(self):
+        for encoding, rate in itertools.product(fg.graph_encodings, [0.05, 0.5]):
+            # Arrange
+            graph_feature = fg.ErdosRenyiGraphType(40, 0.1, encoding=encoding)
+            codes = graph_feature.sample_random_batch(50, rng=1)
+            original = codes.copy()
+
+            # Act
+            mutated = graph_feature.mutate_batch(codes, rate=rate, rng=2, in_place=True)
+
+            # Assert
+            flips = (graph_feature.edge_flags(mutated) != graph_feature.edge_flags(original)).sum(axis=1)
+            self.assertIs(mutated, codes)
+            self.assertTrue(graph_feature.fits_batch(mutated).all())
+            self.assertAlmostEqual(flips.mean() / graph_feature.pairs, rate, delta=0.01)
+
+    def test_mutate_random_sampled_code(self):
+        for encoding in fg.graph_encodings:
+            # Arrange
+            graph_feature = fg.ErdosRenyiGraphType(10, 0.3, encoding=encoding)
+            code = graph_feature.sample_random(rng=1)
+
+            # Act
+            mutated = graph_feature.mutate_random(code, rng=2)
+
+            # Assert
+            self.assertEqual(mutated.shape, np.shape(code), encoding)
+            self.assertTrue(graph_feature.fits(mutated), encoding)
+        with self.assertRaises(ValueError):
+            graph_feature.mutate_random(np.zeros(3))
+
+    def test_cross_over_batch_methods(self):
+        # Arrange
+        graph_feature = fg.ErdosRenyiGraphType(15, 0.5, encoding=fg.graph_encoding_packed)
+        parents1 = graph_feature.sample_random_batch(40, rng=1)
+        parents2 = graph_feature.sample_random_batch(40, rng=2)
+        flags1 = graph_feature.edge_flags(parents1)
+        flags2 = graph_feature.edge_flags(parents2)
+
+        for method in fg.GRAPH_CROSSOVERS:
+            # Act
+            offspring = graph_feature.cross_over_batch(parents1, parents2, method=method, rng=3)
+
+            # Assert
+            flags = graph_feature.edge_flags(offspring)
+            self.assertTrue(graph_feature.fits_batch(offspring).all(), method)
+            self.assertTrue(((flags == flags1) | (flags == flags2)).all(), method)
+        with self.assertRaises(ValueError):
+            graph_feature.cross_over_batch(parents1, parents2, method='unknown')
+
+    def test_canonical_form_of_isomorphic_graphs(self):
+        for graph_size in [6, 12]:
+            # Arrange
+            graph_feature = fg.ErdosRenyiGraphType(graph_size, 0.3, encoding=fg.graph_encoding_triangle, canonical=True, canonical_hash=True)
+            graph = nx.erdos_renyi_graph(graph_size, 0.3, seed=2)
+            relabelled = nx.relabel_nodes(graph, dict(zip(range(graph_size), np.random.default_rng(3).permutation(graph_size).tolist())))
+            other = nx.complete_graph(graph_size)
+            codes = np.stack([graph_feature.encode(graph), graph_feature.encode(relabelled), graph_feature.encode(other)])
+
+            # Act
+            forms = graph_feature.canonical_form_batch(codes)
+
+            # Assert
+            self.assertTrue(graph_feature.canonicalizes)
+            self.assertTrue(np.array_equal(forms[0], forms[1]))
+            self.assertFalse(np.array_equal(forms[0], forms[2]))
+            self.assertTrue(np.array_equal(forms[0], graph_feature.canonical_form(codes[1])))
+
+    def test_canonical_form_batch_matches_canonical_form(self):
+        for graph_type, graph_size, encoding in itertools.product([fg.ErdosRenyiGraphType, fg.DAGraphType], [1, 4, 7, 9], fg.graph_encodings):
+            # Arrange
+            graph_feature = graph_type(graph_size, 0.4, encoding=encoding, canonical=True)
+            codes = graph_feature.sample_random_batch(20, rng=1)
+
+            # Act
+            forms = graph_feature.canonical_form_batch(codes)
+
+            # Assert
+            for code, form in zip(codes, forms):
+                self.assertTrue(np.array_equal(form, graph_feature.canonical_form(code)), (graph_type, graph_size, encoding))
+
+    def test_canonical_form_of_large_graphs_exact_without_hash(self):
+        # Arrange
+        graph_size = 12
+        graph_feature = fg.ErdosRenyiGraphType(graph_size, 0.3, encoding=fg.graph_encoding_triangle, canonical=True)
+        graph = nx.erdos_renyi_graph(graph_size, 0.3, seed=2)
+        relabelled = nx.relabel_nodes(graph, dict(zip(range(graph_size), np.random.default_rng(3).permutation(graph_size).tolist())))
+        codes = np.stack([graph_feature.encode(graph), graph_feature.encode(relabelled), graph_feature.encode(graph)])
+
+        # Act
+        forms = graph_feature.canonical_form_batch(codes)
+
+        # Assert
+        self.assertFalse(np.array_equal(forms[0], forms[1]))
+        self.assertTrue(np.array_equal(forms[0], forms[2]))
+
+
+class DAGraphTypeTest(unittest.TestCase):
+    def test_sample_batch_is_acyclic(self):
+        for encoding in fg.graph_encodings:
+            # Arrange
+            graph_feature = fg.DAGraphType(12, 0.4, encoding=encoding)
+
+            # Act
+            batch = graph_feature.sample_random_batch(20, rng=1)
+
+            # Assert
+            self.assertEqual(batch.shape, (20, len(graph_feature)))
+            self.assertTrue(graph_feature.fits_batch(batch).all())
+            for code in batch:
+                self.assertTrue(nx.is_directed_acyclic_graph(graph_feature.build(code)))
+
+    def test_template_graph_round_trip(self):
+        # Arrange
+        template = nx.DiGraph([('input', 'hidden'), ('hidden', 'output'), ('input', 'output'), ('input', 'skip')])
+        graph_feature = fg.DAGraphType(template)
+
+        # Act
+        code = graph_feature.encode(template)
+        built_graph = graph_feature.build(code)
+
+        # Assert
+        self.assertEqual(len(code), 6)
+        self.assertTrue(graph_feature.fits(code))
+        self.assertTrue(nx.utils.graphs_equal(built_graph, template))
+
+    def test_backward_edges_fail(self):
+        # Arrange
+        graph_feature = fg.DAGraphType(4, encoding=fg.graph_encoding_dense)
+        backward = np.zeros((4, 4))
+        backward[2, 1] = 1
+
+        # Act & Assert
+        self.assertFalse(graph_feature.fits(backward.ravel()))
+        with self.assertRaises(ValueError):
+            fg.DAGraphType(4).encode(nx.DiGraph([(2, 1)]))
+        with self.assertRaises(ValueError):
+            fg.DAGraphType(nx.DiGraph([(0, 1), (1, 0)]))
+
+    def test_operators_keep_codes_valid(self):
+        for encoding in fg.graph_encodings:
+            # Arrange
+            graph_feature = fg.DAGraphType(9, 0.3, encoding=encoding)
+            parents1 = graph_feature.sample_random_batch(30, rng=1)
+            parents2 = graph_feature.sample_random_batch(30, rng=2)
+
+            # Act
+            offspring = graph_feature.cross_over_batch(parents1, parents2, rng=3)
+            mutated = graph_feature.mutate_batch(offspring, rate=0.2, rng=4)
+
+            # Assert
+            self.assertTrue(graph_feature.fits_batch(offspring).all())
+            self.assertTrue(graph_feature.fits_batch(mutated).all())
+            inherited = (graph_feature.edge_flags(offspring) == graph_feature.edge_flags(parents1)) | \
+                (graph_feature.edge_flags(offspring) == graph_feature.edge_flags(parents2))
+            self.assertTrue(inherited.all())
+            self.assertFalse(np.array_equal(mutated, offspring))
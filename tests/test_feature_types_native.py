@@ -23,6 +23,36 @@ class FeatureTypeTest(unittest.TestCase):
             # Assert
             self.assertEqual(feature_size, len(code))
 
+    def test_sample_batch_shape_and_bounds(self):
+        # Arrange
+        types = [
+            ft.FloatType(-1, 1),
+            ft.IntegerType(-3, 7),
+            ft.Matrix(2, 3, lower_border=0, upper_border=1)
+        ]
+        num_samples = 1000
+
+        for current_type in types:
+            # Act
+            batch = current_type.sample_random_batch(num_samples, rng=0)
+
+            # Assert
+            self.assertEqual(batch.shape, (num_samples, len(current_type)))
+            self.assertTrue(all(current_type.fits(row) for row in batch[:10]))
+
+    def test_sample_batch_reproducible(self):
+        # Arrange
+        feature_set = ft.FeatureSet({'a': ft.natint, 'b': ft.unitfloat, 'c': ft.FeatureSet({'d': ft.natfloat})})
+
+        # Act
+        batch1 = feature_set.sample_random_batch(50, rng=42)
+        batch2 = feature_set.sample_random_batch(50, rng=42)
+
+        # Assert
+        self.assertEqual(batch1.shape, (50, 3))
+        self.assertTrue((batch1 == batch2).all())
+        self.assertTrue(((batch1[:, 1] >= 0) & (batch1[:, 1] <= 1)).all())
+
     def test_lengths(self):
         # Arrange
         base_types = [
@@ -236,6 +266,29 @@ class FeatureTypeTest(unittest.TestCase):
             # Assert
             self.assertTrue(result)
 
+    def test_fits_batch_IntegerType(self):
+        # Arrange
+        integer_type = ft.IntegerType(-3, 12)
+        matrix = [[-3], [0], [12], [13], [2.5], [4.0], [-4]]
+
+        # Act
+        result = integer_type.fits_batch(matrix)
+
+        # Assert
+        self.assertListEqual(list(result), [True, True, True, False, False, True, False])
+        self.assertListEqual(list(result), [integer_type.fits(row) for row in matrix])
+
+    def test_fits_batch_FloatType(self):
+        # Arrange
+        float_type = ft.FloatType(-1.5, 2)
+        matrix = [[-1.5], [0.3], [2], [2.1], [float('nan')]]
+
+        # Act
+        result = float_type.fits_batch(matrix)
+
+        # Assert
+        self.assertListEqual(list(result), [True, True, True, False, False])
+
     def test_code_fits_FloatType(self):
 
         # Arrange
@@ -167,3 +167,127 @@ class GeneCodeTest(unittest.TestCase):
         result = space.sample_random()
 
         print(result)
+
+    def test_nested_feature_access(self):
+        """
+        Named and positional access on a kayak.GeneCode must resolve features of nested feature sets by their compiled layout.
+        """
+
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('outer', ft.FeatureSet({
+            'inner1': ft.NaturalInteger,
+            'inner2': ft.NaturalFloat
+        }))
+        space.add_feature('last', ft.UnitFloat)
+
+        # Act
+        code = kayak.GeneCode([10, 3.4, 0.5], space)
+
+        # Assert
+        self.assertListEqual(code['outer'], [10, 3.4])
+        self.assertListEqual(code[0], [10, 3.4])
+        self.assertListEqual(code['inner1'], [10])
+        self.assertListEqual(code['inner2'], [3.4])
+        self.assertListEqual(code['last'], [0.5])
+        self.assertListEqual(code[1], [0.5])
+
+    def test_dynamic_feature_access(self):
+        """
+        The layout of a gene code with dynamically sized features depends on the code and has to be resolved for each code.
+        """
+
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('a', ft.FeatureList([ft.NaturalInteger, ft.FeatureSet({'x': ft.UnitFloat, 'y': ft.UnitFloat})]))
+        space.add_feature('b', ft.NaturalInteger)
+
+        # Act
+        code_short = kayak.GeneCode([0, 5, 7], space)
+        code_long = kayak.GeneCode([1, 0.2, 0.3, 8], space)
+
+        # Assert
+        self.assertListEqual(code_short['a'], [0, 5])
+        self.assertListEqual(code_short['b'], [7])
+        self.assertListEqual(code_long['a'], [1, 0.2, 0.3])
+        self.assertListEqual(code_long['b'], [8])
+
+    def test_layout_invalidated_on_add_feature(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('first', ft.NaturalInteger)
+        layout_before = space.layout()
+
+        # Act
+        space.add_feature('second', ft.Matrix(2, 3))
+        layout_after = space.layout()
+
+        # Assert
+        self.assertEqual(len(layout_before), 1)
+        self.assertEqual(len(layout_after), 2)
+        self.assertEqual(layout_after.names['second'][1:], (1, 6))
+        self.assertIs(space.layout(), layout_after)
+
+    def test_unknown_feature_access_fail(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('first', ft.NaturalInteger)
+        code = kayak.GeneCode([3], space)
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            code['unknown']
+        with self.assertRaises(IndexError):
+            code[1]
+
+    def test_view_writes_through_to_matrix(self):
+        """
+        A gene code view on a row of a matrix reads and writes its features directly in the matrix, copies are independent of it.
+        """
+
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('first', ft.NaturalInteger)
+        space.add_feature('second', ft.Matrix(1, 2))
+        matrix = numpy.array([[1, 0.5, 0.6], [2, 0.7, 0.8]])
+        code = kayak.GeneCode.view(matrix, 1, space)
+        copy = code.copy()
+
+        # Act
+        code['first'] = 7
+        code['second'] = [[0.1, 0.2]]
+
+        # Assert
+        self.assertTrue(code.is_view)
+        self.assertFalse(copy.is_view)
+        self.assertListEqual(list(matrix[1]), [7, 0.1, 0.2])
+        self.assertListEqual(list(numpy.asarray(copy)), [2, 0.7, 0.8])
+        self.assertFalse(hasattr(code, '__dict__'))
+
+    def test_set_feature_not_fitting_fail(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('first', ft.NaturalInteger)
+        space.add_feature('second', ft.Matrix(1, 2))
+        code = kayak.GeneCode([3, 0.5, 0.6], space)
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            code['first'] = 2.5
+        with self.assertRaises(ValueError):
+            code['second'] = [0.1, 0.2, 0.3]
+        self.assertEqual(code['first'], [3])
+
+    def test_slice_access_and_fits_sampled(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test', '1.2.0')
+        space.add_feature('first', ft.natint)
+        space.add_feature('second', ft.Matrix(2, 2))
+
+        # Act
+        code = space.sample_random(rng=0)
+
+        # Assert
+        self.assertEqual(len(code[1:5]), 4)
+        self.assertListEqual(list(code[numpy.array([0, 1])]), list(numpy.asarray(code)[:2]))
+        self.assertTrue(space.fits(code))
@@ -18,6 +18,25 @@ class GeneticEncodingDescriptionTest(unittest.TestCase):
         self.assertIsInstance(code, kayak.GeneCode)
         self.assertEqual(code.as_numpy().shape, (1,))
 
+    def test_sample_batch(self):
+        space = kayak.GeneticEncoding('foo', '0.1.1')
+        space.add_feature('a', ft.NaturalFloat)
+        space.add_feature('b', ft.Matrix(2, 2))
+        space.add_feature('c', ft.UnitFloat)
+
+        batch = space.sample_random_batch(100)
+
+        self.assertEqual(batch.shape, (100, len(space)))
+        for row in batch[:10]:
+            self.assertTrue(space.fits(row))
+
+    def test_sample_batch_dynamic_fail(self):
+        space = kayak.GeneticEncoding('foo', '0.1.1')
+        space.add_feature('a', [ft.NaturalFloat, ft.FeatureSet({'b': ft.UnitFloat, 'c': ft.UnitFloat})])
+
+        with self.assertRaises(ValueError):
+            space.sample_random_batch(10)
+
     def test_sample_feature(self):
         gene_space3 = kayak.GeneticEncoding('test', '0.1.1')
         gene_space3.add_feature('a', [1, 2, 3])
@@ -47,3 +66,37 @@ class GeneticEncodingDescriptionTest(unittest.TestCase):
 
         print(space.map(code))
 
+
+    def test_map_nested_features(self):
+        space = kayak.GeneticEncoding('foo', '0.1.1', {'a': ft.NaturalInteger, 'b': {'c': ft.UnitFloat, 'd': 'fixed'}, 'm': ft.Matrix(2, 2)})
+        code = [3, 0.5, 'fixed', 1, 2, 3, 4]
+
+        mapped = space.map(code)
+
+        self.assertListEqual(list(mapped.keys()), ['a', 'c', 'd', 'm'])
+        self.assertEqual(mapped['a'], 3)
+        self.assertEqual(mapped['d'], 'fixed')
+        self.assertEqual(mapped['m'].shape, (2, 2))
+        with self.assertRaises(ValueError):
+            space.map([3, 1.5, 'fixed', 1, 2, 3, 4], type_check=True)
+
+    def test_map_batch_matches_map(self):
+        space = kayak.GeneticEncoding('foo', '0.1.1', {'a': ft.NaturalInteger, 'b': {'c': ft.UnitFloat}, 'm': ft.Matrix(3, 2)})
+        matrix = space.sample_random_batch(50)
+
+        columns = space.map_batch(matrix)
+
+        self.assertListEqual(sorted(columns.keys()), ['a', 'c', 'm'])
+        self.assertEqual(columns['a'].shape, (50,))
+        self.assertEqual(columns['m'].shape, (50, 3, 2))
+        for idx in [0, 17, 49]:
+            mapped = space.map(matrix[idx])
+            self.assertEqual(columns['a'][idx], mapped['a'])
+            self.assertEqual(columns['c'][idx], mapped['c'])
+            self.assertTrue((columns['m'][idx] == mapped['m']).all())
+
+    def test_map_batch_wrong_size_fail(self):
+        space = kayak.GeneticEncoding('foo', '0.1.1', {'a': ft.NaturalInteger, 'b': ft.UnitFloat})
+
+        with self.assertRaises(ValueError):
+            space.map_batch([[1, 0.5, 0.5]])
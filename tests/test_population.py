@@ -1,5 +1,45 @@
+import asyncio
 import unittest
+import numpy as np
 import kayak
+import kayak.feature_types.graph as fg
+from kayak.feature_types.permutation import FeaturePermutation
+from kayak.feature_types.permutation import RandomKeyPermutationEncoder
+
+
+class SumFitnessMap(kayak.FitnessMap):
+    def obtain_fitness(self, gene_code):
+        code = np.asarray(gene_code)
+        if code[0] > 4000:
+            raise ValueError('Too large for this fitness map')
+        return float(code.sum())
+
+
+class SleepingFitnessMap(kayak.AsyncFitnessMap):
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.max_tasks = 0
+
+    async def obtain_fitness(self, gene_code):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.max_tasks = max(self.max_tasks, len(asyncio.all_tasks()))
+        code = np.asarray(gene_code)
+        await asyncio.sleep(0.01 * code[1])
+        self.running -= 1
+        if code[0] > 4000:
+            raise ValueError('Too large for this fitness map')
+        return float(code.sum())
+
+
+class CountingCachedFitnessMap(kayak.AsyncCachedFitnessMap):
+    calculations = 0
+
+    async def calculate_fitness(self, gene_code):
+        self.calculations += 1
+        await asyncio.sleep(0.01)
+        return 1.0
 
 
 class PopulationTest(unittest.TestCase):
@@ -11,14 +51,220 @@ class PopulationTest(unittest.TestCase):
         })
         pop = kayak.Population(gen_enc)
         pop += 1
-        print(pop._pop)
+        print(pop.genomes)
 
         pop2 = kayak.Population(gen_enc)
         pop2 += 2
 
         pop += pop2
 
-        print(pop._pop)
+        print(pop.genomes)
+        self.assertEqual(len(pop), 3)
+
+    def test_append_grows_columns(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc, capacity=2)
+
+        # Act
+        for value in range(1, 101):
+            pop.add_gene(kayak.GeneCode([value, 0.5], gen_enc))
+        pop += 50
+
+        # Assert
+        self.assertEqual(len(pop), 150)
+        self.assertEqual(pop.genomes.shape, (150, 2))
+        self.assertListEqual(list(pop.genomes[:100, 0]), list(range(1, 101)))
+        self.assertTrue(np.isnan(pop.fitness).all())
+        self.assertEqual(len(np.unique(pop.ids)), 150)
+
+    def test_iadd_samples_into_buffer(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        labelled_enc = kayak.GeneticEncoding('test_labels', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': FeaturePermutation(['A', 'B', 'C'])
+        })
+        pop = kayak.Population(gen_enc, capacity=4)
+        labelled_pop = kayak.Population(labelled_enc)
+        integer_pop = kayak.Population(gen_enc, dtype=int)
+
+        # Act
+        pop += 10
+        labelled_pop += 5
+        integer_pop += 5
+
+        # Assert
+        self.assertEqual(len(pop), 10)
+        self.assertEqual(pop.genomes.dtype, np.float64)
+        self.assertTrue(gen_enc.fits_batch(pop.genomes).all())
+        self.assertTrue(np.isnan(pop.fitness).all())
+        self.assertEqual(len(set(pop.ids)), 10)
+        self.assertEqual(labelled_pop.genomes.dtype, object)
+        self.assertTrue(labelled_enc.fits_batch(labelled_pop.genomes).all())
+        self.assertFalse(labelled_enc.numeric_codes)
+        self.assertEqual(integer_pop.genomes.dtype, np.float64)
+        self.assertTrue(gen_enc.fits_batch(integer_pop.genomes).all())
+
+    def test_iadd_large_rank_permutations_keep_precision(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_ranks', '0.1.0', {'p': FeaturePermutation('1:25')})
+        pop = kayak.Population(gen_enc)
+
+        # Act
+        pop += 5
+
+        # Assert
+        self.assertFalse(gen_enc.numeric_codes)
+        self.assertEqual(pop.genomes.dtype, object)
+        self.assertTrue(gen_enc.fits_batch(pop.genomes).all())
+        self.assertTrue(gen_enc.fits(pop[0]))
+
+    def test_append_round_trips_rank_permutations(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_ranks', '0.1.0', {'p': FeaturePermutation('1:5')})
+        pop = kayak.Population(gen_enc)
+        pop += 3
+        other = kayak.Population(gen_enc)
+
+        # Act
+        other.append(pop.genomes)
+
+        # Assert
+        self.assertEqual(pop.genomes.dtype, np.float64)
+        self.assertTrue(gen_enc.fits_batch(pop.genomes).all())
+        self.assertTrue(np.array_equal(other.genomes, pop.genomes))
+        self.assertFalse(gen_enc.fits([120.0]))
+        self.assertFalse(gen_enc.fits([1.5]))
+
+    def test_random_key_permutations_fit_in_mixed_population(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_keys', '0.1.0', {
+            'a': 'label',
+            'p': FeaturePermutation(list(range(30)), encoder=RandomKeyPermutationEncoder)
+        })
+        pop = kayak.Population(gen_enc)
+
+        # Act
+        pop += 3
+
+        # Assert
+        self.assertEqual(pop.genomes.dtype, object)
+        self.assertTrue(gen_enc.fits_batch(pop.genomes).all())
+
+    def test_packed_graphs_in_uint8_population(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_graphs', '0.1.0', {'g': fg.ErdosRenyiGraphType(20, 0.3, encoding=fg.graph_encoding_packed)})
+        pop = kayak.Population(gen_enc, dtype=np.uint8)
+        float_pop = kayak.Population(gen_enc)
+
+        # Act
+        pop += 5
+        float_pop += 5
+
+        # Assert
+        self.assertEqual(pop.genomes.dtype, np.uint8)
+        self.assertTrue(gen_enc.fits_batch(pop.genomes).all())
+        self.assertEqual(float_pop.genomes.nbytes, 8 * pop.genomes.nbytes)
+
+    def test_iteration_yields_views(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        population = kayak.Population(gen_enc, capacity=8)
+        population += 5
+
+        # Act
+        codes = list(population)
+        codes[2][0] = 4000
+
+        # Assert
+        self.assertTrue(all(code.is_view for code in codes))
+        self.assertEqual(population.genomes[2, 0], 4000)
+        self.assertTrue(population[2].is_view)
+
+    def test_iadd_chunks(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc)
+
+        # Act
+        pop += gen_enc.generate_random_chunks(2500, chunk_size=1000, prefetch=2)
+        pop += gen_enc.sample_random_batch(10)
+
+        # Assert
+        self.assertEqual(len(pop), 2510)
+        self.assertTrue(gen_enc.fits_batch(pop.genomes).all())
+        self.assertEqual(len(set(pop.ids)), 2510)
+        with self.assertRaises(ValueError):
+            pop += iter([[[0, 0.5]]])
+
+    def test_append_not_fitting_fail(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc)
+
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            pop.append([[1, 0.5], [2, 1.5]])
+        self.assertEqual(len(pop), 0)
+
+    def test_selection(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc)
+        pop += 100
+        pop.fitness[:] = np.arange(100)
+
+        # Act
+        best = pop[pop.fitness >= 90]
+        first = pop[:10]
+        single = pop[5]
+
+        # Assert
+        self.assertEqual(len(best), 10)
+        self.assertTrue((best.fitness >= 90).all())
+        self.assertTrue((best.ids == pop.ids[90:]).all())
+        self.assertEqual(len(first), 10)
+        self.assertIsInstance(single, kayak.GeneCode)
+        self.assertTrue((np.asarray(single) == pop.genomes[5]).all())
+
+    def test_merge_population(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop1 = kayak.Population(gen_enc)
+        pop1 += 3
+        pop2 = kayak.Population(gen_enc)
+        pop2 += 4
+
+        # Act
+        merged = pop1.merge_population(pop2)
+
+        # Assert
+        self.assertEqual(len(merged), 7)
+        self.assertEqual(len(pop1), 3)
+        self.assertTrue((merged.ids == np.concatenate([pop1.ids, pop2.ids])).all())
+        self.assertEqual(len([code for code in merged]), 7)
 
     def test_delayed_random_fitness(self):
         gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
@@ -41,3 +287,109 @@ class PopulationTest(unittest.TestCase):
 
         for code in pop:
             print('code %s, fitness %s' % (code, random_map.obtain_fitness(code)))
+
+    def test_evaluate_population_threads(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc)
+        pop += 50
+
+        # Act
+        result = SumFitnessMap().evaluate_population(pop, workers=4)
+
+        # Assert
+        too_large = np.flatnonzero(pop.genomes[:, 0] > 4000)
+        self.assertSetEqual(set(result.errors), set(too_large))
+        self.assertTrue(np.isnan(result.fitness[too_large]).all())
+        fitting = pop.genomes[:, 0] <= 4000
+        self.assertTrue(np.allclose(result.fitness[fitting], pop.genomes[fitting].sum(axis=1)))
+        self.assertTrue(np.array_equal(pop.fitness, result.fitness, equal_nan=True))
+
+    def test_evaluate_population_processes(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.IntegerType(1, 100),
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc)
+        pop += 20
+
+        # Act
+        result = SumFitnessMap().evaluate_population(pop, executor='process', workers=2, chunksize=5)
+
+        # Assert
+        self.assertDictEqual(result.errors, {})
+        self.assertTrue(np.allclose(result.fitness, pop.genomes.sum(axis=1)))
+
+    def test_evaluate_population_async(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': kayak.feature_types.unitfloat
+        })
+        pop = kayak.Population(gen_enc)
+        pop += 200
+        fitness_map = SleepingFitnessMap()
+
+        async def collect():
+            return [result async for result in fitness_map.evaluate_population_async(pop, concurrency=50)]
+
+        # Act
+        results = asyncio.run(collect())
+
+        # Assert
+        self.assertEqual(len(results), 200)
+        self.assertSetEqual({result.position for result in results}, set(range(200)))
+        self.assertLessEqual(fitness_map.max_running, 50)
+        self.assertGreater(fitness_map.max_running, 1)
+        # Besides the collecting task, tasks only exist for the evaluations in flight
+        self.assertLessEqual(fitness_map.max_tasks, 51)
+        for result in results:
+            if pop.genomes[result.position, 0] > 4000:
+                self.assertIsInstance(result.error, ValueError)
+            else:
+                self.assertAlmostEqual(result.fitness, pop.genomes[result.position].sum())
+                self.assertEqual(pop.fitness[result.position], result.fitness)
+
+    def test_async_cached_fitness_shares_calculation(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {'a': kayak.feature_types.natint})
+        code = kayak.GeneCode([3], gen_enc)
+        fitness_map = CountingCachedFitnessMap()
+
+        async def obtain_concurrently():
+            return await asyncio.gather(*[fitness_map.obtain_fitness(code) for _ in range(10)])
+
+        # Act
+        values = asyncio.run(obtain_concurrently())
+        value_again = asyncio.run(fitness_map.obtain_fitness(code))
+
+        # Assert
+        self.assertListEqual(values, [1.0] * 10)
+        self.assertEqual(value_again, 1.0)
+        self.assertEqual(fitness_map.calculations, 1)
+
+    def test_dynamically_sized_space(self):
+        # Arrange
+        gen_enc = kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': kayak.feature_types.natint,
+            'b': [kayak.feature_types.natint, kayak.feature_types.Matrix(2, 2)]
+        })
+        pop = kayak.Population(gen_enc)
+
+        # Act
+        pop += 10
+        pop.append([[1, 0, 2], [3, 1, 0.1, 0.2, 0.3, 0.4]])
+        selected = pop[pop.fitness != 0.0]
+
+        # Assert
+        self.assertEqual(len(pop), 12)
+        self.assertEqual(pop.genomes.dtype, object)
+        self.assertTrue(all(gen_enc.fits(code) for code in pop))
+        self.assertListEqual(list(np.asarray(pop[11])), [3, 1, 0.1, 0.2, 0.3, 0.4])
+        self.assertEqual(len(selected), 12)
+        with self.assertRaises(ValueError):
+            pop.append([1, 2, 0.1])
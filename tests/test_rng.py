@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+import kayak
+import kayak.feature_types as ft
+from kayak.rng import as_generator, spawn
+from kayak.feature_types.permutation import FeaturePermutation, ImplicitListPermutationEncoder, RandomKeyPermutationEncoder
+
+
+class RandomGeneratorTest(unittest.TestCase):
+    def _space(self):
+        return kayak.GeneticEncoding('test_enc', '0.1.0', {
+            'a': ft.natint,
+            'b': ft.unitfloat,
+            'c': ft.Matrix(2, 2),
+            'd': FeaturePermutation(list(range(5)), encoder=ImplicitListPermutationEncoder)
+        })
+
+    def test_sampling_reproducible_with_seed(self):
+        # Arrange
+        space = self._space()
+
+        # Act
+        first = [np.asarray(code) for code in space.generate_random(5, rng=7)]
+        second = [np.asarray(code) for code in space.generate_random(5, rng=7)]
+        space.compile()
+        compiled_first = np.asarray(space.sample_random(rng=3))
+        compiled_second = np.asarray(space.sample_random(rng=3))
+
+        # Assert
+        self.assertTrue(all(np.array_equal(code1, code2) for code1, code2 in zip(first, second)))
+        self.assertTrue(np.array_equal(compiled_first, compiled_second))
+
+    def test_mutation_reproducible_with_seed(self):
+        for feature in [ft.IntegerType(0, 1000), ft.FloatType(0, 1), FeaturePermutation(['A', 'B', 'C', 'D'], encoder=RandomKeyPermutationEncoder)]:
+            # Arrange
+            code = np.ravel(feature.sample_random(rng=1))
+
+            # Act
+            first = feature.mutate_random(code.copy(), rng=as_generator(5))
+            second = feature.mutate_random(code.copy(), rng=as_generator(5))
+
+            # Assert
+            self.assertTrue(np.array_equal(first, second), 'Mutation of %s is not reproducible' % feature)
+
+    def test_gene_code_mutation_reproducible_with_seed(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test_enc', '0.1.0', {'a': ft.IntegerType(0, 1000), 'b': ft.FeatureSet({'c': ft.unitfloat})})
+        code = space.sample_random(rng=1)
+
+        # Act
+        first = code.copy().mutate_random(rng=5)
+        second = code.copy().mutate_random(rng=5)
+
+        # Assert
+        self.assertTrue(np.array_equal(np.asarray(first), np.asarray(second)))
+        self.assertFalse(np.array_equal(np.asarray(first), np.asarray(code)))
+        self.assertTrue(space.fits(first))
+
+    def test_gene_code_mutation_keeps_unmutable_features(self):
+        # Arrange
+        space = kayak.GeneticEncoding('test_enc', '0.1.0', {'a': ft.IntegerType(0, 1000), 'm': ft.Matrix(2, 2)})
+        code = space.sample_random(rng=1)
+
+        # Act
+        mutation = code.copy().mutate_random(rng=5)
+
+        # Assert
+        self.assertTrue(np.array_equal(np.asarray(mutation)[1:], np.asarray(code)[1:]))
+        self.assertTrue(space.fits(mutation))
+
+    def test_spawn_independent_streams(self):
+        # Arrange
+        space = self._space()
+
+        # Act
+        workers = spawn(11, 3)
+        workers_again = spawn(np.random.SeedSequence(11), 3)
+        batches = [space.sample_random_batch(100, rng=worker) for worker in workers]
+        batches_again = [space.sample_random_batch(100, rng=worker) for worker in reversed(workers_again)][::-1]
+
+        # Assert
+        self.assertEqual(len(workers), 3)
+        self.assertFalse(np.array_equal(batches[0], batches[1]))
+        self.assertTrue(all(np.array_equal(batch, batch_again) for batch, batch_again in zip(batches, batches_again)))
+        self.assertEqual(len(spawn(as_generator(1), 2)), 2)
+
+    def test_default_generator_shared(self):
+        # Act & Assert
+        self.assertIs(as_generator(), as_generator(None))
+        self.assertIsNot(as_generator(1), as_generator(1))